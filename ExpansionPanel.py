@@ -1,49 +1,104 @@
 import flet as ft
 
 
-def main(page: ft.Page):
-    def handle_change(e: ft.ControlEvent):
-        print(f"change on panel with index {e.data}")
+# Wraps an ft.ExpansionPanelList whose panels are addressed by key. Only headers are built up front;
+# a panel's content is built the first time it is expanded and, with drop_collapsed=True,
+# released again when it collapses.
+class LazyExpansionPanelList:
+    def __init__(self, build_header, build_content, drop_collapsed=False, on_change=None, **list_options):
+        self.build_header = build_header
+        self.build_content = build_content
+        self.drop_collapsed = drop_collapsed
+        self.on_change = on_change
+        self.panels = {}  # key -> ft.ExpansionPanel, in display order
+        self.control = ft.ExpansionPanelList(on_change=self._handle_change, **list_options)
 
-    def handle_delete(e: ft.ControlEvent):
-        panel.controls.remove(e.control.data)
-        page.update()
+    def panel(self, key):
+        return self.panels[key]
 
-    panel = ft.ExpansionPanelList(
-        expand_icon_color=ft.Colors.AMBER,
-        elevation=8,
-        divider_color=ft.Colors.AMBER,
-        on_change=handle_change,
-        controls=[
-            ft.ExpansionPanel(
-                # has no header and content - placeholders will be used
-                bgcolor=ft.Colors.BLUE_400,
-                expanded=True,
-            )
-        ],
-    )
+    def add_panels(self, keys, **panel_options):
+        for key in keys:
+            if key in self.panels:
+                raise KeyError(f"duplicate panel key: {key!r}")
+            panel = ft.ExpansionPanel(header=self.build_header(key), data=key, **panel_options)
+            self.panels[key] = panel
+            self.control.controls.append(panel)
+        self._update()
+
+    def remove_panels(self, keys):
+        removed = {id(self.panels.pop(key)) for key in keys if key in self.panels}
+        if removed:
+            self.control.controls = [panel for panel in self.control.controls if id(panel) not in removed]
+            self._update()
+
+    # e.data is the position of the panel whose expanded state the client just changed
+    def _handle_change(self, e):
+        panel = self.control.controls[int(e.data)]
+        if panel.expanded and panel.content is None:
+            panel.content = self.build_content(panel.data)
+            panel.update()
+        elif not panel.expanded and self.drop_collapsed and panel.content is not None:
+            panel.content = None
+            panel.update()
+        if self.on_change:
+            self.on_change(panel.data, panel.expanded)
 
+    def _update(self):
+        if self.control.page:
+            self.control.update()
+
+
+def main(page: ft.Page):
     colors = [
         ft.Colors.GREEN_500,
         ft.Colors.BLUE_800,
         ft.Colors.RED_800,
     ]
 
-    for i in range(3):
-        exp = ft.ExpansionPanel(
-            bgcolor=colors[i % len(colors)],
-            header=ft.ListTile(title=ft.Text(f"Panel {i}")),
-        )
+    def build_header(i):
+        return ft.ListTile(title=ft.Text(f"Panel {i}"))
 
-        exp.content = ft.ListTile(
+    def build_content(i):
+        return ft.ListTile(
             title=ft.Text(f"This is in Panel {i}"),
             subtitle=ft.Text(f"Press the icon to delete panel {i}"),
-            trailing=ft.IconButton(ft.Icons.DELETE, on_click=handle_delete, data=exp),
+            trailing=ft.IconButton(ft.Icons.DELETE, on_click=handle_delete, data=i),
         )
 
-        panel.controls.append(exp)
+    def handle_change(key, expanded):
+        print(f"panel {key} {'expanded' if expanded else 'collapsed'}")
+
+    def handle_delete(e: ft.ControlEvent):
+        panels.remove_panels([e.control.data])
+
+    def add_more(e):
+        start = next_key[0]
+        next_key[0] += 100
+        panels.add_panels(range(start, next_key[0]), bgcolor=colors[start // 100 % len(colors)])
+
+    def delete_expanded(e):
+        panels.remove_panels([key for key, panel in panels.panels.items() if panel.expanded])
+
+    panels = LazyExpansionPanelList(
+        build_header,
+        build_content,
+        drop_collapsed=True,
+        on_change=handle_change,
+        expand_icon_color=ft.Colors.AMBER,
+        elevation=8,
+        divider_color=ft.Colors.AMBER,
+    )
+    next_key = [0]
+    add_more(None)
 
-    page.add(panel)
+    page.scroll = ft.ScrollMode.AUTO
+    page.add(
+        ft.Row([
+            ft.ElevatedButton("Add 100 panels", on_click=add_more),
+            ft.ElevatedButton("Delete expanded panels", on_click=delete_expanded),
+        ]),
+        panels.control,
+    )
 
 
 ft.app(main)
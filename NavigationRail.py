@@ -1,8 +1,101 @@
+import asyncio
+from collections import OrderedDict
+
 import flet as ft
 
 
+# A destination's content. build() runs the first time the destination is selected;
+# on_activate/on_deactivate run whenever the view is shown or hidden.
+class View:
+    def build(self):
+        raise NotImplementedError
+
+    def on_activate(self):
+        pass
+
+    def on_deactivate(self):
+        pass
+
+
+# Swaps the body Column between views, keeping the most recently used `cache_size`
+# built views so switching back to one of them does not rebuild it.
+class ViewRouter:
+    def __init__(self, body, views, cache_size=2):
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1")
+        self.body = body
+        self.views = views
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # index -> built control, least recently used first
+        self.current = None
+
+    def show(self, index):
+        if index == self.current:
+            return
+        if self.current is not None:
+            self.views[self.current].on_deactivate()
+        content = self.cache.get(index)
+        if content is None:
+            content = self.cache[index] = self.views[index].build()
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(index)
+        self.current = index
+        self.body.controls = [content]
+        self.views[index].on_activate()
+        if self.body.page:
+            self.body.update()
+
+    def on_change(self, e):
+        self.show(e.control.selected_index)
+
+
+class TextView(View):
+    def __init__(self, text):
+        self.text = text
+
+    def build(self):
+        return ft.Text(self.text)
+
+
+# Ticks only while visible: the loop stops on deactivate and restarts on activate.
+class ClockView(View):
+    def __init__(self, page):
+        self.page = page
+        self.seconds = 0
+        self.generation = 0  # bumped on every activate/deactivate so a stale loop exits
+        self.label = None
+
+    def build(self):
+        self.label = ft.Text("Active for 0 s", size=20)
+        return self.label
+
+    def on_activate(self):
+        self.generation += 1
+        self.page.run_task(self.tick, self.generation)
+
+    def on_deactivate(self):
+        self.generation += 1
+
+    async def tick(self, generation):
+        while True:
+            await asyncio.sleep(1)
+            if generation != self.generation:
+                return
+            self.seconds += 1
+            self.label.value = f"Active for {self.seconds} s"
+            self.label.update()
+
+
 def main(page: ft.Page):
 
+    body = ft.Column(
+        alignment=ft.MainAxisAlignment.START,
+        expand=True,
+    )
+    router = ViewRouter(body, [ClockView(page), TextView("Second"), TextView("Settings")], cache_size=2)
+
     rail = ft.NavigationRail(
         selected_index=0,
         label_type=ft.NavigationRailLabelType.ALL,
@@ -28,19 +121,16 @@ def main(page: ft.Page):
                 label_content=ft.Text("Settings"),
             ),
         ],
-        on_change=lambda e: print("Selected destination:", e.control.selected_index),
+        on_change=router.on_change,
     )
 
+    router.show(rail.selected_index)
     page.add(
         ft.Row(
             [
                 rail,
                 ft.VerticalDivider(width=1),
-                ft.Column(
-                    [ft.Text("Body!")],
-                    alignment=ft.MainAxisAlignment.START,
-                    expand=True,
-                ),
+                body,
             ],
             expand=True,
         )
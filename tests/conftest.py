@@ -0,0 +1,15 @@
+import importlib.util
+import pathlib
+
+import pytest
+
+MODULE_PATH = pathlib.Path(__file__).resolve().parent.parent / "小型任务管理工具.py"
+
+
+# 任务管理工具是单文件脚本，按路径加载；未安装 flet 时数据层照常可用
+@pytest.fixture(scope="session")
+def tm():
+    spec = importlib.util.spec_from_file_location("task_manager", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
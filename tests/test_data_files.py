@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+
+def write_backup(tmp_path, data):
+    path = tmp_path / "projects.json"
+    (tmp_path / "projects.json.bak.1").write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("content", [b"", b"  \r\n", b"\x00\x00\x00", b"not json"])
+def test_corrupt_main_file_falls_back_to_backup(tm, tmp_path, monkeypatch, content):
+    monkeypatch.setattr(tm, "msgpack", None)
+    path = write_backup(tmp_path, {"A": {"tasks": {}, "next_id": 1}})
+    path.write_bytes(content)
+    assert tm.load_data(str(path)) == {"A": {"tasks": {}, "next_id": 1}}
+
+
+def test_missing_files_load_as_empty(tm, tmp_path):
+    assert tm.load_data(str(tmp_path / "projects.json")) == {}
+
+
+def test_msgpack_round_trip(tm, tmp_path):
+    pytest.importorskip("msgpack")
+    data = {"A": {"tasks": {"1": tm.Task("1", "任务")}, "next_id": 2}}
+    path = tmp_path / "projects.json"
+    path.write_bytes(tm.encode_data(data, "msgpack"))
+    assert tm.load_data(str(path))["A"]["tasks"]["1"]["name"] == "任务"
+
+
+def test_truncated_msgpack_falls_back_to_backup(tm, tmp_path):
+    pytest.importorskip("msgpack")
+    path = write_backup(tmp_path, {"A": {"tasks": {}, "next_id": 1}})
+    path.write_bytes(tm.encode_data({"A": {"tasks": {}, "next_id": 5}}, "msgpack")[:-3])
+    assert tm.load_data(str(path)) == {"A": {"tasks": {}, "next_id": 1}}
+
+
+# 真正的 msgpack 快照在没有安装 msgpack 时不能当成损坏跳过，否则会以空数据启动
+def test_msgpack_snapshot_without_msgpack_is_reported(tm, tmp_path, monkeypatch):
+    pytest.importorskip("msgpack")
+    path = write_backup(tmp_path, {})
+    path.write_bytes(tm.encode_data({"A": {"tasks": {}, "next_id": 1}}, "msgpack"))
+    monkeypatch.setattr(tm, "msgpack", None)
+    with pytest.raises(RuntimeError):
+        tm.load_data(str(path))
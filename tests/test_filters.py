@@ -0,0 +1,62 @@
+OLD_TIME = "2000-01-01 08:00:00"
+
+
+# P：r1（2000 年创建）下有今天完成的 c1，r2 今天创建未完成，r3 的创建时间无法识别
+def open_workspace(tm, directory):
+    store = tm.JournalStore(str(directory / "projects.json"), str(directory / "projects.json.journal"))
+    store.load()
+    workspace = tm.Workspace(store)
+    workspace.add_project("P")
+    r1 = workspace.add_task("P", None, "r1")
+    c1 = workspace.add_task("P", r1, "c1")
+    r2 = workspace.add_task("P", None, "r2")
+    r3 = workspace.add_task("P", None, "r3")
+    workspace.update_task("P", r1, {"created_time": OLD_TIME})
+    workspace.update_task("P", r3, {"created_time": "未知"})
+    workspace.set_completed("P", c1, True)
+    return workspace, (r1, c1, r2, r3)
+
+
+def assert_times_in_sync(filters):
+    for field in filters.FIELDS:
+        assert filters.times[field] == sorted((value, task_id) for task_id, value in filters.keys[field].items())
+
+
+# 符合条件的任务连同祖先一起显示，祖先本身不符合条件也要保留层级
+def test_status_and_period_keep_ancestors(tm, tmp_path):
+    workspace, (r1, c1, r2, r3) = open_workspace(tm, tmp_path)
+    assert workspace.filtered_order("P", status="completed") == [r1, c1]
+    assert workspace.filtered_order("P", period="completed:today") == [r1, c1]
+    assert workspace.filtered_order("P", status="incomplete") == [r1, r2, r3]
+    assert workspace.filtered_order("P", status="incomplete", period="created:today") == [r2]
+    assert workspace.filtered_order("P", period="created:month") == [r1, c1, r2]
+    workspace.store.close()
+
+
+def test_sort_puts_undated_tasks_last(tm, tmp_path):
+    workspace, (r1, c1, r2, r3) = open_workspace(tm, tmp_path)
+    assert workspace.filtered_order("P", sort="created:asc") == [r1, c1, r2, r3]
+    assert workspace.filtered_order("P", sort="created:desc") == [r2, r1, c1, r3]
+    assert workspace.filtered_order("P", sort="completed:desc") == [r1, c1, r2, r3]
+    workspace.store.close()
+
+
+# 筛选索引建立后，完成、取消完成和删除都增量更新，排好序的时间列表与各任务的时间保持一致
+def test_filter_index_follows_changes(tm, tmp_path):
+    workspace, (r1, c1, r2, r3) = open_workspace(tm, tmp_path)
+    assert workspace.filtered_order("P", status="completed") == [r1, c1]
+    filters = workspace.task_index("P").filters
+
+    workspace.set_completed("P", r2, True)
+    assert workspace.filtered_order("P", period="completed:today") == [r1, c1, r2]
+    workspace.set_completed("P", c1, False)
+    assert workspace.filtered_order("P", status="completed") == [r2]
+    assert c1 not in filters.keys["completed"]
+    assert_times_in_sync(filters)
+
+    workspace.delete_task("P", r1)
+    assert workspace.filtered_order("P", status="incomplete") == [r3]
+    assert not {r1, c1} & (filters.completed | filters.incomplete | set(filters.keys["created"]))
+    assert_times_in_sync(filters)
+    assert workspace.task_index("P").filters is filters
+    workspace.store.close()
@@ -0,0 +1,74 @@
+def open_workspace(tm, directory):
+    store = tm.JournalStore(str(directory / "projects.json"), str(directory / "projects.json.journal"))
+    store.load()
+    workspace = tm.Workspace(store)
+    workspace.add_project("P")
+    return workspace
+
+
+def task_name(workspace, task_id):
+    return workspace.task_index("P").get(task_id)["name"]
+
+
+def test_undo_redo_rename_and_completion(tm, tmp_path):
+    workspace = open_workspace(tm, tmp_path)
+    history = tm.History(workspace)
+    task_id = history.add_task("P", None, "原名")
+    history.rename_task("P", task_id, "新名")
+    history.set_completed("P", task_id, True)
+
+    assert history.undo() == [("task_changed", "P", task_id)]
+    assert workspace.task_index("P").get(task_id)["completed"] is False
+    assert history.undo() == [("task_changed", "P", task_id)]
+    assert task_name(workspace, task_id) == "原名"
+    assert history.redo() == [("task_changed", "P", task_id)]
+    assert task_name(workspace, task_id) == "新名"
+    workspace.store.close()
+
+
+# 其他会话之后又改了同一个字段：撤销和重做都不能把它覆盖掉，这条记录被丢弃
+def test_undo_skips_fields_changed_by_another_session(tm, tmp_path):
+    workspace = open_workspace(tm, tmp_path)
+    history = tm.History(workspace)
+    other = tm.History(workspace)
+    task_id = history.add_task("P", None, "原名")
+    history.rename_task("P", task_id, "新名")
+    other.rename_task("P", task_id, "别人改的")
+
+    assert history.undo() == []
+    assert task_name(workspace, task_id) == "别人改的"
+    assert history.redo() is None
+
+    history.record_note("P", task_id, "", "备注")
+    workspace.task_index("P").get(task_id)["note"] = "备注"
+    other.update_task("P", task_id, {"note": "别人的备注"})
+    assert history.undo() == []
+    assert workspace.task_index("P").get(task_id)["note"] == "别人的备注"
+    workspace.store.close()
+
+
+def test_redo_skips_fields_changed_after_undo(tm, tmp_path):
+    workspace = open_workspace(tm, tmp_path)
+    history = tm.History(workspace)
+    task_id = history.add_task("P", None, "原名")
+    history.rename_task("P", task_id, "新名")
+    assert history.undo() == [("task_changed", "P", task_id)]
+    workspace.rename_task("P", task_id, "别人改的")
+
+    assert history.redo() == []
+    assert task_name(workspace, task_id) == "别人改的"
+    workspace.store.close()
+
+
+# 撤销删除项目后计数器沿用删除前的值，项目中已删除任务的编号不会再被分配
+def test_undo_project_delete_keeps_task_counter(tm, tmp_path):
+    workspace = open_workspace(tm, tmp_path)
+    history = tm.History(workspace)
+    history.add_task("P", None, "一")
+    removed = history.add_task("P", None, "二")
+    history.delete_task("P", removed)
+    history.delete_project("P")
+
+    assert history.undo() == [("projects_changed",)]
+    assert workspace.add_task("P", None, "三") != removed
+    workspace.store.close()
@@ -0,0 +1,223 @@
+import json
+import os
+
+
+def open_store(tm, directory):
+    store = tm.JournalStore(str(directory / "projects.json"), str(directory / "projects.json.journal"))
+    store.load()
+    return store
+
+
+def add_tasks(tm, store, project_name, names):
+    for name in names:
+        task_id = store.allocate_task_id(project_name)
+        store.add_task(project_name, ["tasks", task_id], tm.Task.new(task_id, name))
+
+
+def task_names(store, project_name):
+    return [task["name"] for task in store.tasks(project_name).values()]
+
+
+def test_reload_replays_journal(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1", "t2"])
+    store.update_task("A", ["tasks", "1"], {"name": "renamed", "completed": True})
+    store.delete_task("A", ["tasks", "2"])
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["renamed"]
+    assert store.tasks("A")["1"]["completed"] is True
+    assert store.data["A"]["next_id"] == 3
+    store.close()
+
+
+def test_torn_last_line_is_truncated(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1"])
+    store.close()
+    journal = tmp_path / "projects.json.journal"
+    intact = journal.read_bytes()
+    with open(journal, "ab") as file:
+        file.write(b'{"op": "set", "path": ["B"], "val')
+
+    store = open_store(tm, tmp_path)
+    assert store.project_names() == ["A"]
+    assert task_names(store, "A") == ["t1"]
+    store.close()
+    assert journal.read_bytes() == intact
+
+
+# 新快照已经改名到位、.compacting 还没删除时进程退出：下次加载不能把旧日志再应用一遍
+def test_replay_after_interrupted_compaction(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1", "t2", "t3"])
+    store.compact()
+    add_tasks(tm, store, "A", ["t4"])
+    store.rename_project("A", "B")
+    tm.background_writer.flush()
+    journal = (tmp_path / "projects.json.journal").read_bytes()
+    store.compact()
+    store.close()
+    (tmp_path / "projects.json.journal.compacting").write_bytes(journal)
+
+    store = open_store(tm, tmp_path)
+    assert store.project_names() == ["B"]
+    assert task_names(store, "B") == ["t1", "t2", "t3", "t4"]
+    store.close()
+    assert not os.path.exists(tmp_path / "projects.json.journal.compacting")
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "B") == ["t1", "t2", "t3", "t4"]
+    store.close()
+
+
+def test_records_already_in_snapshot_are_skipped(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1"])
+    tm.background_writer.flush()
+    journal = (tmp_path / "projects.json.journal").read_bytes()
+    store.compact()
+    store.delete_task("A", ["tasks", "1"])
+    store.close()
+    # 把已经合并进快照的记录再放回日志开头
+    path = tmp_path / "projects.json.journal"
+    path.write_bytes(journal + path.read_bytes())
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == []
+    assert store.data["A"]["next_id"] == 2
+    store.close()
+
+
+# 旧版本的快照没有序号、日志记录也没有序号，照常全部重放
+def test_legacy_snapshot_and_journal(tm, tmp_path):
+    legacy = {"A": {"tasks": {"1": {"name": "t1", "created_time": "", "completed": False,
+                                    "completed_time": "", "note": ""}}, "next_id": 2}}
+    (tmp_path / "projects.json").write_text(json.dumps(legacy), encoding="utf-8")
+    record = {"op": "update", "path": ["A", "tasks", "1"], "value": {"name": "renamed"}}
+    (tmp_path / "projects.json.journal").write_text(json.dumps(record) + "\n", encoding="utf-8")
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["renamed"]
+    add_tasks(tm, store, "A", ["t2"])
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["renamed", "t2"]
+    store.close()
+
+
+def test_compaction_folds_journal_into_snapshot(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1", "t2"])
+    store.update_task("A", ["tasks", "2"], {"note": "备注"})
+    store.compact()
+    add_tasks(tm, store, "A", ["t3"])
+    store.close()
+    assert not os.path.exists(tmp_path / "projects.json.journal.compacting")
+    snapshot = json.loads((tmp_path / "projects.json").read_bytes())
+    assert snapshot["seq"] == 6
+    assert list(snapshot["data"]["A"]["tasks"]) == ["1", "2"]
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["t1", "t2", "t3"]
+    assert store.tasks("A")["2"]["note"] == "备注"
+    store.close()
+
+
+# 新快照由压缩线程从磁盘文件生成，编码快照期间其他线程的修改不必等待
+def test_compaction_does_not_block_writes(tm, tmp_path, monkeypatch):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1"])
+    encode_data = tm.encode_data
+    blocked = []
+
+    def encode_during_write(data, *args):
+        writer = tm.threading.Thread(target=add_tasks, args=(tm, store, "A", ["t2"]))
+        writer.start()
+        writer.join(2)
+        blocked.append(writer.is_alive())
+        return encode_data(data, *args)
+
+    monkeypatch.setattr(tm, "encode_data", encode_during_write)
+    store.compact()
+    monkeypatch.setattr(tm, "encode_data", encode_data)
+    assert blocked == [False]
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["t1", "t2"]
+    store.close()
+
+
+# 上一次压缩失败留下的 .compacting 不会被下一次轮换覆盖
+def test_rotation_appends_to_unfinished_compaction(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1"])
+    tm.background_writer.submit(store._rotate_journal).result()
+    add_tasks(tm, store, "A", ["t2"])
+    store.compact()
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["t1", "t2"]
+    store.close()
+
+
+def legacy_task(name, **subtasks):
+    return {"name": name, "created_time": "", "completed": False, "completed_time": "", "note": "",
+            "subtasks": subtasks}
+
+
+# 旧数据的层级编号（root.1.1）按显示顺序改写成递增编号，父子关系和计数器随之更新，重新打开后不再改写
+def test_legacy_ids_are_renumbered(tm, tmp_path):
+    legacy = {"P": {"tasks": {
+        "root.1": legacy_task("a", **{
+            "root.1.1": legacy_task("a1", **{"root.1.1.1": legacy_task("a11")}),
+            "root.1.2": legacy_task("a2"),
+        }),
+        "root.2": legacy_task("b"),
+    }}}
+    (tmp_path / "projects.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    for _ in range(2):
+        store = open_store(tm, tmp_path)
+        index = tm.TaskIndex(store.tasks("P"))
+        assert index.parents == {"1": None, "2": "1", "3": "2", "4": "1", "5": None}
+        assert [index.get(task_id)["name"] for task_id in "12345"] == ["a", "a1", "a11", "a2", "b"]
+        assert store.data["P"]["next_id"] == 6
+        store.close()
+
+
+# 主快照损坏、从备份加载：损坏的文件改名保留，按备份和日志重新写出快照，之后的压缩不会用备份覆盖它
+def test_recovery_from_backup_rewrites_snapshot(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    add_tasks(tm, store, "A", ["t1"])
+    store.compact()
+    add_tasks(tm, store, "A", ["t2"])
+    store.compact()
+    add_tasks(tm, store, "A", ["t3"])
+    store.close()
+    (tmp_path / "projects.json").write_bytes(b"\x00corrupt")
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["t1", "t3"]
+    assert (tmp_path / "projects.json.corrupt").read_bytes() == b"\x00corrupt"
+    assert not os.path.exists(tmp_path / "projects.json.journal.compacting")
+    assert json.loads((tmp_path / "projects.json").read_bytes())["seq"] == store.seq
+    add_tasks(tm, store, "A", ["t4"])
+    store.compact()
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert task_names(store, "A") == ["t1", "t3", "t4"]
+    store.close()
@@ -0,0 +1,18 @@
+import pytest
+
+
+# 从未压缩过的 JSON 存储只有日志文件，换用其他后端时也要迁移过去
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_journal_only_json_store_is_migrated(tm, tmp_path, monkeypatch, backend):
+    monkeypatch.chdir(tmp_path)
+    store = tm.open_store("json")
+    workspace = tm.Workspace(store)
+    workspace.add_project("P")
+    task_id = workspace.add_task("P", None, "任务")
+    store.close()
+    assert not (tmp_path / tm.DATA_FILE).exists()
+
+    store = tm.open_store(backend)
+    assert store.project_names() == ["P"]
+    assert store.tasks("P")[task_id]["name"] == "任务"
+    store.close()
@@ -0,0 +1,52 @@
+import pytest
+
+
+def index_with(tm, *names):
+    search_index = tm.SearchIndex()
+    for i, name in enumerate(names, 1):
+        search_index.index_task("P", str(i), {"name": name, "note": ""})
+    return search_index
+
+
+def test_mixed_latin_and_chinese_are_split(tm):
+    assert tm.search_tokens("bug修复") == {"bug", "修", "复", "修复"}
+    search_index = index_with(tm, "bug修复", "v2版本发布", "无关任务")
+    assert search_index.search("修复") == [("P", "1")]
+    assert search_index.search("bug") == [("P", "1")]
+    assert search_index.search("版本") == [("P", "2")]
+    assert search_index.search("v2 发布") == [("P", "2")]
+
+
+def test_words_match_by_prefix_and_chinese_by_pairs(tm):
+    search_index = index_with(tm, "Release notes", "发布说明", "说明发布")
+    assert search_index.search("rel") == [("P", "1")]
+    assert search_index.search("发布说明") == [("P", "2")]
+    assert search_index.search("说明") == [("P", "2"), ("P", "3")]
+
+
+def open_store(tm, backend, directory):
+    if backend == "sqlite":
+        store = tm.SqliteStore(str(directory / "projects.db"))
+    else:
+        store = tm.ShardedStore(str(directory / "projects"))
+    store.load()
+    return store
+
+
+# 第一次搜索直接从存储读取各项目，建立索引后项目仍未加载，缓存预算不受影响
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_search_index_does_not_load_projects(tm, tmp_path, backend):
+    workspace = tm.Workspace(open_store(tm, backend, tmp_path))
+    for project_name in ("A", "B"):
+        workspace.add_project(project_name)
+        parent = workspace.add_task(project_name, None, f"{project_name} 发布")
+        workspace.add_task(project_name, parent, f"{project_name} 说明")
+    workspace.store.close()
+
+    store = open_store(tm, backend, tmp_path)
+    workspace = tm.Workspace(store)
+    search_index = workspace.ensure_search_index()
+    assert sorted(search_index.search("说明")) == [("A", "2"), ("B", "2")]
+    assert (store.loaded if backend == "sqlite" else store.cache) == {}
+    assert workspace.indexes == {}
+    store.close()
@@ -0,0 +1,65 @@
+import threading
+
+
+def open_store(tm, directory, cache_budget=50000):
+    store = tm.ShardedStore(str(directory / "projects"), cache_budget)
+    store.load()
+    return store
+
+
+def add_tasks(tm, store, project_name, count):
+    for i in range(count):
+        task_id = store.allocate_task_id(project_name)
+        store.add_task(project_name, ["tasks", task_id], tm.Task.new(task_id, f"{project_name}{i}"))
+
+
+def test_reload_keeps_projects_and_tasks(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("A")
+    store.add_project("B")
+    add_tasks(tm, store, "A", 2)
+    store.rename_project("B", "C")
+    store.update_task("A", ["tasks", "1"], {"name": "renamed"})
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    assert store.project_names() == ["A", "C"]
+    assert [task["name"] for task in store.tasks("A").values()] == ["renamed", "A1"]
+    assert store.tasks("C") == {}
+    store.close()
+
+
+# 缓存只放得下一个项目：取出分片后另一个线程马上加载其他项目，写入不能落到被淘汰并关闭的分片上
+def test_writes_survive_concurrent_eviction(tm, tmp_path, monkeypatch):
+    store = open_store(tm, tmp_path, cache_budget=30)
+    for project_name in ("A", "B"):
+        store.add_project(project_name)
+        add_tasks(tm, store, project_name, 20)
+    store.close()
+    store = open_store(tm, tmp_path, cache_budget=30)
+    shard = store._shard
+    loaders = []
+
+    def shard_then_load_other(project_name):
+        result = shard(project_name)
+        if project_name == "A":
+            loader = threading.Thread(target=store.tasks, args=("B",))
+            loader.start()
+            loader.join(0.2)
+            loaders.append(loader)
+        return result
+
+    monkeypatch.setattr(store, "_shard", shard_then_load_other)
+    store.update_task("A", ["tasks", "1"], {"name": "renamed"})
+    store.update_tasks([("A", ["tasks", "2"], {"note": "备注"})])
+    assert store.allocate_task_id("A") == "21"
+    for loader in loaders:
+        loader.join()
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    tasks = store.tasks("A")
+    assert tasks["1"]["name"] == "renamed"
+    assert tasks["2"]["note"] == "备注"
+    assert store.allocate_task_id("A") == "22"
+    store.close()
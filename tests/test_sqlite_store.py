@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+
+def open_store(tm, directory):
+    store = tm.SqliteStore(str(directory / "projects.db"))
+    store.load()
+    return store
+
+
+def task_names(tasks):
+    names = []
+    for task in tasks.values():
+        names.append(task["name"])
+        names.extend(task_names(task.get("subtasks", {})))
+    return names
+
+
+# 写入线程被堵住时导入到未加载的项目：第一次读取任务必须等排队的写入完成，不能缓存缺少导入的旧行
+def test_first_read_waits_for_queued_writes(tm, tmp_path):
+    store = open_store(tm, tmp_path)
+    store.add_project("P")
+    task = tm.Task.new(store.allocate_task_id("P"), "a")
+    store.add_task("P", ["tasks", task.id], task, tm.tally_tasks(tm.empty_stats(), task))
+    store.close()
+
+    store = open_store(tm, tmp_path)
+    gate = threading.Event()
+    tm.background_writer.submit(gate.wait)
+    tasks = {"1": tm.Task.new("1", "imported")}
+    store.import_projects({"P": tasks}, {"P": tm.tally_tasks(tm.empty_stats(), tasks["1"])})
+    threading.Timer(0.2, gate.set).start()
+    assert task_names(store.tasks("P")) == ["a", "imported"]
+    assert store.project_stats("P")["total"] == 2
+    store.close()
+
+
+# 旧数据库的任务编号带层级（root.1.1）：按插入顺序改写成递增编号，parent_id 和计数器随之更新
+def test_legacy_ids_are_renumbered(tm, tmp_path):
+    conn = sqlite3.connect(tmp_path / "projects.db")
+    conn.executescript(
+        """
+        CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE tasks (
+            project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+            task_id TEXT NOT NULL,
+            parent_id TEXT,
+            name TEXT NOT NULL,
+            created_time TEXT NOT NULL DEFAULT '',
+            completed INTEGER NOT NULL DEFAULT 0,
+            completed_time TEXT NOT NULL DEFAULT '',
+            note TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (project_id, task_id)
+        );
+        INSERT INTO projects (id, name) VALUES (1, 'P');
+        """
+    )
+    conn.executemany(
+        "INSERT INTO tasks (project_id, task_id, parent_id, name) VALUES (1, ?, ?, ?)",
+        [
+            ("root.1", None, "a"),
+            ("root.1.1", "root.1", "a1"),
+            ("root.1.1.1", "root.1.1", "a11"),
+            ("root.1.2", "root.1", "a2"),
+            ("root.2", None, "b"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    for _ in range(2):
+        store = open_store(tm, tmp_path)
+        index = tm.TaskIndex(store.tasks("P"))
+        assert index.parents == {"1": None, "2": "1", "3": "2", "4": "1", "5": None}
+        assert [index.get(task_id)["name"] for task_id in "12345"] == ["a", "a1", "a11", "a2", "b"]
+        assert store.next_id("P") == 6
+        assert store.project_stats("P")["total"] == 5
+        store.close()
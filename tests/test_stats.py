@@ -0,0 +1,85 @@
+import datetime
+import json
+
+import pytest
+
+OLD_TIME = "2000-01-01 08:00:00"
+
+
+def open_store(tm, backend, directory):
+    if backend == "json":
+        store = tm.JournalStore(str(directory / "projects.json"), str(directory / "projects.json.journal"))
+    elif backend == "sqlite":
+        store = tm.SqliteStore(str(directory / "projects.db"))
+    else:
+        store = tm.ShardedStore(str(directory / "projects"))
+    store.load()
+    return store
+
+
+# 增量写入的统计在重新加载后必须与遍历任务算出的结果一致
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_stats_match_recount_after_reload(tm, tmp_path, backend):
+    workspace = tm.Workspace(open_store(tm, backend, tmp_path))
+    workspace.add_project("P")
+    first = workspace.add_task("P", None, "一")
+    second = workspace.add_task("P", None, "二")
+    child = workspace.add_task("P", first, "子")
+    workspace.set_completed("P", first, True)
+    workspace.set_completed("P", child, True)
+    workspace.update_task("P", second, {"completed": True, "completed_time": OLD_TIME})
+    workspace.set_completed("P", child, False)
+    workspace.delete_task("P", first)
+    workspace.import_projects({"P": {"1": tm.Task.new("1", "导入")}, "Q": {"1": tm.Task.new("1", "新项目")}})
+    workspace.store.close()
+
+    store = open_store(tm, backend, tmp_path)
+    for project_name in ("P", "Q"):
+        assert store.project_stats(project_name) == tm.tasks_stats(store.tasks(project_name))
+    assert store.project_stats("P")["total"] == 2
+    assert store.project_stats("P")["completed"] == 1
+    store.close()
+
+
+def test_old_days_are_pruned(tm):
+    today = datetime.date.today()
+    old_day = (today - datetime.timedelta(days=tm.STATS_DAYS)).isoformat()
+    stats = {"total": 2, "completed": 2, "days": {old_day: 1, today.isoformat(): 1}}
+    delta = {"total": 0, "completed": -1, "days": {today.isoformat(): -1}}
+    assert tm.add_stats(stats, delta) == {"total": 2, "completed": 1, "days": {}}
+
+
+# 日志中只记录这次修改带来的增量，不随统计中日期的增多而变长
+def test_journal_records_stats_increment(tm, tmp_path):
+    workspace = tm.Workspace(open_store(tm, "json", tmp_path))
+    workspace.add_project("P")
+    task_id = workspace.add_task("P", None, "任务")
+    workspace.store.close()
+
+    with open(tmp_path / "projects.json.journal", encoding="utf-8") as f:
+        record = json.loads(f.readlines()[-1])
+    assert record["ops"][1] == {
+        "op": "incr", "path": ["P", "stats"], "value": {"total": 1, "completed": 0, "days": {}}
+    }
+    assert record["ops"][0]["path"] == ["P", "tasks", task_id]
+
+
+# 分片存储的清单只追加日志，不整个重写；旧版本的列表格式清单照常读取
+def test_sharded_manifest_is_journaled(tm, tmp_path):
+    shard_dir = tmp_path / "projects"
+    shard_dir.mkdir()
+    with open(shard_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"projects": [{"name": "旧", "file": "project-1.json", "tasks": 0}], "next_file": 2}, f)
+    workspace = tm.Workspace(open_store(tm, "sharded", tmp_path))
+    assert workspace.store.project_names() == ["旧"]
+    workspace.add_project("P")
+    snapshot = (shard_dir / "manifest.json").read_bytes()
+    workspace.add_task("P", None, "任务")
+    workspace.store.close()
+
+    assert (shard_dir / "manifest.json").read_bytes() == snapshot
+    store = open_store(tm, "sharded", tmp_path)
+    assert store.project_names() == ["旧", "P"]
+    assert store.manifest["P"]["tasks"] == 1
+    assert store.project_stats("P")["total"] == 1
+    store.close()
@@ -0,0 +1,46 @@
+import random
+
+
+def test_dict_round_trip(tm):
+    data = {
+        "name": "父任务",
+        "created_time": "2024-05-01 08:30:00",
+        "completed": True,
+        "completed_time": "2024-05-02 09:00:00",
+        "note": "备注",
+        "subtasks": {"2": {"name": "子任务", "created_time": "", "custom": 1}},
+    }
+    task = tm.Task.from_dict("1", data)
+    assert tm.json.loads(tm.encode_json(task)) == data
+
+
+# 子任务按编号增删改查的结果与按列表顺序逐个比较一致，包括直接追加 children 的情况
+def test_subtasks_lookup_matches_children(tm):
+    rng = random.Random(0)
+    parent = tm.Task("1")
+    subtasks = parent["subtasks"]
+    expected = {}
+    for i in range(2, 2000):
+        task_id = str(i)
+        action = rng.random()
+        if action < 0.5 or not expected:
+            subtasks[task_id] = tm.Task(task_id, f"任务 {i}")
+            expected[task_id] = f"任务 {i}"
+        elif action < 0.7:
+            removed = rng.choice(list(expected))
+            assert subtasks.pop(removed).id == removed
+            del expected[removed]
+        elif action < 0.8:
+            replaced = rng.choice(list(expected))
+            subtasks[replaced] = {"name": f"替换 {i}"}
+            expected[replaced] = f"替换 {i}"
+        else:
+            if parent.children is None:
+                parent.children = []
+            parent.children.append(tm.Task(task_id, f"追加 {i}"))
+            expected[task_id] = f"追加 {i}"
+        assert [child.id for child in parent.children or ()] == list(expected)
+        probe = rng.choice(list(expected) + ["0"])
+        assert (probe in subtasks) == (probe in expected)
+        assert subtasks.get(probe, {"name": None})["name"] == expected.get(probe)
+    assert subtasks.pop("0", None) is None
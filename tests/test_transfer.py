@@ -0,0 +1,42 @@
+import pytest
+
+
+def tree(tasks):
+    return [(task["name"], tree(task.get("subtasks", {}))) for task in tasks.values()]
+
+
+def test_children_before_parents_and_missing_parents(tm):
+    rows = [
+        {"project": "P", "id": "2", "parent_id": "1", "name": "子"},
+        {"project": "P", "id": "1", "name": "父"},
+        {"project": "P", "id": "3", "parent_id": "9", "name": "孤儿"},
+        {"name": "默认项目"},
+    ]
+    projects, count, orphans = tm.tasks_from_rows(rows)
+    assert count == 4
+    assert orphans == 1
+    assert tree(projects["P"]) == [("父", [("子", [])]), ("孤儿", [])]
+    assert tree(projects[tm.IMPORT_PROJECT]) == [("默认项目", [])]
+
+
+# parent_id 成环时环上最先出现的任务作为根任务导入，其余任务仍挂在它下面
+def test_parent_cycles_become_roots(tm):
+    rows = [
+        {"project": "P", "id": "1", "parent_id": "2", "name": "a"},
+        {"project": "P", "id": "2", "parent_id": "1", "name": "b"},
+        {"project": "P", "id": "3", "parent_id": "3", "name": "自环"},
+    ]
+    projects, count, orphans = tm.tasks_from_rows(rows)
+    assert orphans == 2
+    assert tree(projects["P"]) == [("a", [("b", [])]), ("自环", [])]
+
+
+def test_duplicate_ids_are_rejected_within_a_project(tm):
+    projects, count, orphans = tm.tasks_from_rows([
+        {"project": "P", "id": "1", "name": "a"},
+        {"project": "Q", "id": "1", "name": "b"},
+    ])
+    assert tree(projects["P"]) == [("a", [])]
+    assert tree(projects["Q"]) == [("b", [])]
+    with pytest.raises(ValueError, match="重复"):
+        tm.tasks_from_rows([{"project": "P", "id": "1", "name": "a"}, {"project": "P", "id": "1", "name": "b"}])
@@ -1,41 +1,3013 @@
+import argparse
+import asyncio
+import atexit
+import bisect
+import contextlib
+import cProfile
+import csv
+import datetime
+import functools
+import inspect
+import io
 import json
-from datetime import datetime
+import locale
+import logging
+import logging.handlers
+import os
+import platform
+import pstats
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 
-import flet as ft
+# 界面依赖 flet；只运行 bench、import、export 等命令行功能时可以不安装
+try:
+    import flet as ft
+except ImportError:
+    ft = None
+
+# 可选依赖：安装了 orjson 时用它读写 JSON，安装了 msgpack 时可以使用二进制格式
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 存储后端："json"（快照 + 日志）、"sharded"（每个项目一个文件）或 "sqlite"
+STORAGE_BACKEND = "json"
 
 # 数据存储文件
 DATA_FILE = "projects.json"
 
+# 快照格式："json"（紧凑，装了 orjson 时用它编码）、"json-indent"（缩进，便于手工查看）或 "msgpack"
+# 读取时按文件内容自动识别，修改这里后下一次保存即换成新格式
+DATA_FORMAT = "json"
+
+# SQLite 数据库文件，首次使用时自动从 DATA_FILE 迁移
+DB_FILE = "projects.db"
+
+# 分片存储目录：manifest.json 记录项目名称和任务数，每个项目单独一个快照 + 日志
+SHARD_DIR = "projects"
+
+# 分片存储在内存中最多缓存的任务数，超出后淘汰最近最少使用的项目
+TASK_CACHE_BUDGET = 50000
+
+# 操作日志文件，每次修改只追加一条记录
+JOURNAL_FILE = DATA_FILE + ".journal"
+
+# 日志记录数达到该值时，在后台把日志合并进新的快照
+COMPACT_THRESHOLD = 1000
+
+# 任务列表每次创建的行数，滚动接近底部时再创建下一批
+TASK_PAGE_SIZE = 100
+
+# 写入后最多等待多久统一刷盘（秒），这段时间内的多次写入共用一次 fsync
+FSYNC_INTERVAL = 0.2
+
+# 后台写入队列最多积压的写入数，写入跟不上时提交修改的一方会等待
+WRITE_QUEUE_SIZE = 1000
+
+# 每个数据文件保留的最近可用快照份数（.bak.1 最新），主文件损坏时自动回退
+SNAPSHOT_BACKUPS = 3
+
+# 搜索结果最多显示的条数
+SEARCH_RESULT_LIMIT = 50
+
+# 可复用的输入对话框个数，以及提示条最多排队的消息数
+DIALOG_POOL_SIZE = 2
+MAX_QUEUED_MESSAGES = 5
+
+# 备注自动保存：停止输入多久后写入，以及连续输入时最长多久必须写一次（秒）
+NOTE_SAVE_QUIET = 0.8
+NOTE_SAVE_MAX_DELAY = 5.0
+
+# 撤销历史最多占用的内存（估算值，字节），超出时丢弃最早的记录
+UNDO_MEMORY_BUDGET = 16 * 1024 * 1024
+
+# 估算撤销历史内存时，每条记录和每个被删除任务的固定开销（字节）
+UNDO_ENTRY_OVERHEAD = 320
+
+# 同一任务的备注在这段时间内（秒）连续输入时合并成一条撤销记录
+UNDO_MERGE_WINDOW = 2.0
+
+# 项目列表中“最近完成”统计的天数
+RECENT_DAYS = 7
+
+# 完成情况看板中图表显示的天数
+DASHBOARD_DAYS = 30
+
+# 进度统计中按完成日期计数保留的天数，更早的日期在更新统计时丢弃
+STATS_DAYS = max(RECENT_DAYS, DASHBOARD_DAYS)
+
+# 任务筛选和排序的选项：键 -> 显示文字；时间范围的键为 "字段:范围"，排序的键为 "字段:方向"
+TASK_STATUS_FILTERS = {"all": "全部状态", "incomplete": "未完成", "completed": "已完成"}
+TASK_PERIOD_FILTERS = {
+    "": "不限时间",
+    "created:today": "今天创建",
+    "created:week": "本周创建",
+    "created:month": "本月创建",
+    "completed:today": "今天完成",
+    "completed:week": "本周完成",
+    "completed:month": "本月完成",
+}
+TASK_SORTS = {
+    "": "默认顺序",
+    "created:asc": "创建时间从早到晚",
+    "created:desc": "创建时间从晚到早",
+    "completed:asc": "完成时间从早到晚",
+    "completed:desc": "完成时间从晚到早",
+}
+
+# 性能统计：环境变量 TASK_MANAGER_PERF=1 时启用，未启用时热点函数保持原样，不做任何包装
+INSTRUMENTATION = os.environ.get("TASK_MANAGER_PERF") == "1"
+
+# 性能日志：滚动写入，单个文件的最大字节数和保留的旧文件份数
+PERF_LOG_FILE = "perf.log"
+PERF_LOG_MAX_BYTES = 1024 * 1024
+PERF_LOG_BACKUPS = 3
+
+# 耗时超过该值（毫秒）的调用逐条写入性能日志
+PERF_SLOW_MS = 50
+
+# 性能统计面板的刷新间隔（秒）
+PERF_PANEL_INTERVAL = 1.0
+
+
+# 热点路径的耗时、每次界面更新发送的控件数和写入的字节数
+class Instrumentation:
+    def __init__(self, enabled=INSTRUMENTATION, log_file=PERF_LOG_FILE, slow_ms=PERF_SLOW_MS):
+        self.enabled = enabled
+        self.log_file = log_file
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        self.timings = {}  # 名称 -> [次数, 总耗时, 最大耗时, 最近一次耗时]，单位秒
+        self.amounts = {}  # 名称 -> [次数, 总量, 最大值, 最近一次]，如控件数、字节数
+        self.profiler = None
+        self._log = None
+
+    # 日志在第一次写入时才创建文件
+    @property
+    def log(self):
+        if self._log is None:
+            log = logging.getLogger("task_manager.perf")
+            handler = logging.handlers.RotatingFileHandler(
+                self.log_file, maxBytes=PERF_LOG_MAX_BYTES, backupCount=PERF_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            log.addHandler(handler)
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            self._log = log
+        return self._log
+
+    # 装饰器：记录函数的耗时；未启用时直接返回原函数
+    def timed(self, name):
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        with self.lock:
+            self._add(self.timings, name, seconds)
+        if seconds * 1000 >= self.slow_ms:
+            self.log.info("慢调用 %s %.1fms", name, seconds * 1000)
+
+    def observe(self, name, amount):
+        with self.lock:
+            self._add(self.amounts, name, amount)
+
+    @staticmethod
+    def _add(metrics, name, value):
+        metric = metrics.get(name)
+        if metric is None:
+            metrics[name] = [1, value, value, value]
+        else:
+            metric[0] += 1
+            metric[1] += value
+            metric[2] = max(metric[2], value)
+            metric[3] = value
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.amounts.clear()
+
+    # 按总耗时排序的统计表，供面板显示和写入日志
+    def summary_lines(self):
+        with self.lock:
+            timings = sorted(self.timings.items(), key=lambda item: -item[1][1])
+            amounts = sorted(self.amounts.items())
+        lines = [table_row("次数", "平均ms", "最大ms", "最近ms", "耗时")]
+        for name, (count, total, peak, last) in timings:
+            lines.append(table_row(count, f"{total / count * 1000:.2f}", f"{peak * 1000:.2f}", f"{last * 1000:.2f}", name))
+        lines.append(table_row("次数", "平均", "最大", "累计", "数量"))
+        for name, (count, total, peak, last) in amounts:
+            lines.append(table_row(count, f"{total / count:.1f}", peak, total, name))
+        return lines
+
+    def log_summary(self):
+        self.log.info("统计\n%s", "\n".join(self.summary_lines()))
+
+    # cProfile 只分析开始分析的线程（界面事件所在的线程）
+    def start_profile(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    # 停止分析，导出 .prof 文件并把累计耗时最多的函数写入日志，返回文件路径
+    def stop_profile(self):
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        path = time.strftime("profile-%Y%m%d-%H%M%S.prof")
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(20)
+        self.log.info("分析结果 %s\n%s", path, report.getvalue())
+        return path
+
+
+instrumentation = Instrumentation()
+
+
+# 等宽字体中中文占两格：前几列按显示宽度右对齐，最后一列是名称
+def table_row(*cells, width=10):
+    row = ""
+    for cell in map(str, cells[:-1]):
+        shown = sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in cell)
+        row += " " * max(1, width - shown) + cell
+    return f"{row}  {cells[-1]}"
+
+
+# 控件及其全部子控件的个数，近似一次 update 需要序列化的控件数
+def count_controls(control):
+    count = 0
+    stack = [control]
+    while stack:
+        control = stack.pop()
+        count += 1
+        stack.extend(getattr(control, "controls", None) or ())
+        for name in ("content", "title", "subtitle", "leading", "trailing"):
+            child = getattr(control, name, None)
+            if isinstance(child, ft.Control):
+                stack.append(child)
+    return count
+
+
+# 紧凑 JSON；中文等字符直接写 UTF-8，不再转义成 \uXXXX
+def encode_json(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=task_to_json)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=task_to_json).encode("utf-8")
+
+
+def encode_json_indent(data):
+    return json.dumps(data, ensure_ascii=False, indent=4, default=task_to_json).encode("utf-8")
+
+
+def encode_msgpack(data):
+    if msgpack is None:
+        raise RuntimeError("msgpack 格式需要先安装 msgpack（pip install msgpack）")
+    return msgpack.packb(data, default=task_to_json, use_bin_type=True)
+
+
+# 快照格式 -> 编码函数
+CODECS = {
+    "json": encode_json,
+    "json-indent": encode_json_indent,
+    "msgpack": encode_msgpack,
+}
+
+
+# 按 DATA_FORMAT（或指定的格式）把数据编码成字节
+def encode_data(data, data_format=None):
+    return CODECS[data_format or DATA_FORMAT](data)
+
+
+# msgpack 快照的第一个字节：数据最外层是字典（fixmap、map16 或 map32）
+MSGPACK_MAP_HEADS = frozenset(range(0x80, 0x90)) | {0xde, 0xdf}
+
+
+# 识别并解码：JSON 以 { 或 [ 开头（可有空白和 BOM），以字典头开头的按 msgpack 处理
+# 空文件（旧版本写到一半崩溃时留下）和无法识别的内容抛出 ValueError，由 load_data 回退到备份
+def decode_data(raw):
+    head = raw.lstrip(b" \t\r\n\xef\xbb\xbf")[:1]
+    if head in (b"{", b"["):
+        return decode_json(raw)
+    if not head or head[0] not in MSGPACK_MAP_HEADS:
+        raise ValueError("数据文件为空或格式无法识别")
+    if msgpack is None:
+        raise RuntimeError("数据文件是 msgpack 格式，需要先安装 msgpack（pip install msgpack）")
+    try:
+        return msgpack.unpackb(raw, raw=False)
+    except msgpack.UnpackException as exc:
+        raise ValueError(f"msgpack 数据已损坏：{exc}") from None
+
+
+def decode_json(raw):
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except ValueError:
+            pass  # 交给标准库再试一次，例如旧版本按系统编码写的文件
+    try:
+        return json.loads(raw)
+    except UnicodeDecodeError:
+        return json.loads(raw.decode(locale.getpreferredencoding(False)))
+
+
+# 加载数据，主文件缺失或损坏时依次尝试最近的快照备份
+def load_data(path=DATA_FILE):
+    return load_data_file(path)[0]
+
+
+# 同 load_data，返回 (数据, 实际读取的文件)，主文件和备份都没有时文件为 None
+def load_data_file(path=DATA_FILE):
+    candidates = [path] + [f"{path}.bak.{i}" for i in range(1, SNAPSHOT_BACKUPS + 1)]
+    for candidate in candidates:
+        try:
+            with open(candidate, "rb") as file:
+                data = decode_data(file.read())
+        except FileNotFoundError:
+            continue
+        except ValueError:
+            print(f"{candidate} 已损坏，尝试上一份快照")
+            continue
+        if candidate != path:
+            print(f"已从 {candidate} 恢复数据")
+        return data, candidate
+    return {}, None
+
+
+# 保存数据：交给 durable_writer 原子写入，短时间内的多次保存合并成一次刷盘
+@instrumentation.timed("save_data")
+def save_data(data, path=DATA_FILE):
+    durable_writer.write(path, encode_data(data))
+
+
+# 把目录项的变更（新建、改名）刷到磁盘
+def fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # Windows 不支持打开目录
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# 先写临时文件并刷盘，轮换快照备份后原子替换，任何时刻都不会留下写了一半的文件
+@instrumentation.timed("atomic_write")
+def atomic_write(path, content, backups=SNAPSHOT_BACKUPS, sync_dir=True):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if instrumentation.enabled:
+        instrumentation.observe("快照写入字节", len(content))
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    if backups and os.path.exists(path):
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists(f"{path}.bak.{i}"):
+                os.replace(f"{path}.bak.{i}", f"{path}.bak.{i + 1}")
+        os.replace(path, f"{path}.bak.1")
+    os.replace(tmp_file, path)
+    if sync_dir:
+        fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+# 后台写入线程：修改先在内存中生效，落盘按提交顺序在这个线程里完成，界面不必等待磁盘
+class BackgroundWriter:
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE):
+        self.queue = queue.Queue(max_pending)
+        self.lock = threading.Lock()
+        self.on_error = None  # 写入失败时的回调，参数为异常；在写入线程中调用
+        self._thread = None
+
+    # 提交一次写入，返回 Future；队列已满时等待写入线程腾出位置
+    def submit(self, job, *args):
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        future = Future()
+        self.queue.put((future, job, args))
+        return future
+
+    def _run(self):
+        while True:
+            future, job, args = self.queue.get()
+            try:
+                future.set_result(job(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+                self.report(exc)
+            finally:
+                self.queue.task_done()
+
+    def report(self, exc):
+        if self.on_error:
+            self.on_error(exc)
+        else:
+            print(f"写入失败：{exc}")
+
+    # 等待已提交的写入全部完成
+    def flush(self):
+        if self._thread is not None:
+            self.queue.join()
+
+
+background_writer = BackgroundWriter()
+
+
+# 分组刷盘：写入先登记，FSYNC_INTERVAL 秒后统一落盘；同一文件只写最新内容
+class DurableWriter:
+    def __init__(self, interval=FSYNC_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self._snapshots = {}  # 路径 -> 待写入的完整内容
+        self._files = {}  # 文件描述符 -> 已写入但尚未 fsync 的打开文件
+        self._timer = None
+
+    # 登记整文件写入
+    def write(self, path, content):
+        with self.lock:
+            self._snapshots[path] = content
+            self._schedule()
+
+    # 登记追加写入的文件，稍后与其他写入一起 fsync
+    def sync(self, file):
+        with self.lock:
+            self._files[file.fileno()] = file
+            self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, background_writer.submit, (self.flush,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    # 立即把登记的写入全部落盘
+    def flush(self):
+        with self.io_lock:
+            with self.lock:
+                snapshots, self._snapshots = self._snapshots, {}
+                files, self._files = self._files, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            for file in files.values():
+                try:
+                    os.fsync(file.fileno())
+                except (ValueError, OSError):  # 文件已被关闭，关闭前已经刷过盘
+                    pass
+            for path, text in snapshots.items():
+                atomic_write(path, text, sync_dir=False)
+            for directory in {os.path.dirname(os.path.abspath(path)) for path in snapshots}:
+                fsync_dir(directory)
+
+
+durable_writer = DurableWriter()
+atexit.register(durable_writer.flush)
+atexit.register(background_writer.flush)  # 后注册的先执行，先写完队列再统一刷盘
+
+
+# projects.json 中 created_time / completed_time 的格式
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIME_PATTERN = re.compile(r"(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)")
+DAY_PATTERN = re.compile(r"\d{4}-\d\d-\d\d")
+
+
+# "2024-05-01 08:30:00" -> 时间戳（整数秒），空串 -> None；格式不符或换算后不能原样还原的字符串保持原样
+def parse_time(text):
+    if not text:
+        return None
+    if not isinstance(text, str) or TIME_PATTERN.fullmatch(text) is None:
+        return text
+    hour_start = local_hour_start(text[:13])
+    minute, second = int(text[14:16]), int(text[17:19])
+    if hour_start is None or minute > 59 or second > 59:
+        return text
+    return hour_start + minute * 60 + second
+
+
+# "2024-05-01 08" 这一小时开始时的时间戳，按小时缓存；不存在的日期或小时内有夏令时切换时为 None
+@functools.lru_cache(maxsize=4096)
+def local_hour_start(prefix):
+    fields = (int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10]), int(prefix[11:13]))
+    try:
+        epoch = int(time.mktime(fields + (0, 0, 0, 0, -1)))
+    except (OverflowError, ValueError):
+        return None
+    if time.localtime(epoch)[:6] != fields + (0, 0) or time.localtime(epoch + 3599)[:6] != fields + (59, 59):
+        return None
+    return epoch
+
+
+def format_time(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return time.strftime(TIME_FORMAT, time.localtime(value))
+
+
+# 任务：字段放在 __slots__ 中，时间存为时间戳，子任务存为列表（没有子任务时为 None）
+# 同时提供与 projects.json 任务字典相同的读写方式，task["name"]、task.get("subtasks", {}) 等照常可用
+class Task:
+    __slots__ = ("id", "name", "created", "completed", "completed_at", "note", "children", "by_id", "missing", "extra")
+
+    FIELDS = ("name", "created_time", "completed", "completed_time", "note", "subtasks")
+    FIELD_BITS = {field: 1 << i for i, field in enumerate(FIELDS)}
+    FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, task_id, name="", created=None, completed=False, completed_at=None, note=""):
+        self.id = task_id
+        self.name = name
+        self.created = created  # 时间戳，或无法换算的原字符串
+        self.completed = completed
+        self.completed_at = completed_at  # 未完成时为 None
+        self.note = note
+        self.children = None
+        self.by_id = None  # 子任务编号 -> 子任务，按编号查找子任务时才建立，见 Subtasks
+        self.missing = 0  # 原字典中缺少的字段，按 FIELD_BITS 记录，序列化时同样省略
+        self.extra = None  # 原字典中其他未知字段，原样保留
+
+    # 新建任务，创建时间取当前时间
+    @classmethod
+    def new(cls, task_id, name):
+        return cls(task_id, name, int(time.time()))
+
+    # 从 projects.json 的任务字典（含全部子任务）创建，逐层展开，不受递归深度限制
+    @classmethod
+    def from_dict(cls, task_id, data):
+        root = cls(task_id)
+        stack = [(root, data)]
+        while stack:
+            task, data = stack.pop()
+            if data.keys() == cls.FIELD_SET:
+                # 本程序写出的任务字段齐全，直接赋值
+                task.name = data["name"]
+                task.created = parse_time(data["created_time"])
+                task.completed = data["completed"]
+                task.completed_at = parse_time(data["completed_time"])
+                task.note = data["note"]
+            else:
+                task.missing = sum(bit for field, bit in cls.FIELD_BITS.items() if field not in data)
+                for key, value in data.items():
+                    if key != "subtasks":
+                        task[key] = value
+            subtasks = data.get("subtasks")
+            if subtasks:
+                task.children = [cls(subtask_id) for subtask_id in subtasks]
+                stack.extend(zip(task.children, subtasks.values()))
+        return root
+
+    # 还原成 projects.json 的任务字典；子任务仍是 Task，由 json 的 default 逐层转换
+    def to_dict(self):
+        data = {key: self[key] for key in self.keys()}
+        if "subtasks" in data:
+            data["subtasks"] = dict(data["subtasks"].items())
+        return data
+
+    def keys(self):
+        keys = [field for field, bit in self.FIELD_BITS.items() if not self.missing & bit]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        bit = self.FIELD_BITS.get(key)
+        if bit is None:
+            return bool(self.extra) and key in self.extra
+        return not self.missing & bit
+
+    def __getitem__(self, key):
+        bit = self.FIELD_BITS.get(key)
+        if bit is None:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        if self.missing & bit:
+            raise KeyError(key)
+        if key == "name":
+            return self.name
+        if key == "created_time":
+            return format_time(self.created)
+        if key == "completed":
+            return self.completed
+        if key == "completed_time":
+            return format_time(self.completed_at)
+        if key == "note":
+            return self.note
+        return Subtasks(self)
+
+    def __setitem__(self, key, value):
+        bit = self.FIELD_BITS.get(key)
+        if bit is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+            return
+        self.missing &= ~bit
+        if key == "name":
+            self.name = value
+        elif key == "created_time":
+            self.created = parse_time(value)
+        elif key == "completed":
+            self.completed = value
+        elif key == "completed_time":
+            self.completed_at = parse_time(value)
+        elif key == "note":
+            self.note = value
+        else:
+            self.children = self.by_id = None
+            subtasks = Subtasks(self)
+            for subtask_id, subtask in value.items():
+                subtasks[subtask_id] = subtask
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+
+# Task.children 的字典视图：按任务编号读写子任务，顺序与列表一致
+# 按编号查找经 Task.by_id 完成，与子任务个数无关；直接追加 children 的代码不必维护它（个数不符时重建），
+# 原地改写子任务编号的代码要把它置为 None
+class Subtasks:
+    __slots__ = ("task",)
+
+    def __init__(self, task):
+        self.task = task
+
+    def _children(self):
+        return self.task.children or ()
+
+    def __len__(self):
+        return len(self._children())
+
+    def __iter__(self):
+        return (child.id for child in self._children())
+
+    def __reversed__(self):
+        return (child.id for child in reversed(self._children()))
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return list(self._children())
+
+    def items(self):
+        return [(child.id, child) for child in self._children()]
+
+    def _find(self, task_id):
+        task = self.task
+        if not task.children:
+            return None
+        if task.by_id is None or len(task.by_id) != len(task.children):
+            task.by_id = {child.id: child for child in task.children}
+        return task.by_id.get(task_id)
+
+    def __contains__(self, task_id):
+        return self._find(task_id) is not None
+
+    def __getitem__(self, task_id):
+        child = self._find(task_id)
+        if child is None:
+            raise KeyError(task_id)
+        return child
+
+    def get(self, task_id, default=None):
+        child = self._find(task_id)
+        return default if child is None else child
+
+    def __setitem__(self, task_id, value):
+        if not isinstance(value, Task):
+            value = Task.from_dict(task_id, value)
+        value.id = task_id
+        task = self.task
+        task.missing &= ~Task.FIELD_BITS["subtasks"]
+        child = self._find(task_id)
+        if child is not None:
+            task.children[task.children.index(child)] = value
+            task.by_id[task_id] = value
+        elif task.children is None:
+            task.children = [value]
+        else:
+            task.children.append(value)
+            if task.by_id is not None:
+                task.by_id[task_id] = value
+
+    def setdefault(self, task_id, default=None):
+        if task_id not in self:
+            self[task_id] = default
+        return self[task_id]
+
+    # 位置用 list.index 按对象查找，不逐个比较编号
+    def pop(self, task_id, *default):
+        child = self._find(task_id)
+        if child is None:
+            if default:
+                return default[0]
+            raise KeyError(task_id)
+        task = self.task
+        del task.children[task.children.index(child)]
+        del task.by_id[task_id]
+        if not task.children:
+            task.children = task.by_id = None
+        return child
+
+
+# projects.json 结构中的任务字典 -> Task
+def tasks_from_json(tasks):
+    return {task_id: Task.from_dict(task_id, task_data) for task_id, task_data in tasks.items()}
+
+
+# json.dumps 的 default：遇到 Task 时换成任务字典
+def task_to_json(value):
+    if isinstance(value, Task):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# 生成测试用的任务树：共 count 个任务，每个任务最多 fanout 个子任务，根任务以下最多 depth 层
+# 任务编号为 1 到 count，项目的 next_id 应为 count + 1
+def generate_tasks(count, depth=3, fanout=5):
+    tasks = {}
+    now = int(time.time())
+    created = 0
+    while created < count:
+        task_id = str(created + 1)
+        tasks[task_id] = Task(task_id, f"任务 {created + 1}", now, created % 3 == 0, now if created % 3 == 0 else None)
+        created += 1
+        pending = deque([(tasks[task_id], 0)])
+        while pending and created < count:
+            parent, level = pending.popleft()
+            if level >= depth:
+                continue
+            parent.children = []
+            for _ in range(min(fanout, count - created)):
+                subtask = Task(str(created + 1), f"任务 {created + 1}", now, created % 3 == 0,
+                               now if created % 3 == 0 else None)
+                parent.children.append(subtask)
+                pending.append((subtask, level + 1))
+                created += 1
+    return tasks
+
+
+# 旧数据的任务编号带层级（root.1.2），删除后再添加会重复使用编号
+# 按显示顺序（父任务在前）改写成项目内递增的整数编号，返回新的任务字典和下一个可用编号
+# 批量导入时从项目当前的 next_id 开始编号
+def renumber_tasks(tasks, next_id=1):
+    stack = list(reversed(tasks.values()))
+    while stack:
+        task = stack.pop()
+        task.id = str(next_id)
+        next_id += 1
+        if task.children:
+            task.by_id = None
+            stack.extend(reversed(task.children))
+    return {task.id: task for task in tasks.values()}, next_id
+
+
+# 统计任务及其全部子任务的数量
+def count_tasks(task_data):
+    count = 0
+    stack = [task_data]
+    while stack:
+        task_data = stack.pop()
+        count += 1
+        stack.extend(task_data.get("subtasks", {}).values())
+    return count
+
+
+# 任务树中全部任务的 (任务编号, 名称, 备注)
+def task_texts(tasks):
+    stack = list(tasks.items())
+    while stack:
+        task_id, task_data = stack.pop()
+        yield task_id, task_data.get("name", ""), task_data.get("note", "")
+        stack.extend(task_data.get("subtasks", {}).items())
+
+
+# 项目进度统计：任务总数、已完成数，以及最近 STATS_DAYS 天按完成日期（YYYY-MM-DD）统计的已完成任务数
+# 随任务修改增量维护：存储只写入这次修改带来的增量（结构相同，数值可为负），与修改写在同一次写入中
+# 启动和显示项目列表时不必遍历任务
+def empty_stats():
+    return {"total": 0, "completed": 0, "days": {}}
+
+
+# 计入（sign 为 1）或扣除（sign 为 -1）一个已完成任务；完成日期无法识别时只改已完成数
+def tally_completion(stats, completed_time, sign=1):
+    stats["completed"] += sign
+    if isinstance(completed_time, str) and DAY_PATTERN.match(completed_time):
+        day = completed_time[:10]
+        count = stats["days"].get(day, 0) + sign
+        if count:
+            stats["days"][day] = count
+        else:
+            stats["days"].pop(day, None)
+
+
+# 计入或扣除任务及其全部子任务，返回 stats
+def tally_tasks(stats, task_data, sign=1):
+    stack = [task_data]
+    while stack:
+        task_data = stack.pop()
+        stats["total"] += sign
+        if task_data.get("completed"):
+            tally_completion(stats, task_data.get("completed_time", ""), sign)
+        stack.extend(task_data.get("subtasks", {}).values())
+    return stats
+
+
+# 根任务字典（整个项目）的进度统计，只在旧数据第一次使用时遍历一次
+def tasks_stats(tasks):
+    stats = empty_stats()
+    for task_data in tasks.values():
+        tally_tasks(stats, task_data)
+    return prune_days(stats)
+
+
+# 把增量加到 stats 上，返回 stats
+def add_stats(stats, delta):
+    stats["total"] += delta["total"]
+    stats["completed"] += delta["completed"]
+    days = stats["days"]
+    for day, count in delta["days"].items():
+        count += days.get(day, 0)
+        if count:
+            days[day] = count
+        else:
+            days.pop(day, None)
+    return prune_days(stats)
+
+
+# 进度统计保留的最早日期
+def oldest_stats_day():
+    return (datetime.date.today() - datetime.timedelta(days=STATS_DAYS - 1)).isoformat()
+
+
+# 丢弃 STATS_DAYS 天以前的完成日期，返回 stats
+def prune_days(stats):
+    oldest = oldest_stats_day()
+    for day in [day for day in stats["days"] if day < oldest]:
+        del stats["days"][day]
+    return stats
+
+
+# 最近 days 天（含今天）每天完成的任务数，返回 [(日期, 完成数)]，日期从早到晚
+def completion_history(stats, days):
+    today = datetime.date.today()
+    history = []
+    for offset in range(days - 1, -1, -1):
+        day = (today - datetime.timedelta(days=offset)).isoformat()
+        history.append((day, stats["days"].get(day, 0)))
+    return history
+
+
+# 筛选时间范围的起点（时间戳）：今天、本周一或本月一日的零点
+def period_start(period):
+    today = datetime.date.today()
+    start = {
+        "today": today,
+        "week": today - datetime.timedelta(days=today.weekday()),
+        "month": today.replace(day=1),
+    }[period]
+    return int(time.mktime(start.timetuple()))
+
+
+# 在内存数据上应用一条操作记录
+def apply_op(data, record):
+    op = record["op"]
+    if op == "batch":
+        for sub_record in record["ops"]:
+            apply_op(data, sub_record)
+        return
+    *parents, key = record["path"]
+    target = data
+    for part in parents:
+        if op == "set":
+            target = target.setdefault(part, {})
+        else:
+            target = target.get(part)
+            if target is None:  # 路径已不存在（例如重放已合并过的日志），忽略
+                return
+    if op == "set":
+        value = record["value"]
+        if isinstance(value, Task):
+            value.id = key
+        target[key] = value
+    elif op == "update":
+        if key in target:
+            target[key].update(record["value"])
+    elif op == "del":
+        target.pop(key, None)
+    elif op == "move":
+        if key in target:
+            value = target.pop(key)
+            apply_op(data, {"op": "set", "path": record["to"], "value": value})
+    elif op == "incr":
+        # 值为字典时是进度统计的增量（见 add_stats），否则是加到计数上的数值
+        if target.get(key) is not None:
+            if isinstance(record["value"], dict):
+                add_stats(target[key], record["value"])
+            else:
+                target[key] += record["value"]
+
+
+# 在 data 上重放一个日志文件：跳过序号不大于 seq 的记录（快照中已经包含），崩溃时写了一半的最后一行会被截掉
+# 返回 (记录条数, 最后应用的记录序号)；旧版本写的记录没有序号，总是应用
+def replay_journal(path, data, seq=0):
+    count = 0
+    offset = 0
+    try:
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    file.close()
+                    os.truncate(path, offset)
+                    break
+                record_seq = record.get("seq")
+                if record_seq is None or record_seq > seq:
+                    apply_op(data, record)
+                    if record_seq is not None:
+                        seq = record_seq
+                offset += len(line)
+                count += 1
+    except FileNotFoundError:
+        pass
+    return count, seq
+
+
+# 存储接口：main() 中的回调只通过这些方法读写项目和任务
+# 任务用它在项目数据中的路径定位，例如 ["tasks", "1", "subtasks", "7"]
+# 任务编号由项目内只增不减的计数器分配（随项目保存），与界面上显示的序号无关
+class ProjectStore:
+    # 项目数据被移出内存缓存时的回调，参数为项目名称
+    on_evict = None
+
+    # 打开存储，只需准备好项目列表
+    def load(self):
+        raise NotImplementedError
+
+    def project_names(self):
+        raise NotImplementedError
+
+    def has_project(self, project_name):
+        return project_name in self.project_names()
+
+    # 项目的任务字典（与 projects.json 中的结构相同），可在首次访问时才加载
+    def tasks(self, project_name):
+        raise NotImplementedError
+
+    # 项目全部任务的 (任务编号, 名称, 备注)，建立搜索索引时使用；按需加载的存储直接读取，不放进缓存
+    def search_rows(self, project_name):
+        return task_texts(self.tasks(project_name))
+
+    # next_id 为该项目下一个可分配的任务编号，恢复已删除的项目时沿用原来的计数
+    # 新项目同时保存一份空的进度统计
+    def add_project(self, project_name, next_id=1):
+        raise NotImplementedError
+
+    # 项目的进度统计（见 empty_stats），旧数据中没有时返回 None
+    def project_stats(self, project_name):
+        raise NotImplementedError
+
+    def save_stats(self, project_name, stats):
+        raise NotImplementedError
+
+    def rename_project(self, old_name, new_name):
+        raise NotImplementedError
+
+    # 分配一个新的任务编号并保存计数器，已删除任务的编号不会再被使用
+    def allocate_task_id(self, project_name):
+        raise NotImplementedError
+
+    # 下一个可分配的任务编号（不分配），删除项目前记下，恢复时原样传给 add_project
+    def next_id(self, project_name):
+        raise NotImplementedError
+
+    def delete_project(self, project_name):
+        raise NotImplementedError
+
+    # 以下三个方法的 delta 不为 None 时，是这次修改带来的进度统计增量，与修改一起写入
+    # 调用前项目必须已有进度统计（project_stats 不为 None）
+
+    # 添加任务（可带子任务），path 的最后一项是新任务编号
+    def add_task(self, project_name, path, task_data, delta=None):
+        raise NotImplementedError
+
+    def update_task(self, project_name, path, fields, delta=None):
+        raise NotImplementedError
+
+    # 删除任务及其全部子任务
+    def delete_task(self, project_name, path, delta=None):
+        raise NotImplementedError
+
+    # 一次写入多个任务的修改，updates 为 (项目名称, 路径, 字段) 列表
+    def update_tasks(self, updates):
+        for project_name, path, fields in updates:
+            self.update_task(project_name, path, fields)
+
+    # 批量导入：projects 为 项目名称 -> 根任务字典（任务编号是临时的），不存在的项目会被创建
+    # 任务从项目的计数器开始重新编号后，连同 deltas（项目名称 -> 导入带来的进度统计增量）整批写入
+    # 返回 项目名称 -> 重新编号后的根任务字典
+    def import_projects(self, projects, deltas):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# 快照 + 追加日志的存储：修改只写一条记录，后台定期压缩
+# project_file 为 True 时数据文件只有一个项目（{"tasks": {...}}，分片存储使用），否则是全部项目
+# 每条日志记录带递增的序号，快照记下它包含的最后一个序号，同一段日志重放多次也不会重复应用
+class JournalStore(ProjectStore):
+    def __init__(self, data_file=DATA_FILE, journal_file=JOURNAL_FILE, compact_threshold=COMPACT_THRESHOLD,
+                 project_file=False):
+        self.data_file = data_file
+        self.project_file = project_file
+        self.journal_file = journal_file
+        self.compacting_file = journal_file + ".compacting"
+        self.compact_threshold = compact_threshold
+        self.data = {}
+        self.seq = 0  # 最后一条日志记录的序号
+        self.snapshot_seq = 0  # 磁盘上的快照包含的最后一个序号
+        self.lock = threading.RLock()
+        self.io_lock = threading.Lock()  # 保护日志文件，只在写入线程和关闭时使用
+        self.compact_lock = threading.Lock()  # 同一时间只做一次压缩
+        self._journal = None
+        self._records = 0
+        self._compactor = None
+
+    # 读取最近的快照并重放日志
+    def load(self):
+        with self.lock:
+            self.data, self.seq, source = self._read_snapshot()
+            self.snapshot_seq = self.seq
+            interrupted, self.seq = replay_journal(self.compacting_file, self.data, self.seq)
+            self._records, self.seq = replay_journal(self.journal_file, self.data, self.seq)
+            recovered = source not in (None, self.data_file)
+            if recovered and os.path.exists(self.data_file):
+                # 主快照损坏、读到的是备份：损坏的文件改名保留，不被之后写出的快照覆盖或轮换掉
+                corrupt_file = self.data_file + ".corrupt"
+                os.replace(self.data_file, corrupt_file)
+                print(f"{self.data_file} 已损坏，已改名为 {corrupt_file}")
+            if recovered or interrupted:
+                # 按重放后的数据重新写出快照：上次压缩中途退出时合并两段日志，从备份恢复时以恢复的数据为准
+                self._rewrite_snapshot()
+                if recovered:
+                    print(f"已按 {source} 和日志重新写出 {self.data_file}")
+            if self._prepare():
+                self._rewrite_snapshot()
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            if self._records >= self.compact_threshold:
+                self._start_compaction()
+        return self.data
+
+    # 快照和日志重放完成后整理数据：任务字典统一换成 Task，旧格式的项目改写任务编号
+    # 返回 True 时随后写成新快照并丢弃日志（日志中的旧编号已经重放过）
+    def _prepare(self):
+        renumbered = False
+        for project in [self.data] if self.project_file else self.data.values():
+            project["tasks"] = tasks_from_json(project.get("tasks", {}))
+            if "next_id" not in project:
+                project["tasks"], project["next_id"] = renumber_tasks(project["tasks"])
+                renumbered = renumbered or project["next_id"] > 1
+        return renumbered
+
+    # 不加载存储，直接读取快照并重放日志，返回数据；不打开日志文件写入，也不改写快照
+    def read(self):
+        data, seq, _ = self._read_snapshot()
+        _, seq = replay_journal(self.compacting_file, data, seq)
+        replay_journal(self.journal_file, data, seq)
+        return data
+
+    # 快照为 {"seq": 包含的最后一个日志序号, "data": 数据}；旧版本的快照直接是数据，序号视为 0
+    # 返回 (数据, 序号, 实际读取的文件)，读取的文件见 load_data_file
+    def _read_snapshot(self):
+        snapshot, source = load_data_file(self.data_file)
+        if snapshot.keys() == {"seq", "data"} and isinstance(snapshot["seq"], int):
+            return snapshot["data"], snapshot["seq"], source
+        return snapshot, 0, source
+
+    @staticmethod
+    def _encode_snapshot(data, seq):
+        return encode_data({"seq": seq, "data": data})
+
+    # 把内存中的数据写成快照并删除已经包含在其中的日志
+    def _rewrite_snapshot(self):
+        atomic_write(self.data_file, self._encode_snapshot(self.data, self.seq))
+        self.snapshot_seq = self.seq
+        for path in (self.compacting_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._records = 0
+
+    def set(self, path, value):
+        self._append({"op": "set", "path": path, "value": value})
+
+    def update(self, path, fields):
+        self._append({"op": "update", "path": path, "value": fields})
+
+    def delete(self, path):
+        self._append({"op": "del", "path": path})
+
+    def move(self, path, to):
+        self._append({"op": "move", "path": path, "to": to})
+
+    def incr(self, path, value):
+        self._append({"op": "incr", "path": path, "value": value})
+
+    # 多条修改合并成一条日志记录写入
+    def batch(self, records):
+        if records:
+            self._append({"op": "batch", "ops": records})
+
+    def project_names(self):
+        return list(self.data)
+
+    def has_project(self, project_name):
+        return project_name in self.data
+
+    def tasks(self, project_name):
+        return self.data[project_name]["tasks"]
+
+    def add_project(self, project_name, next_id=1):
+        self.set([project_name], {"tasks": {}, "next_id": next_id, "stats": empty_stats()})
+
+    def project_stats(self, project_name):
+        return self.data[project_name].get("stats")
+
+    def save_stats(self, project_name, stats):
+        self.set([project_name, "stats"], stats)
+
+    def allocate_task_id(self, project_name):
+        with self.lock:
+            next_id = self.data[project_name]["next_id"]
+            self.set([project_name, "next_id"], next_id + 1)
+        return str(next_id)
+
+    def next_id(self, project_name):
+        return self.data[project_name]["next_id"]
+
+    def rename_project(self, old_name, new_name):
+        self.move([old_name], [new_name])
+
+    def delete_project(self, project_name):
+        self.delete([project_name])
+
+    def add_task(self, project_name, path, task_data, delta=None):
+        self._change(project_name, {"op": "set", "path": [project_name] + path, "value": task_data}, delta)
+
+    def update_task(self, project_name, path, fields, delta=None):
+        self._change(project_name, {"op": "update", "path": [project_name] + path, "value": fields}, delta)
+
+    def delete_task(self, project_name, path, delta=None):
+        self._change(project_name, {"op": "del", "path": [project_name] + path}, delta)
+
+    # 任务修改和统计增量合成一条日志记录
+    def _change(self, project_name, record, delta):
+        if delta is None:
+            self._append(record)
+        else:
+            self.batch([record, {"op": "incr", "path": [project_name, "stats"], "value": delta}])
+
+    def update_tasks(self, updates):
+        self.batch([
+            {"op": "update", "path": [project_name] + path, "value": fields}
+            for project_name, path, fields in updates
+        ])
+
+    # 全部项目的导入合并成一条日志记录，新项目连同任务一次写入
+    def import_projects(self, projects, deltas):
+        imported = {}
+        records = []
+        with self.lock:
+            for project_name, tasks in projects.items():
+                project = self.data.get(project_name)
+                tasks, next_id = renumber_tasks(tasks, project["next_id"] if project else 1)
+                if project is None:
+                    records.append({
+                        "op": "set",
+                        "path": [project_name],
+                        "value": {"tasks": tasks, "next_id": next_id, "stats": add_stats(empty_stats(), deltas[project_name])},
+                    })
+                else:
+                    records.extend(
+                        {"op": "set", "path": [project_name, "tasks", task_id], "value": task}
+                        for task_id, task in tasks.items()
+                    )
+                    records.append({"op": "set", "path": [project_name, "next_id"], "value": next_id})
+                    records.append({"op": "incr", "path": [project_name, "stats"], "value": deltas[project_name]})
+                imported[project_name] = tasks
+            self.batch(records)
+        return imported
+
+    # 应用到内存并追加一条日志，写入量只和本次修改的大小有关；记录当场序列化，由写入线程落盘
+    def _append(self, record):
+        with self.lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            apply_op(self.data, record)
+            background_writer.submit(self._write_line, json.dumps(record, default=task_to_json) + "\n")
+            self._records += 1
+            if self._records >= self.compact_threshold:
+                self._start_compaction()
+
+    @instrumentation.timed("journal_write")
+    def _write_line(self, line):
+        if instrumentation.enabled:
+            instrumentation.observe("日志写入字节", len(line.encode("utf-8")))
+        with self.io_lock:
+            self._journal.write(line)
+            self._journal.flush()
+            durable_writer.sync(self._journal)
+
+    def _start_compaction(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    # 压缩：轮换日志，再把轮换出的日志重放到上一份快照上写成新快照，写完后删除旧日志
+    # 轮换排在写入队列里，之前的记录都落在 .compacting 中，之后的都落在新日志中
+    # 新快照在本线程中从磁盘上的文件生成，不读内存中的数据，也就不必持有 lock，其他修改照常写入
+    def compact(self):
+        with self.compact_lock:
+            with self.lock:
+                self._records = 0
+                rotated = background_writer.submit(self._rotate_journal)
+            rotated.result()
+            data, seq, source = self._read_snapshot()
+            if seq != self.snapshot_seq or source not in (None, self.data_file):
+                # 主快照损坏、读到的是备份：缺少中间的记录，不能用它覆盖主快照，留给下次启动时处理
+                raise RuntimeError(f"{self.data_file} 不是上一次写入的快照，暂不压缩")
+            _, seq = replay_journal(self.compacting_file, data, seq)
+            atomic_write(self.data_file, self._encode_snapshot(data, seq))
+            self.snapshot_seq = seq
+            if os.path.exists(self.compacting_file):
+                os.remove(self.compacting_file)
+
+    def _rotate_journal(self):
+        with self.io_lock:
+            self._close_journal()
+            if os.path.exists(self.compacting_file) and os.path.exists(self.journal_file):
+                # 上一次压缩没有完成，新日志接在未合并的日志后面
+                with open(self.journal_file, "rb") as source, open(self.compacting_file, "ab") as target:
+                    shutil.copyfileobj(source, target)
+                    target.flush()
+                    os.fsync(target.fileno())
+                os.remove(self.journal_file)
+            elif os.path.exists(self.journal_file):
+                os.replace(self.journal_file, self.compacting_file)
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+
+    # 关闭前把尚未刷盘的日志同步落盘
+    def _close_journal(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal.close()
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        background_writer.flush()
+        with self.io_lock:
+            if self._journal is not None:
+                self._close_journal()
+                self._journal = None
+
+
+# SQLite 存储：项目和任务各占一行，每次修改是一个事务；任务在选中项目时才读取
+# 修改先作用于内存，SQL 语句当场生成参数，交给写入线程执行
+class SqliteStore(ProjectStore):
+    TASK_FIELDS = ("name", "created_time", "completed", "completed_time", "note")
+    INSERT_TASK = (
+        "INSERT INTO tasks (project_id, task_id, parent_id, name, created_time, completed, completed_time, note) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    # 统计的增量累加到已有的行上，没有对应的行时插入
+    ADD_STATS = (
+        "INSERT INTO project_stats (project_id, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (project_id, key) DO UPDATE SET value = value + excluded.value"
+    )
+    # 删除归零和超出保留天数的日期
+    PRUNE_STATS = (
+        "DELETE FROM project_stats WHERE project_id = ? AND key GLOB '[0-9]*' AND (value = 0 OR key < ?)"
+    )
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.lock = threading.RLock()  # 保护数据库连接
+        self.conn = None
+        self.project_ids = {}  # 项目名称 -> 项目行编号，保持显示顺序
+        self.next_project_id = 1  # 新项目的行编号在内存中分配，不必等待插入结果
+        self.next_task_ids = {}  # 项目名称 -> 下一个任务编号
+        self.stats = {}  # 项目名称 -> 进度统计
+        self.loaded = {}  # 已加载项目的任务字典
+        self.last_write = None  # 最近提交给写入线程的写入
+
+    def load(self):
+        with self.lock:
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            has_stats = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'project_stats'"
+            ).fetchone() is not None
+            with self.conn:
+                self.conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS projects (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE,
+                        next_task_id INTEGER NOT NULL DEFAULT 1
+                    );
+                    CREATE TABLE IF NOT EXISTS tasks (
+                        project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+                        task_id TEXT NOT NULL,
+                        parent_id TEXT,
+                        name TEXT NOT NULL,
+                        created_time TEXT NOT NULL DEFAULT '',
+                        completed INTEGER NOT NULL DEFAULT 0,
+                        completed_time TEXT NOT NULL DEFAULT '',
+                        note TEXT NOT NULL DEFAULT '',
+                        PRIMARY KEY (project_id, task_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS tasks_project ON tasks(project_id);
+                    CREATE INDEX IF NOT EXISTS tasks_parent ON tasks(project_id, parent_id);
+                    -- 进度统计，每个计数一行：key 为 total、completed 或完成日期 YYYY-MM-DD
+                    CREATE TABLE IF NOT EXISTS project_stats (
+                        project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+                        key TEXT NOT NULL,
+                        value INTEGER NOT NULL,
+                        PRIMARY KEY (project_id, key)
+                    );
+                    """
+                )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(projects)")}
+            if "next_task_id" not in columns:
+                self._renumber_tasks()
+            if not has_stats:
+                self._add_stats()
+            # 启动时只读取项目名称、任务编号计数器和进度统计
+            rows = self.conn.execute("SELECT id, name, next_task_id FROM projects ORDER BY id").fetchall()
+            self.project_ids = {name: project_id for project_id, name, _ in rows}
+            self.next_task_ids = {name: next_task_id for _, name, next_task_id in rows}
+            names = {project_id: name for project_id, name, _ in rows}
+            self.stats = {name: None for name in self.project_ids}
+            for project_id, key, value in self.conn.execute("SELECT project_id, key, value FROM project_stats"):
+                stats = self.stats[names[project_id]]
+                if stats is None:
+                    stats = self.stats[names[project_id]] = empty_stats()
+                if key in ("total", "completed"):
+                    stats[key] = value
+                else:
+                    stats["days"][key] = value
+            for stats in self.stats.values():
+                if stats is not None:
+                    prune_days(stats)
+            self.next_project_id = max(self.project_ids.values(), default=0) + 1
+            self.loaded = {}
+
+    # 旧数据库的任务编号带层级（root.1.2）：按插入顺序（父任务在前）改写成项目内递增的编号
+    def _renumber_tasks(self):
+        with self.conn:
+            self.conn.execute("ALTER TABLE projects ADD COLUMN next_task_id INTEGER NOT NULL DEFAULT 1")
+            for (project_id,) in self.conn.execute("SELECT id FROM projects").fetchall():
+                rows = self.conn.execute(
+                    "SELECT rowid, task_id, parent_id FROM tasks WHERE project_id = ? ORDER BY rowid", (project_id,)
+                ).fetchall()
+                new_ids = {task_id: str(i) for i, (_, task_id, _) in enumerate(rows, 1)}
+                self.conn.executemany(
+                    "UPDATE tasks SET task_id = ?, parent_id = ? WHERE rowid = ?",
+                    [(new_ids[task_id], new_ids.get(parent_id), rowid) for rowid, task_id, parent_id in rows],
+                )
+                self.conn.execute("UPDATE projects SET next_task_id = ? WHERE id = ?", (len(rows) + 1, project_id))
+
+    # 旧数据库没有进度统计：用聚合查询算出各项目的统计并保存，不必把任务读进内存
+    def _add_stats(self):
+        with self.conn:
+            stats = {project_id: empty_stats() for (project_id,) in self.conn.execute("SELECT id FROM projects")}
+            for project_id, total, completed in self.conn.execute(
+                "SELECT project_id, COUNT(*), SUM(completed != 0) FROM tasks GROUP BY project_id"
+            ):
+                stats[project_id]["total"] = total
+                stats[project_id]["completed"] = completed
+            for project_id, day, count in self.conn.execute(
+                "SELECT project_id, substr(completed_time, 1, 10), COUNT(*) FROM tasks "
+                "WHERE completed != 0 AND completed_time GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' "
+                "GROUP BY 1, 2"
+            ):
+                stats[project_id]["days"][day] = count
+            for project_id, project_stats in stats.items():
+                self.conn.executemany(self.ADD_STATS, self._stats_rows(project_id, prune_days(project_stats)))
+
+    def project_names(self):
+        return list(self.project_ids)
+
+    def has_project(self, project_name):
+        return project_name in self.project_ids
+
+    # 第一次访问时读取该项目的全部任务并组装成树
+    def tasks(self, project_name):
+        if project_name not in self.loaded:
+            self._wait_writes()
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT task_id, parent_id, name, created_time, completed, completed_time, note "
+                    "FROM tasks WHERE project_id = ? ORDER BY rowid",
+                    (self.project_ids[project_name],),
+                ).fetchall()
+            nodes = {}
+            for task_id, parent_id, name, created_time, completed, completed_time, note in rows:
+                nodes[task_id] = Task(
+                    task_id, name, parse_time(created_time), bool(completed), parse_time(completed_time), note
+                )
+            tasks = {}
+            for task_id, parent_id, *_ in rows:
+                if parent_id is None:
+                    tasks[task_id] = nodes[task_id]
+                else:
+                    parent = nodes[parent_id]
+                    if parent.children is None:
+                        parent.children = []
+                    parent.children.append(nodes[task_id])
+            self.loaded[project_name] = tasks
+        return self.loaded[project_name]
+
+    # 未加载的项目只读取需要索引的列，不组装任务树
+    def search_rows(self, project_name):
+        if project_name in self.loaded:
+            return task_texts(self.loaded[project_name])
+        self._wait_writes()
+        with self.lock:
+            return self.conn.execute(
+                "SELECT task_id, name, note FROM tasks WHERE project_id = ?", (self.project_ids[project_name],)
+            ).fetchall()
+
+    # 在写入线程中用一个事务执行若干条 (SQL, 参数列表)
+    @instrumentation.timed("sqlite_write")
+    def _execute(self, statements):
+        if instrumentation.enabled:
+            instrumentation.observe("SQLite 写入行数", sum(len(rows) for _, rows in statements))
+        with self.lock, self.conn:
+            for sql, rows in statements:
+                self.conn.executemany(sql, rows)
+
+    def _write(self, *statements):
+        self.last_write = background_writer.submit(self._execute, statements)
+
+    # 从数据库读取前等待已提交的写入完成，否则未加载的项目会读到缺少排队中修改的旧行
+    # 写入按提交顺序执行，等最近的一次即可；写入失败已由写入线程报告，这里只等待
+    def _wait_writes(self):
+        if self.last_write is not None:
+            self.last_write.exception()
+
+    def add_project(self, project_name, next_id=1):
+        project_id = self.next_project_id
+        self.next_project_id += 1
+        self.project_ids[project_name] = project_id
+        self.next_task_ids[project_name] = next_id
+        self.stats[project_name] = stats = empty_stats()
+        self.loaded[project_name] = {}
+        self._write(
+            ("INSERT INTO projects (id, name, next_task_id) VALUES (?, ?, ?)", [(project_id, project_name, next_id)]),
+            (self.ADD_STATS, self._stats_rows(project_id, stats)),
+        )
+
+    def project_stats(self, project_name):
+        return self.stats.get(project_name)
+
+    def save_stats(self, project_name, stats):
+        self.stats[project_name] = prune_days(stats)
+        project_id = self.project_ids[project_name]
+        self._write(
+            ("DELETE FROM project_stats WHERE project_id = ?", [(project_id,)]),
+            (self.ADD_STATS, self._stats_rows(project_id, stats)),
+        )
+
+    # 完整统计对应的 project_stats 行，行在这里生成，写入线程执行时不受之后修改的影响
+    @staticmethod
+    def _stats_rows(project_id, stats):
+        rows = [(project_id, "total", stats["total"]), (project_id, "completed", stats["completed"])]
+        rows.extend((project_id, day, count) for day, count in stats["days"].items())
+        return rows
+
+    # 增量不为 None 时加到内存中的统计上，返回累加各计数的语句，与任务修改在同一个事务中执行
+    def _stats_changes(self, project_name, delta):
+        if delta is None:
+            return []
+        add_stats(self.stats[project_name], delta)
+        project_id = self.project_ids[project_name]
+        rows = [(project_id, key, delta[key]) for key in ("total", "completed") if delta[key]]
+        rows.extend((project_id, day, count) for day, count in delta["days"].items())
+        return [(self.ADD_STATS, rows), (self.PRUNE_STATS, [(project_id, oldest_stats_day())])]
+
+    def allocate_task_id(self, project_name):
+        next_id = self.next_task_ids[project_name]
+        self.next_task_ids[project_name] = next_id + 1
+        self._write((
+            "UPDATE projects SET next_task_id = ? WHERE id = ?", [(next_id + 1, self.project_ids[project_name])]
+        ))
+        return str(next_id)
+
+    def next_id(self, project_name):
+        return self.next_task_ids[project_name]
+
+    def rename_project(self, old_name, new_name):
+        project_id = self.project_ids.pop(old_name)
+        self.project_ids[new_name] = project_id
+        self.next_task_ids[new_name] = self.next_task_ids.pop(old_name)
+        self.stats[new_name] = self.stats.pop(old_name)
+        if old_name in self.loaded:
+            self.loaded[new_name] = self.loaded.pop(old_name)
+        self._write(("UPDATE projects SET name = ? WHERE id = ?", [(new_name, project_id)]))
+
+    def delete_project(self, project_name):
+        self.loaded.pop(project_name, None)
+        self.next_task_ids.pop(project_name, None)
+        self.stats.pop(project_name, None)
+        self._write(("DELETE FROM projects WHERE id = ?", [(self.project_ids.pop(project_name),)]))
+
+    def add_task(self, project_name, path, task_data, delta=None):
+        rows = self._task_rows(self.project_ids[project_name], path[-1], path[-3] if len(path) > 2 else None, task_data)
+        if project_name in self.loaded:
+            apply_op(self.loaded, {"op": "set", "path": [project_name] + path[1:], "value": task_data})
+        self._write((self.INSERT_TASK, rows), *self._stats_changes(project_name, delta))
+
+    # 任务及其全部子任务对应的行，父任务在前，同级任务保持原顺序
+    def _task_rows(self, project_id, task_id, parent_id, task_data):
+        rows = []
+        stack = [(task_id, parent_id, task_data)]
+        while stack:
+            task_id, parent_id, task_data = stack.pop()
+            rows.append((
+                project_id,
+                task_id,
+                parent_id,
+                task_data.get("name", ""),
+                task_data.get("created_time", ""),
+                int(bool(task_data.get("completed", False))),
+                task_data.get("completed_time", ""),
+                task_data.get("note", ""),
+            ))
+            # 逆序入栈，保证同级任务按原顺序插入
+            for subtask_id, subtask in reversed(list(task_data.get("subtasks", {}).items())):
+                stack.append((subtask_id, task_id, subtask))
+        return rows
+
+    def update_task(self, project_name, path, fields, delta=None):
+        self._write(self._update_row(project_name, path, fields), *self._stats_changes(project_name, delta))
+
+    def update_tasks(self, updates):
+        statements = [self._update_row(project_name, path, fields) for project_name, path, fields in updates]
+        if statements:
+            self._write(*statements)
+
+    # 新项目的行、计数器、统计和全部任务行在同一个事务中写入
+    def import_projects(self, projects, deltas):
+        imported = {}
+        project_rows = []
+        counter_rows = []
+        task_rows = []
+        stats_changes = []
+        for project_name, tasks in projects.items():
+            if project_name in self.project_ids:
+                project_id = self.project_ids[project_name]
+                tasks, next_id = renumber_tasks(tasks, self.next_task_ids[project_name])
+                if project_name in self.loaded:
+                    self.loaded[project_name].update(tasks)
+                counter_rows.append((next_id, project_id))
+                stats_changes.extend(self._stats_changes(project_name, deltas[project_name]))
+            else:
+                project_id = self.project_ids[project_name] = self.next_project_id
+                self.next_project_id += 1
+                tasks, next_id = renumber_tasks(tasks)
+                self.loaded[project_name] = tasks
+                project_rows.append((project_id, project_name, next_id))
+                stats = self.stats[project_name] = add_stats(empty_stats(), deltas[project_name])
+                stats_changes.append((self.ADD_STATS, self._stats_rows(project_id, stats)))
+            self.next_task_ids[project_name] = next_id
+            for task_id, task in tasks.items():
+                task_rows.extend(self._task_rows(project_id, task_id, None, task))
+            imported[project_name] = tasks
+        self._write(
+            ("INSERT INTO projects (id, name, next_task_id) VALUES (?, ?, ?)", project_rows),
+            ("UPDATE projects SET next_task_id = ? WHERE id = ?", counter_rows),
+            (self.INSERT_TASK, task_rows),
+            *stats_changes,
+        )
+        return imported
+
+    def _update_row(self, project_name, path, fields):
+        columns = [field for field in fields if field in self.TASK_FIELDS]
+        values = [int(fields[field]) if field == "completed" else fields[field] for field in columns]
+        if project_name in self.loaded:
+            apply_op(self.loaded, {"op": "update", "path": [project_name] + path[1:], "value": fields})
+        return (
+            f"UPDATE tasks SET {', '.join(f'{column} = ?' for column in columns)} WHERE project_id = ? AND task_id = ?",
+            [values + [self.project_ids[project_name], path[-1]]],
+        )
+
+    def delete_task(self, project_name, path, delta=None):
+        project_id = self.project_ids[project_name]
+        if project_name in self.loaded:
+            apply_op(self.loaded, {"op": "del", "path": [project_name] + path[1:]})
+        self._write(*self._stats_changes(project_name, delta), (
+            """
+            WITH RECURSIVE subtree(task_id) AS (
+                SELECT ?
+                UNION ALL
+                SELECT tasks.task_id FROM tasks JOIN subtree ON tasks.parent_id = subtree.task_id
+                WHERE tasks.project_id = ?
+            )
+            DELETE FROM tasks WHERE project_id = ? AND task_id IN subtree
+            """,
+            [(path[-1], project_id, project_id)],
+        ))
+
+    def close(self):
+        background_writer.flush()
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+# 分片存储的清单：{"projects": {项目名称: {"file": 分片文件名, "tasks": 任务数, "stats": 进度统计}}, "next_file": n}
+# 与项目数据一样用快照加日志保存，任务数和统计的变化只追加一条 incr 记录
+class ManifestStore(JournalStore):
+    def __init__(self, manifest_file):
+        super().__init__(manifest_file, manifest_file + ".journal")
+
+    # 还没有快照时立即写出一份，旧版本的清单把项目列表改成按名称索引后同样立即写回
+    def _prepare(self):
+        rewrite = not os.path.exists(self.data_file)
+        projects = self.data.setdefault("projects", {})
+        if isinstance(projects, list):
+            self.data["projects"] = {
+                entry["name"]: {"file": entry["file"], "tasks": entry["tasks"], "stats": entry.get("stats")}
+                for entry in projects
+            }
+            rewrite = True
+        self.data.setdefault("next_file", 1)
+        return rewrite
+
+
+# 分片存储：启动只读清单，项目的任务在首次访问时加载，超出缓存预算时按 LRU 淘汰
+# 从取出分片到写入完成都持有 lock，期间其他线程加载分片也不会把它淘汰并关闭
+class ShardedStore(ProjectStore):
+    def __init__(self, shard_dir=SHARD_DIR, cache_budget=TASK_CACHE_BUDGET):
+        self.shard_dir = shard_dir
+        self.manifest_store = ManifestStore(os.path.join(shard_dir, "manifest.json"))
+        self.cache_budget = cache_budget
+        self.lock = threading.RLock()
+        self.cache = OrderedDict()  # 项目名称 -> 已加载的分片，最近使用的在最后
+
+    def load(self):
+        with self.lock:
+            os.makedirs(self.shard_dir, exist_ok=True)
+            self.manifest_store.load()
+
+    # 项目名称 -> 清单中的项目信息，保持显示顺序
+    @property
+    def manifest(self):
+        return self.manifest_store.data["projects"]
+
+    # 登记新项目的清单记录，分配分片文件名
+    def _register(self, project_name, stats):
+        next_file = self.manifest_store.data["next_file"]
+        return [
+            {
+                "op": "set",
+                "path": ["projects", project_name],
+                "value": {"file": f"project-{next_file}.json", "tasks": 0, "stats": stats},
+            },
+            {"op": "set", "path": ["next_file"], "value": next_file + 1},
+        ]
+
+    # 任务数和统计增量对应的清单记录
+    @staticmethod
+    def _counts(project_name, tasks, delta):
+        records = [{"op": "incr", "path": ["projects", project_name, "tasks"], "value": tasks}]
+        if delta is not None:
+            records.append({"op": "incr", "path": ["projects", project_name, "stats"], "value": delta})
+        return records
+
+    # 取出项目的分片，未加载时先加载并按预算淘汰其他项目
+    def _shard(self, project_name):
+        with self.lock:
+            if project_name in self.cache:
+                self.cache.move_to_end(project_name)
+                return self.cache[project_name]
+            data_file = os.path.join(self.shard_dir, self.manifest[project_name]["file"])
+            shard = JournalStore(data_file, data_file + ".journal", project_file=True)
+            shard.load()
+            self.cache[project_name] = shard
+            self._evict()
+            return shard
+
+    def _evict(self):
+        cached = sum(self.manifest[name]["tasks"] for name in self.cache)
+        while cached > self.cache_budget and len(self.cache) > 1:
+            project_name, shard = self.cache.popitem(last=False)
+            shard.close()
+            cached -= self.manifest[project_name]["tasks"]
+            if self.on_evict:
+                self.on_evict(project_name)
+
+    def project_names(self):
+        return list(self.manifest)
+
+    def has_project(self, project_name):
+        return project_name in self.manifest
+
+    def tasks(self, project_name):
+        return self._shard(project_name).data["tasks"]
+
+    # 未缓存的项目直接读取分片，不加入缓存，也不会淘汰其他项目
+    def search_rows(self, project_name):
+        with self.lock:
+            if project_name in self.cache:
+                return list(task_texts(self.cache[project_name].data["tasks"]))
+            data_file = os.path.join(self.shard_dir, self.manifest[project_name]["file"])
+            data = JournalStore(data_file, data_file + ".journal", project_file=True).read()
+            return list(task_texts(data.get("tasks", {})))
+
+    def add_project(self, project_name, next_id=1):
+        with self.lock:
+            self.manifest_store.batch(self._register(project_name, empty_stats()))
+            # 新分片也记下计数器，重新加载时不会被当成需要改写编号的旧数据
+            self._shard(project_name).set(["next_id"], next_id)
+
+    # 统计放在清单中，显示项目列表时不必加载分片
+    def project_stats(self, project_name):
+        return self.manifest[project_name]["stats"]
+
+    def save_stats(self, project_name, stats):
+        self.manifest_store.set(["projects", project_name, "stats"], prune_days(stats))
+
+    def allocate_task_id(self, project_name):
+        with self.lock:
+            shard = self._shard(project_name)
+            next_id = shard.data["next_id"]
+            shard.set(["next_id"], next_id + 1)
+        return str(next_id)
+
+    def next_id(self, project_name):
+        return self._shard(project_name).data["next_id"]
+
+    # 改名只修改清单，分片文件名不变；整个项目表写成一条记录以保持显示顺序
+    def rename_project(self, old_name, new_name):
+        with self.lock:
+            projects = {(new_name if name == old_name else name): entry for name, entry in self.manifest.items()}
+            self.manifest_store.set(["projects"], projects)
+            if old_name in self.cache:
+                self.cache[new_name] = self.cache.pop(old_name)
+
+    def delete_project(self, project_name):
+        with self.lock:
+            shard = self.cache.pop(project_name, None)
+            if shard is not None:
+                shard.close()
+            data_file = os.path.join(self.shard_dir, self.manifest[project_name]["file"])
+            self.manifest_store.delete(["projects", project_name])
+            backups = [f"{data_file}.bak.{i}" for i in range(1, SNAPSHOT_BACKUPS + 1)]
+            for path in [data_file, data_file + ".journal", data_file + ".journal.compacting"] + backups:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def add_task(self, project_name, path, task_data, delta=None):
+        with self.lock:
+            self._shard(project_name).set(path, task_data)
+            self.manifest_store.batch(self._counts(project_name, count_tasks(task_data), delta))
+
+    def update_task(self, project_name, path, fields, delta=None):
+        with self.lock:
+            self._shard(project_name).update(path, fields)
+            if delta is not None:
+                self.manifest_store.incr(["projects", project_name, "stats"], delta)
+
+    def update_tasks(self, updates):
+        by_project = {}
+        for project_name, path, fields in updates:
+            by_project.setdefault(project_name, []).append({"op": "update", "path": path, "value": fields})
+        with self.lock:
+            for project_name, records in by_project.items():
+                self._shard(project_name).batch(records)
+
+    # 每个项目的分片写一条日志记录；新项目先登记到清单，最后统一更新任务数和统计
+    def import_projects(self, projects, deltas):
+        imported = {}
+        with self.lock:
+            for project_name in projects:
+                if project_name not in self.manifest:
+                    self.manifest_store.batch(self._register(project_name, empty_stats()))
+            counts = []
+            for project_name, tasks in projects.items():
+                shard = self._shard(project_name)
+                with shard.lock:
+                    tasks, next_id = renumber_tasks(tasks, shard.data["next_id"])
+                    records = [{"op": "set", "path": ["tasks", task_id], "value": task} for task_id, task in tasks.items()]
+                    records.append({"op": "set", "path": ["next_id"], "value": next_id})
+                    shard.batch(records)
+                counts.extend(self._counts(
+                    project_name, sum(count_tasks(task) for task in tasks.values()), deltas[project_name]
+                ))
+                imported[project_name] = tasks
+            self.manifest_store.batch(counts)
+        return imported
+
+    def delete_task(self, project_name, path, delta=None):
+        with self.lock:
+            shard = self._shard(project_name)
+            task_data = shard.data
+            for key in path:
+                task_data = task_data[key]
+            removed = count_tasks(task_data)
+            shard.delete(path)
+            self.manifest_store.batch(self._counts(project_name, -removed, delta))
+
+    def close(self):
+        with self.lock:
+            for shard in self.cache.values():
+                shard.close()
+            self.cache.clear()
+            self.manifest_store.close()
+        durable_writer.flush()
+
+
+# 一次性迁移：把 projects.json（含未压缩的日志）拆成分片，最后写清单
+def migrate_json_to_sharded(data_file=DATA_FILE, shard_dir=SHARD_DIR):
+    source = JournalStore(data_file, data_file + ".journal")
+    data = source.load()
+    source.close()
+    os.makedirs(shard_dir, exist_ok=True)
+    projects = {}
+    for next_file, (project_name, project) in enumerate(data.items(), 1):
+        tasks = project.get("tasks", {})
+        entry = {
+            "file": f"project-{next_file}.json",
+            "tasks": sum(count_tasks(task_data) for task_data in tasks.values()),
+            "stats": prune_days(project.get("stats") or tasks_stats(tasks)),
+        }
+        save_data({"tasks": tasks, "next_id": project["next_id"]}, os.path.join(shard_dir, entry["file"]))
+        projects[project_name] = entry
+    save_data({"projects": projects, "next_file": len(projects) + 1}, os.path.join(shard_dir, "manifest.json"))
+    durable_writer.flush()
+
+
+# 一次性迁移：把 projects.json（含未压缩的日志）导入 SQLite 数据库
+def migrate_json_to_sqlite(data_file=DATA_FILE, db_file=DB_FILE):
+    source = JournalStore(data_file, data_file + ".journal")
+    data = source.load()
+    source.close()
+    # 先写到临时数据库，完整导入后再改名，中途失败不会留下半个数据库
+    tmp_file = db_file + ".tmp"
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    target = SqliteStore(tmp_file)
+    target.load()
+    with target.lock, target.conn:
+        for project_name, project in data.items():
+            tasks = project.get("tasks", {})
+            cursor = target.conn.execute(
+                "INSERT INTO projects (name, next_task_id) VALUES (?, ?)", (project_name, project["next_id"])
+            )
+            stats = prune_days(project.get("stats") or tasks_stats(tasks))
+            target.conn.executemany(target.ADD_STATS, target._stats_rows(cursor.lastrowid, stats))
+            for task_id, task_data in tasks.items():
+                target.conn.executemany(target.INSERT_TASK, target._task_rows(cursor.lastrowid, task_id, None, task_data))
+    target.close()
+    os.replace(tmp_file, db_file)
+
+
+# 是否有 JSON 存储的数据；从未压缩过的存储只有日志文件，没有快照
+def json_store_exists(data_file=DATA_FILE):
+    return any(os.path.exists(path) for path in (data_file, data_file + ".journal", data_file + ".journal.compacting"))
+
+
+# 按 STORAGE_BACKEND 打开存储
+def open_store(backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend == "sqlite":
+        if not os.path.exists(DB_FILE) and json_store_exists():
+            migrate_json_to_sqlite()
+        store = SqliteStore()
+    elif backend == "sharded":
+        if not os.path.exists(os.path.join(SHARD_DIR, "manifest.json")) and json_store_exists():
+            migrate_json_to_sharded()
+        store = ShardedStore()
+    else:
+        store = JournalStore()
+    store.load()
+    return store
+
+
+# 任务索引：任务编号 -> 任务数据 / 父任务编号，任意层级都是常数时间查找
+# 父任务指针让删除子树时不必扫描或改写其他任务的编号
+class TaskIndex:
+    def __init__(self, tasks):
+        self.tasks = tasks  # 项目的根任务字典
+        self.nodes = {}  # 任务编号 -> 任务数据
+        self.parents = {}  # 任务编号 -> 父任务编号，根任务为 None
+        self.depths = {}  # 任务编号 -> 层级，根任务为 0
+        self.counts = {}  # 任务编号 -> [已完成的后代数, 后代总数]
+        self.ordinals = {}  # 父任务编号 -> {子任务编号: 在同级中的序号}，显示时才计算，子任务增删后作废
+        self.filters = None  # 筛选用的 FilterIndex，第一次筛选时才建立
+        for task_id, task in tasks.items():
+            self.add(task_id, task)
+
+    def __contains__(self, task_id):
+        return task_id in self.nodes
+
+    def get(self, task_id):
+        return self.nodes[task_id]
+
+    # 任务在项目数据中的路径，例如 ["tasks", "1", "subtasks", "7"]
+    def path(self, task_id):
+        path = []
+        while task_id is not None:
+            parent_id = self.parents[task_id]
+            path[:0] = ["subtasks" if parent_id is not None else "tasks", task_id]
+            task_id = parent_id
+        return path
+
+    # 界面上显示的序号，例如 "2.1.3"：每一级是任务在同级中的位置，删除任务后自动顺延
+    def number(self, task_id):
+        parts = []
+        while task_id is not None:
+            parent_id = self.parents[task_id]
+            parts.append(str(self.sibling_ordinals(parent_id)[task_id]))
+            task_id = parent_id
+        return ".".join(reversed(parts))
+
+    # parent_id（None 为根任务）的各子任务在同级中的序号
+    def sibling_ordinals(self, parent_id):
+        ordinals = self.ordinals.get(parent_id)
+        if ordinals is None:
+            siblings = self.tasks if parent_id is None else self.nodes[parent_id].get("subtasks", {})
+            ordinals = self.ordinals[parent_id] = {sibling_id: i for i, sibling_id in enumerate(siblings, 1)}
+        return ordinals
+
+    def filter_index(self):
+        if self.filters is None:
+            self.filters = FilterIndex(self.nodes)
+        return self.filters
+
+    # 从父任务开始依次向上的祖先编号
+    def ancestors(self, task_id):
+        task_id = self.parents[task_id]
+        while task_id is not None:
+            yield task_id
+            task_id = self.parents[task_id]
+
+    # 登记任务及其全部子任务，并把子树的计数累加到祖先上
+    def add(self, task_id, task, parent_id=None):
+        subtree_id = task_id
+        order = []
+        stack = [(task_id, task, parent_id)]
+        while stack:
+            task_id, task, parent_id = stack.pop()
+            self.nodes[task_id] = task
+            self.parents[task_id] = parent_id
+            self.depths[task_id] = 0 if parent_id is None else self.depths[parent_id] + 1
+            order.append(task_id)
+            for subtask_id, subtask in task.get("subtasks", {}).items():
+                stack.append((subtask_id, subtask, task_id))
+        # 逆序遍历保证子任务先于父任务算好
+        for task_id in reversed(order):
+            done = total = 0
+            for subtask_id, subtask in self.nodes[task_id].get("subtasks", {}).items():
+                done += self.counts[subtask_id][0] + bool(subtask.get("completed"))
+                total += self.counts[subtask_id][1] + 1
+            self.counts[task_id] = [done, total]
+        done, total = self.counts[subtree_id]
+        self._propagate(subtree_id, done + bool(self.nodes[subtree_id].get("completed")), total + 1)
+        self.ordinals.pop(self.parents[subtree_id], None)
+        if self.filters is not None:
+            for task_id in order:
+                self.filters.add(task_id, self.nodes[task_id])
+
+    # 移除任务及其全部子任务，返回被移除的编号
+    def remove(self, task_id):
+        done, total = self.counts[task_id]
+        self._propagate(task_id, -done - bool(self.nodes[task_id].get("completed")), -total - 1)
+        self.ordinals.pop(self.parents[task_id], None)
+        removed = []
+        stack = [task_id]
+        while stack:
+            task_id = stack.pop()
+            task = self.nodes.pop(task_id)
+            del self.parents[task_id]
+            del self.depths[task_id]
+            del self.counts[task_id]
+            self.ordinals.pop(task_id, None)
+            if self.filters is not None:
+                self.filters.remove(task_id)
+            removed.append(task_id)
+            stack.extend(task.get("subtasks", {}))
+        return removed
+
+    # 任务完成状态改变后调整祖先的已完成计数
+    def completion_changed(self, task_id, was_completed, completed):
+        if bool(was_completed) != bool(completed):
+            self._propagate(task_id, 1 if completed else -1, 0)
+
+    # 任务的完成状态或完成时间已修改，更新筛选索引中的记录
+    def times_changed(self, task_id):
+        if self.filters is not None:
+            self.filters.remove(task_id)
+            self.filters.add(task_id, self.nodes[task_id])
+
+    def _propagate(self, task_id, done, total):
+        for ancestor_id in self.ancestors(task_id):
+            self.counts[ancestor_id][0] += done
+            self.counts[ancestor_id][1] += total
+
+
+# 任务筛选用的二级索引：完成状态集合，以及按创建时间、完成时间排好序的 (时间戳, 任务编号) 列表
+# 筛选时用二分查找取出时间范围内的任务，不必遍历整个项目；随任务增删和完成状态变化增量维护
+class FilterIndex:
+    FIELDS = ("created", "completed")
+
+    def __init__(self, nodes):
+        self.completed = set()
+        self.incomplete = set()
+        self.keys = {field: {} for field in self.FIELDS}  # 字段 -> {任务编号: 时间戳}，没有可用时间的任务不在其中
+        for task_id, task in nodes.items():
+            (self.completed if task.get("completed") else self.incomplete).add(task_id)
+            for field, value in self._times(task):
+                self.keys[field][task_id] = value
+        self.times = {
+            field: sorted((value, task_id) for task_id, value in keys.items()) for field, keys in self.keys.items()
+        }
+
+    # 任务的创建时间和完成时间（未完成或时间无法换算的不计）
+    @staticmethod
+    def _times(task):
+        if isinstance(task.created, int):
+            yield "created", task.created
+        if task.completed and isinstance(task.completed_at, int):
+            yield "completed", task.completed_at
+
+    def add(self, task_id, task):
+        (self.completed if task.get("completed") else self.incomplete).add(task_id)
+        for field, value in self._times(task):
+            self.keys[field][task_id] = value
+            bisect.insort(self.times[field], (value, task_id))
+
+    def remove(self, task_id):
+        self.completed.discard(task_id)
+        self.incomplete.discard(task_id)
+        for field in self.FIELDS:
+            value = self.keys[field].pop(task_id, None)
+            if value is not None:
+                entries = self.times[field]
+                del entries[bisect.bisect_left(entries, (value, task_id))]
+
+    # 符合条件的任务编号；status 为 "all" 且没有时间范围时返回 None，表示全部任务
+    def match(self, status, field=None, start=None):
+        if field is None:
+            return {"completed": self.completed, "incomplete": self.incomplete}.get(status)
+        entries = self.times[field]
+        task_ids = [task_id for _, task_id in entries[bisect.bisect_left(entries, (start,)):]]
+        if status == "completed":
+            return [task_id for task_id in task_ids if task_id in self.completed]
+        if status == "incomplete":
+            return [task_id for task_id in task_ids if task_id in self.incomplete]
+        return task_ids
+
+
+# 中文等表意文字按字切分，其余按单词切分；"bug修复" 这样的混排文字在中英文交界处断开
+TOKEN_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+|[^\W_\u3400-\u9fff\uf900-\ufaff]+")
+
+
+def is_cjk(text):
+    return "\u3400" <= text[0] <= "\u9fff" or "\uf900" <= text[0] <= "\ufaff"
+
+
+# 文本 -> 索引词：单词小写，中文取单字和相邻两字
+def search_tokens(text):
+    tokens = set()
+    for run in TOKEN_PATTERN.findall(text.lower()):
+        if is_cjk(run):
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run)
+    return tokens
+
+
+# 全文搜索倒排索引：词 -> {(项目名称, 任务编号)}，覆盖所有项目的任务名称和备注
+class SearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = {}  # 词 -> 包含该词的任务
+        self.vocabulary = []  # 排好序的全部词，用于前缀匹配
+        self.docs = {}  # (项目名称, 任务编号) -> 该任务的词
+        self.projects = {}  # 项目名称 -> 已索引的任务编号
+
+    # 新增或更新一个任务，只改动变化的词
+    def index_task(self, project_name, task_id, task_data):
+        self.index_row(project_name, task_id, task_data.get("name", ""), task_data.get("note", ""))
+
+    def index_row(self, project_name, task_id, name, note):
+        key = (project_name, task_id)
+        tokens = search_tokens(f"{name} {note}")
+        with self.lock:
+            old_tokens = self.docs.get(key, set())
+            for token in old_tokens - tokens:
+                self._unpost(token, key)
+            for token in tokens - old_tokens:
+                if token not in self.postings:
+                    self.postings[token] = set()
+                    bisect.insort(self.vocabulary, token)
+                self.postings[token].add(key)
+            self.docs[key] = tokens
+            self.projects.setdefault(project_name, set()).add(task_id)
+
+    # 索引一个项目的全部任务
+    def index_tasks(self, project_name, tasks):
+        self.index_rows(project_name, task_texts(tasks))
+
+    # 按 (任务编号, 名称, 备注) 索引一个项目的任务
+    def index_rows(self, project_name, rows):
+        for task_id, name, note in rows:
+            self.index_row(project_name, task_id, name, note)
+
+    def remove_task(self, project_name, task_id):
+        key = (project_name, task_id)
+        with self.lock:
+            for token in self.docs.pop(key, ()):
+                self._unpost(token, key)
+            self.projects.get(project_name, set()).discard(task_id)
+
+    def _unpost(self, token, key):
+        postings = self.postings[token]
+        postings.discard(key)
+        if not postings:
+            del self.postings[token]
+            del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def remove_project(self, project_name):
+        for task_id in list(self.projects.get(project_name, ())):
+            self.remove_task(project_name, task_id)
+        self.projects.pop(project_name, None)
+
+    def rename_project(self, old_name, new_name):
+        with self.lock:
+            task_ids = self.projects.pop(old_name, set())
+            for task_id in task_ids:
+                tokens = self.docs.pop((old_name, task_id))
+                for token in tokens:
+                    self.postings[token].discard((old_name, task_id))
+                    self.postings[token].add((new_name, task_id))
+                self.docs[(new_name, task_id)] = tokens
+            self.projects[new_name] = task_ids
+
+    # 以 prefix 开头的全部词所对应的任务
+    def _prefix_matches(self, prefix):
+        matches = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self.postings[token]
+        return matches
+
+    # 搜索：所有查询词都要命中；单词按前缀匹配，中文按相邻两字匹配
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        terms = []
+        for run in TOKEN_PATTERN.findall(query.lower()):
+            if is_cjk(run) and len(run) > 1:
+                terms.extend(("exact", run[i:i + 2]) for i in range(len(run) - 1))
+            else:
+                terms.append(("exact" if is_cjk(run) else "prefix", run))
+        if not terms:
+            return []
+        with self.lock:
+            # 先算命中少的词，尽早缩小候选集
+            candidates = None
+            for kind, term in sorted(terms, key=lambda term: len(self.postings.get(term[1], ()))):
+                matches = self.postings.get(term, set()) if kind == "exact" else self._prefix_matches(term)
+                candidates = set(matches) if candidates is None else candidates & matches
+                if not candidates:
+                    return []
+        return sorted(candidates)[:limit]
+
+
+# 延迟合并写入：连续的编辑在停顿 quiet 秒后统一写一次，最迟不超过 max_delay 秒
+class SaveScheduler:
+    def __init__(self, write, quiet=NOTE_SAVE_QUIET, max_delay=NOTE_SAVE_MAX_DELAY, on_flush=None):
+        self.write = write  # 接收 {键: 值} 的批量写入函数
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.lock = threading.Lock()
+        self._pending = {}
+        self._first_time = None
+        self._timer = None
+
+    # 登记一次修改，同一个键只保留最后的值
+    def schedule(self, key, value):
+        with self.lock:
+            self._pending[key] = value
+            now = time.monotonic()
+            if self._first_time is None:
+                self._first_time = now
+            delay = min(self.quiet, self._first_time + self.max_delay - now)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(max(delay, 0), self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    # 立即写入所有待保存的修改
+    def flush(self, notify=True):
+        with self.lock:
+            pending, self._pending = self._pending, {}
+            self._first_time = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            self.write(pending)
+            if notify and self.on_flush:
+                self.on_flush(pending)
+
+
+# 进程内共享的工作区：所有会话共用同一个存储、任务索引和搜索索引，数据在内存中只保存一份
+# 项目列表和索引表由 lock 保护，同一项目的修改由该项目自己的锁串行化
+class Workspace:
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.project_locks = {}  # 项目名称 -> 该项目的锁
+        self.indexes = {}  # 项目名称 -> TaskIndex，首次访问时建立
+        self.search_index = None  # 第一次搜索时建立，之后随任务修改增量维护
+        self.search_lock = threading.Lock()  # 同一时间只有一个线程建立搜索索引
+        self.search_ready = False  # 搜索索引已包含全部项目
+        self.sessions = 0
+        self.error_handlers = []  # 各会话的写入失败提示
+        store.on_evict = self.forget_project
+
+    def project_lock(self, project_name):
+        with self.lock:
+            return self.project_locks.setdefault(project_name, threading.RLock())
+
+    # 项目数据被存储淘汰后，下次访问时按重新加载的数据重建索引
+    def forget_project(self, project_name):
+        with self.lock:
+            self.indexes.pop(project_name, None)
+
+    # 项目的进度统计（随任务修改增量维护）；旧数据中没有时遍历一次任务算出并保存
+    def project_stats(self, project_name):
+        stats = self.store.project_stats(project_name)
+        if stats is None:
+            with self.project_lock(project_name):
+                stats = self.store.project_stats(project_name)
+                if stats is None:
+                    stats = tasks_stats(self.store.tasks(project_name))
+                    self.store.save_stats(project_name, stats)
+        return stats
+
+    # 任务（连同子任务）加入或移出项目带来的统计增量；旧数据还没有统计时先算出完整的统计，之后只写增量
+    def stats_delta(self, project_name, task, sign=1):
+        self.project_stats(project_name)
+        return tally_tasks(empty_stats(), task, sign)
+
+    def task_index(self, project_name):
+        index = self.indexes.get(project_name)
+        if index is None:
+            with self.project_lock(project_name):
+                index = self.indexes.get(project_name)
+                if index is None:
+                    index = self.indexes[project_name] = TaskIndex(self.store.tasks(project_name))
+        return index
+
+    # 第一次搜索前建立搜索索引，在线程池中调用；逐个项目从存储读取，不把项目放进缓存
+    # 索引先挂到工作区上，建立期间的修改照常增量更新它；每个项目只在读取时持有该项目的锁
+    # 建立期间新增或改名的项目在下一轮补上
+    def ensure_search_index(self):
+        with self.search_lock:
+            if not self.search_ready:
+                with self.lock:
+                    self.search_index = search_index = SearchIndex()
+                indexed = set()
+                pending = self.store.project_names()
+                while pending:
+                    for project_name in pending:
+                        with self.project_lock(project_name):
+                            if self.store.has_project(project_name):
+                                search_index.index_rows(project_name, self.store.search_rows(project_name))
+                        indexed.add(project_name)
+                    pending = [name for name in self.store.project_names() if name not in indexed]
+                self.search_ready = True
+        return self.search_index
+
+    # 任务名称或备注变化后更新搜索索引
+    def reindex_task(self, project_name, task_id):
+        if self.search_index is not None:
+            self.search_index.index_task(project_name, task_id, self.task_index(project_name).get(task_id))
+
+    def unindex_tasks(self, project_name, task_ids):
+        if self.search_index is not None:
+            for task_id in task_ids:
+                self.search_index.remove_task(project_name, task_id)
+
+    # 任务仍然存在时返回所在项目的锁，否则返回 None
+    def task_lock(self, project_name, task_id):
+        if self.store.has_project(project_name) and task_id in self.task_index(project_name):
+            return self.project_lock(project_name)
+        return None
+
+    # 新任务挂在 parent_task_id 下（None 为根任务）时要取的锁，项目或父任务已不存在时返回 None
+    def parent_lock(self, project_name, parent_task_id):
+        if parent_task_id is None:
+            return self.project_lock(project_name) if self.store.has_project(project_name) else None
+        return self.task_lock(project_name, parent_task_id)
+
+    # 以下任务操作只修改数据和索引，界面刷新与广播由调用方负责；任务已被删除时返回 None
+
+    # 添加任务，parent_task_id 为 None 时添加根任务，返回新任务编号
+    def add_task(self, project_name, parent_task_id, name):
+        lock = self.parent_lock(project_name, parent_task_id)
+        if lock is None:
+            return None
+        with lock:
+            index = self.task_index(project_name)
+            task_id = self.store.allocate_task_id(project_name)
+            path = ["tasks"] if parent_task_id is None else index.path(parent_task_id) + ["subtasks"]
+            path.append(task_id)
+            task = Task.new(task_id, name)
+            self.store.add_task(project_name, path, task, self.stats_delta(project_name, task))
+            index.add(task_id, task, parent_task_id)
+            self.reindex_task(project_name, task_id)
+        return task_id
+
+    # 任务字段的当前值，缺少的字段按默认值
+    @staticmethod
+    def task_fields(task, fields):
+        return {field: task.get(field, False if field == "completed" else "") for field in fields}
+
+    # 修改任务字段，返回这些字段修改前的值
+    # expected 不为 None 时，任务当前的这些字段必须等于 expected 才修改（例如没有被其他会话改过），否则返回 None
+    def update_task(self, project_name, task_id, fields, expected=None):
+        lock = self.task_lock(project_name, task_id)
+        if lock is None:
+            return None
+        with lock:
+            index = self.task_index(project_name)
+            task = index.get(task_id)
+            if expected is not None and self.task_fields(task, expected) != expected:
+                return None
+            old = self.task_fields(task, fields)
+            delta = None
+            if "completed" in fields or "completed_time" in fields:
+                # 扣除任务原来的完成记录，再按修改后的状态计入
+                self.project_stats(project_name)
+                delta = empty_stats()
+                if task.get("completed"):
+                    tally_completion(delta, task.get("completed_time", ""), -1)
+                if fields.get("completed", task.get("completed")):
+                    tally_completion(delta, fields.get("completed_time", task.get("completed_time", "")))
+            self.store.update_task(project_name, index.path(task_id), fields, delta)
+            if "completed" in fields:
+                index.completion_changed(task_id, old["completed"], fields["completed"])
+            if "completed" in fields or "completed_time" in fields:
+                index.times_changed(task_id)
+            if "name" in fields or "note" in fields:
+                self.reindex_task(project_name, task_id)
+        return old
+
+    def rename_task(self, project_name, task_id, name):
+        return self.update_task(project_name, task_id, {"name": name})
+
+    # 完成时记下当前时间，取消完成时清空完成日期
+    @staticmethod
+    def completion_fields(completed):
+        return {"completed": completed, "completed_time": format_time(int(time.time())) if completed else ""}
+
+    def set_completed(self, project_name, task_id, completed):
+        return self.update_task(project_name, task_id, self.completion_fields(completed))
+
+    # 删除任务及其全部子任务，返回 (被移除的编号, 父任务编号)
+    def delete_task(self, project_name, task_id):
+        lock = self.task_lock(project_name, task_id)
+        if lock is None:
+            return None
+        with lock:
+            index = self.task_index(project_name)
+            parent_task_id = index.parents[task_id]
+            delta = self.stats_delta(project_name, index.get(task_id), -1)
+            self.store.delete_task(project_name, index.path(task_id), delta)
+            removed = index.remove(task_id)
+            self.unindex_tasks(project_name, removed)
+        return removed, parent_task_id
+
+    # 把删除时取下的任务对象（连同子任务）原样挂回父任务下，不复制数据；编号已被占用时返回 False
+    def restore_task(self, project_name, parent_task_id, task):
+        lock = self.parent_lock(project_name, parent_task_id)
+        if lock is None:
+            return False
+        with lock:
+            index = self.task_index(project_name)
+            if task.id in index:
+                return False
+            path = ["tasks"] if parent_task_id is None else index.path(parent_task_id) + ["subtasks"]
+            self.store.add_task(project_name, path + [task.id], task, self.stats_delta(project_name, task))
+            index.add(task.id, task, parent_task_id)
+            if self.search_index is not None:
+                self.search_index.index_tasks(project_name, {task.id: task})
+        return True
+
+    # 任务展开后可见的全部后代，按显示顺序排列；expanded 为展开的任务编号集合
+    def visible_descendants(self, project_name, task_id, expanded):
+        index = self.task_index(project_name)
+        result = []
+        stack = list(reversed(index.get(task_id).get("subtasks", {})))
+        while stack:
+            subtask_id = stack.pop()
+            result.append(subtask_id)
+            if subtask_id in expanded:
+                stack.extend(reversed(index.get(subtask_id).get("subtasks", {})))
+        return result
+
+    # 项目所有可见行的显示顺序：根任务以及已展开任务的后代，折叠的子树不会被遍历
+    def visible_order(self, project_name, expanded):
+        order = []
+        for task_id in self.store.tasks(project_name):
+            order.append(task_id)
+            if task_id in expanded:
+                order.extend(self.visible_descendants(project_name, task_id, expanded))
+        return order
+
+    # 筛选和排序后的显示顺序：符合条件的任务连同它们的祖先（保持层级），全部展开
+    # 同级任务按 sort 排序（没有该时间的排在最后）或保持原顺序；条件取值见 TASK_STATUS_FILTERS 等
+    def filtered_order(self, project_name, status="all", period="", sort=""):
+        with self.project_lock(project_name):
+            index = self.task_index(project_name)
+            filters = index.filter_index()
+            if period:
+                field, period = period.split(":")
+                matches = filters.match(status, field, period_start(period))
+            else:
+                matches = filters.match(status)
+            if matches is None:
+                visible = set(index.nodes)
+            else:
+                visible = set()
+                for task_id in matches:
+                    visible.add(task_id)
+                    for ancestor_id in index.ancestors(task_id):
+                        if ancestor_id in visible:  # 它的祖先已经加入
+                            break
+                        visible.add(ancestor_id)
+            children = {}
+            for task_id in visible:
+                children.setdefault(index.parents[task_id], []).append(task_id)
+            for parent_id, siblings in children.items():
+                if sort:
+                    field, direction = sort.split(":")
+                    keys = filters.keys[field]
+                    dated = [task_id for task_id in siblings if task_id in keys]
+                    dated.sort(key=lambda task_id: (keys[task_id], int(task_id)), reverse=direction == "desc")
+                    siblings[:] = dated + sorted((task_id for task_id in siblings if task_id not in keys), key=int)
+                else:
+                    siblings.sort(key=index.sibling_ordinals(parent_id).__getitem__)
+            order = []
+            stack = list(reversed(children.get(None, [])))
+            while stack:
+                task_id = stack.pop()
+                order.append(task_id)
+                stack.extend(reversed(children.get(task_id, [])))
+            return order
+
+    # 项目名称已存在时返回 False
+    def add_project(self, project_name):
+        with self.lock:
+            if self.store.has_project(project_name):
+                return False
+            self.store.add_project(project_name)
+            return True
+
+    def rename_project(self, old_name, new_name):
+        with self.lock:
+            if self.store.has_project(new_name) or not self.store.has_project(old_name):
+                return False
+            with self.project_lock(old_name):
+                self.store.rename_project(old_name, new_name)
+                if self.search_index is not None:
+                    self.search_index.rename_project(old_name, new_name)
+                if old_name in self.indexes:
+                    self.indexes[new_name] = self.indexes.pop(old_name)
+                self.project_locks[new_name] = self.project_locks.pop(old_name)
+            return True
+
+    def delete_project(self, project_name):
+        with self.lock:
+            if not self.store.has_project(project_name):
+                return False
+            with self.project_lock(project_name):
+                self.store.delete_project(project_name)
+                if self.search_index is not None:
+                    self.search_index.remove_project(project_name)
+                self.indexes.pop(project_name, None)
+            self.project_locks.pop(project_name, None)
+            return True
+
+    # 重建已删除的项目，任务沿用删除时的对象，任务编号计数器沿用删除时的 next_id；同名项目已存在时返回 False
+    def restore_project(self, project_name, tasks, next_id):
+        with self.lock:
+            if self.store.has_project(project_name):
+                return False
+            self.store.add_project(project_name, next_id)
+            with self.project_lock(project_name):
+                for task_id, task in tasks.items():
+                    self.store.add_task(project_name, ["tasks", task_id], task, self.stats_delta(project_name, task))
+                if self.search_index is not None:
+                    self.search_index.index_tasks(project_name, tasks)
+            return True
+
+    # 批量导入（数据来自 read_task_file），整批写入后更新已建立的索引，返回 项目名称 -> 新根任务编号列表
+    def import_projects(self, projects):
+        with self.lock, contextlib.ExitStack() as locks:
+            deltas = {}
+            for project_name, tasks in projects.items():
+                locks.enter_context(self.project_lock(project_name))
+                if self.store.has_project(project_name):
+                    self.project_stats(project_name)
+                delta = deltas[project_name] = empty_stats()
+                for task in tasks.values():
+                    tally_tasks(delta, task)
+            imported = self.store.import_projects(projects, deltas)
+            for project_name, tasks in imported.items():
+                index = self.indexes.get(project_name)
+                if index is not None:
+                    for task_id, task in tasks.items():
+                        index.add(task_id, task)
+                if self.search_index is not None:
+                    self.search_index.index_tasks(project_name, tasks)
+        return {project_name: list(tasks) for project_name, tasks in imported.items()}
+
+    # 导出到 CSV 或 JSON Lines 文件，project_names 省略时导出全部项目，返回导出的任务数
+    # 逐行写出，每个项目只在写出它的任务时持有该项目的锁
+    def export_file(self, path, project_names=None, data_format=None):
+        def rows():
+            for project_name in project_names or self.store.project_names():
+                with self.project_lock(project_name):
+                    if self.store.has_project(project_name):
+                        yield from export_rows(project_name, self.store.tasks(project_name))
+
+        return write_task_rows(path, rows(), data_format)
+
+    def report_error(self, exc):
+        for handler in list(self.error_handlers):
+            handler(exc)
+
+
+# 撤销/重做历史（每个会话一份）：记录只保存修改前后的字段，删除时保存被删子树的引用而不复制
+# 撤销和重做都经 Workspace 的增量操作完成，返回与会话间广播相同格式的修改消息，调用方据此只修补受影响的行
+class History:
+    def __init__(self, workspace, budget=UNDO_MEMORY_BUDGET):
+        self.workspace = workspace
+        self.budget = budget
+        self.lock = threading.RLock()
+        self.undo_stack = deque()
+        self.redo_stack = deque()  # 最近撤销的记录在最后
+        self.size = 0  # 两个栈中记录的估算内存
+
+    # 以下操作与 Workspace 的同名方法相同，成功时记入历史
+
+    def add_task(self, project_name, parent_task_id, name):
+        task_id = self.workspace.add_task(project_name, parent_task_id, name)
+        if task_id is not None:
+            self._push({"op": "add", "project": project_name, "task_id": task_id, "parent": parent_task_id,
+                        "task": None})
+        return task_id
+
+    def update_task(self, project_name, task_id, fields):
+        old = self.workspace.update_task(project_name, task_id, fields)
+        if old is not None:
+            self._push({"op": "update", "project": project_name, "task_id": task_id, "old": old, "new": dict(fields)})
+        return old
+
+    def rename_task(self, project_name, task_id, name):
+        return self.update_task(project_name, task_id, {"name": name})
+
+    def set_completed(self, project_name, task_id, completed):
+        return self.update_task(project_name, task_id, Workspace.completion_fields(completed))
+
+    def delete_task(self, project_name, task_id):
+        entry = {"op": "delete", "project": project_name, "task_id": task_id}
+        messages = self._remove_task(entry)
+        if messages is None:
+            return None
+        self._push(entry)
+        _, _, removed, parent_task_id = messages[0]
+        return removed, parent_task_id
+
+    def rename_project(self, old_name, new_name):
+        renamed = self.workspace.rename_project(old_name, new_name)
+        if renamed:
+            self._push({"op": "rename_project", "old_name": old_name, "new_name": new_name})
+        return renamed
+
+    def delete_project(self, project_name):
+        entry = {"op": "delete_project", "project": project_name}
+        if self._remove_project(entry) is None:
+            return False
+        self._push(entry)
+        return True
+
+    # 备注的一次输入：任务数据已由调用方修改，这里只做记录；同一任务的连续输入合并成一条
+    def record_note(self, project_name, task_id, old_note, new_note):
+        with self.lock:
+            now = time.monotonic()
+            top = self.undo_stack[-1] if self.undo_stack else None
+            if (top is not None and top["op"] == "update" and top["new"].keys() == {"note"}
+                    and (top["project"], top["task_id"]) == (project_name, task_id)
+                    and now - top["time"] <= UNDO_MERGE_WINDOW and not self.redo_stack):
+                self.size -= top["size"]
+                top["new"]["note"] = new_note
+                top["time"] = now
+                self._account(top)
+                return
+        self._push({"op": "update", "project": project_name, "task_id": task_id,
+                    "old": {"note": old_note}, "new": {"note": new_note}})
+
+    # 撤销最近一条记录，返回修改消息列表；没有可撤销的记录时返回 None
+    # 数据已被其他会话改动而无法撤销时，丢弃这条记录并返回空列表
+    def undo(self):
+        return self._step(self.undo_stack, self.redo_stack, undo=True)
+
+    def redo(self):
+        return self._step(self.redo_stack, self.undo_stack, undo=False)
 
-# 加载数据
-def load_data():
-    try:
-        with open(DATA_FILE, "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
+    def _step(self, source, target, undo):
+        with self.lock:
+            if not source:
+                return None
+            entry = source.pop()
+            self.size -= entry["size"]
+            messages = self._apply(entry, undo)
+            if messages is None:
+                return []
+            target.append(entry)
+            self._account(entry)
+            self._trim()
+            return messages
+
+    def _apply(self, entry, undo):
+        op = entry["op"]
+        if op == "update":
+            # 撤销时任务应当还是修改后的样子，重做时应当还是修改前的样子，否则说明已被其他会话改过
+            fields, expected = (entry["old"], entry["new"]) if undo else (entry["new"], entry["old"])
+            if self.workspace.update_task(entry["project"], entry["task_id"], fields, expected) is None:
+                return None
+            return [("task_changed", entry["project"], entry["task_id"])]
+        if op == "rename_project":
+            old_name, new_name = entry["old_name"], entry["new_name"]
+            if undo:
+                old_name, new_name = new_name, old_name
+            if not self.workspace.rename_project(old_name, new_name):
+                return None
+            return [("project_renamed", old_name, new_name)]
+        # 添加与删除互为逆操作：撤销添加、重做删除都是删除
+        removing = (op == "add") == undo
+        if op == "delete_project":
+            return self._remove_project(entry) if removing else self._restore_project(entry)
+        return self._remove_task(entry) if removing else self._restore_task(entry)
+
+    # 删除任务，把取下的子树留在记录中供恢复
+    def _remove_task(self, entry):
+        project_name, task_id = entry["project"], entry["task_id"]
+        lock = self.workspace.task_lock(project_name, task_id)
+        if lock is None:
+            return None
+        with lock:
+            task = self.workspace.task_index(project_name).get(task_id)
+            removed, parent_task_id = self.workspace.delete_task(project_name, task_id)
+        entry["task"], entry["parent"] = task, parent_task_id
+        return [("task_removed", project_name, removed, parent_task_id)]
+
+    def _restore_task(self, entry):
+        if not self.workspace.restore_task(entry["project"], entry["parent"], entry["task"]):
+            return None
+        entry["task"] = None  # 子树已回到存储中，记录不再持有它
+        return [("task_added", entry["project"], entry["task_id"], entry["parent"])]
+
+    def _remove_project(self, entry):
+        project_name = entry["project"]
+        with self.workspace.lock:
+            if not self.workspace.store.has_project(project_name):
+                return None
+            tasks = self.workspace.store.tasks(project_name)
+            next_id = self.workspace.store.next_id(project_name)
+            self.workspace.delete_project(project_name)
+        entry["tasks"] = tasks
+        entry["next_id"] = next_id
+        return [("project_deleted", project_name)]
+
+    def _restore_project(self, entry):
+        if not self.workspace.restore_project(entry["project"], entry["tasks"], entry["next_id"]):
+            return None
+        entry["tasks"] = None
+        return [("projects_changed",)]
+
+    def _push(self, entry):
+        with self.lock:
+            entry["time"] = time.monotonic()
+            for dropped in self.redo_stack:
+                self.size -= dropped["size"]
+            self.redo_stack.clear()
+            self.undo_stack.append(entry)
+            self._account(entry)
+            self._trim()
+
+    def _account(self, entry):
+        entry["size"] = self._estimate(entry)
+        self.size += entry["size"]
+
+    # 超出预算时先丢弃最早的可撤销记录，再丢弃最早撤销的可重做记录；最近的一条总是保留
+    def _trim(self):
+        while self.size > self.budget and len(self.undo_stack) + len(self.redo_stack) > 1:
+            stack = self.undo_stack if self.undo_stack else self.redo_stack
+            self.size -= stack.popleft()["size"]
+
+    # 记录占用内存的估算：固定开销 + 保存的文本长度 + 持有的任务数
+    @staticmethod
+    def _estimate(entry):
+        size = UNDO_ENTRY_OVERHEAD
+        for fields in (entry.get("old"), entry.get("new")):
+            if fields:
+                size += sum(len(value) for value in fields.values() if isinstance(value, str))
+        stack = []
+        if entry.get("task") is not None:
+            stack.append(entry["task"])
+        if entry.get("tasks"):
+            stack.extend(entry["tasks"].values())
+        while stack:
+            task = stack.pop()
+            size += UNDO_ENTRY_OVERHEAD + len(task.get("name", "")) + len(task.get("note", ""))
+            stack.extend(task.get("subtasks", {}).values())
+        return size
+
+
+workspace = None
+workspace_lock = threading.Lock()
+
+
+# 会话开始时取得共享工作区，第一个会话负责打开存储
+def acquire_workspace():
+    global workspace
+    with workspace_lock:
+        if workspace is None:
+            workspace = Workspace(open_store())
+            background_writer.on_error = workspace.report_error
+        workspace.sessions += 1
+        return workspace
+
+
+# 会话结束时归还工作区，最后一个会话离开时关闭存储
+def release_workspace():
+    global workspace
+    with workspace_lock:
+        workspace.sessions -= 1
+        if workspace.sessions == 0:
+            workspace.store.close()
+            background_writer.on_error = None
+            workspace = None
+
+
+# 界面更新批处理：一次用户操作中标记过的控件，在最外层事件处理函数结束时合并成一次 page.update()
+class UpdateBatch:
+    def __init__(self, page):
+        self.page = page
+        self.local = threading.local()  # 事件处理函数在线程池中执行，每个线程各自计数
+
+    def _state(self):
+        state = self.local
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.dirty = {}  # id(控件) -> 控件，保持标记顺序
+            state.full = False  # 是否需要刷新整个页面
+        return state
+
+    def __enter__(self):
+        self._state().depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        state = self._state()
+        state.depth -= 1
+        if state.depth == 0:
+            self.flush()
+        return False
+
+    # 标记需要刷新的控件，不带参数表示刷新整个页面；不在批处理中时立即刷新
+    def update(self, *controls):
+        with self:
+            state = self._state()
+            if not controls:
+                state.full = True
+            for control in controls:
+                state.dirty[id(control)] = control
+
+    # 立即发送已标记的修改；尚未加入页面的控件会随父控件一起发送，这里跳过
+    def flush(self):
+        state = self._state()
+        dirty, full = state.dirty, state.full
+        state.dirty, state.full = {}, False
+        if full:
+            self._send(())
+            return
+        controls = [control for control in dirty.values() if control.page is not None]
+        if controls:
+            self._send(controls)
+
+    # 启用性能统计时记录 page.update() 的耗时（含序列化）和发送的控件数
+    def _send(self, controls):
+        if not instrumentation.enabled:
+            self.page.update(*controls)
+            return
+        start = time.perf_counter()
+        self.page.update(*controls)
+        instrumentation.record("page.update", time.perf_counter() - start)
+        instrumentation.observe("每次更新的控件数", sum(count_controls(control) for control in controls or [self.page]))
+
+    # 把处理函数包装成异步事件处理函数，其中所有的界面修改只刷新一次
+    # 处理函数返回协程时在批处理之外等待，协程在需要修改界面时自己进入批处理
+    def batched(self, handler):
+        async def wrapper(*args, **kwargs):
+            with self:
+                result = handler(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        return wrapper
+
+
+# 提示与对话框管理：整个会话只用一个 SnackBar 和固定数量的 AlertDialog，page.overlay 不再增长
+class Notifier:
+    def __init__(self, page, batch=None, pool_size=DIALOG_POOL_SIZE, max_queued=MAX_QUEUED_MESSAGES):
+        self.page = page
+        self.batch = batch or UpdateBatch(page)
+        self.pool_size = pool_size
+        self.max_queued = max_queued
+        self.lock = threading.RLock()
+        self.snack_bar = ft.SnackBar(ft.Text(""), on_dismiss=self.batch.batched(self._on_snack_bar_dismiss))
+        page.overlay.append(self.snack_bar)
+        self.current = None  # 正在显示的 [消息, 次数]
+        self.queue = deque()  # 等待显示的 [消息, 次数]
+        self.dialogs = []  # 已创建的对话框，按最近使用排序
+        self.free_dialogs = []  # 空闲可复用的对话框
+
+    # 显示提示：正在显示时排队，相同的消息合并计数，队列满时丢弃最早的消息
+    def show(self, message):
+        with self.lock:
+            if self.current is None:
+                self.current = [message, 1]
+            elif self.current[0] == message:
+                self.current[1] += 1
+            elif self.queue and self.queue[-1][0] == message:
+                self.queue[-1][1] += 1
+                return
+            else:
+                self.queue.append([message, 1])
+                if len(self.queue) > self.max_queued:
+                    self.queue.popleft()
+                return
+            self._render()
+
+    def _render(self):
+        message, count = self.current
+        self.snack_bar.content.value = message if count == 1 else f"{message}（×{count}）"
+        self.snack_bar.open = True
+        self.batch.update(self.snack_bar)
+
+    def _on_snack_bar_dismiss(self, e):
+        with self.lock:
+            self.snack_bar.open = False
+            self.current = self.queue.popleft() if self.queue else None
+            if self.current is not None:
+                self._render()
 
+    # 弹出带输入框的对话框；on_confirm(输入内容) 返回 True 时关闭对话框
+    def prompt(self, title, on_confirm, value="", hint_text="", confirm_text="保存"):
+        with self.lock:
+            created = len(self.dialogs)
+            dialog = self._acquire_dialog()
+            created = len(self.dialogs) > created
+        dialog.title.value = title
+        dialog.content.value = value
+        dialog.content.hint_text = hint_text
+        confirm_button = dialog.actions[0]
+        confirm_button.text = confirm_text
+        confirm_button.on_click = self.batch.batched(
+            lambda e: self.close_dialog(dialog) if on_confirm(dialog.content.value) else None
+        )
+        dialog.open = True
+        # 新建的对话框刚加入 page.overlay，需要刷新整个页面
+        if created:
+            self.batch.update()
+        else:
+            self.batch.update(dialog)
+
+    # 取一个空闲对话框；池已满且都在使用时，复用最早打开的那个
+    def _acquire_dialog(self):
+        if self.free_dialogs:
+            dialog = self.free_dialogs.pop()
+        elif len(self.dialogs) < self.pool_size:
+            dialog = ft.AlertDialog(
+                title=ft.Text(""),
+                content=ft.TextField(),
+                actions=[ft.ElevatedButton("保存"), ft.ElevatedButton("取消")],
+            )
+            dialog.actions[1].on_click = self.batch.batched(lambda e: self.close_dialog(dialog))
+            dialog.on_dismiss = lambda e: self._release_dialog(dialog)
+            self.page.overlay.append(dialog)
+        else:
+            dialog = self.dialogs.pop(0)
+        if dialog in self.dialogs:
+            self.dialogs.remove(dialog)
+        self.dialogs.append(dialog)
+        return dialog
+
+    def _release_dialog(self, dialog):
+        with self.lock:
+            if dialog not in self.free_dialogs:
+                self.free_dialogs.append(dialog)
 
-# 保存数据
-def save_data(data):
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
+    def close_dialog(self, dialog):
+        dialog.open = False
+        self._release_dialog(dialog)
+        self.batch.update(dialog)
 
 
 # 主应用程序
-def main(page: ft.Page):
+async def main(page: "ft.Page"):
     page.title = "项目任务管理(0.1)-Mr.Lee"
     page.horizontal_alignment = "center"
     page.vertical_alignment = "center"
 
-    # 加载项目数据
-    projects = load_data()
+    # 所有会话共享的项目数据，第一个会话在线程池中读盘
+    workspace = await asyncio.to_thread(acquire_workspace)
+    store = workspace.store
 
     # 左侧项目列表
     project_list = ft.ListView(expand=True, spacing=10)
 
-    # 右侧任务树状图
-    task_tree = ft.Column(expand=True, scroll=ft.ScrollMode.AUTO)
+    # 右侧任务树状图：ListView 只渲染视口附近的行，Python 端也按批创建
+    task_tree = ft.ListView(expand=True, on_scroll_interval=100)
 
     # 当前选中的项目
     current_project = None
@@ -43,21 +3015,189 @@ def main(page: ft.Page):
     # 当前项目名称显示控件
     current_project_display = ft.Text("", size=16, color=ft.colors.BLUE)
 
+    # 界面更新批处理，每次用户操作只刷新一次
+    ui = UpdateBatch(page)
+
+    # 提示条和对话框
+    notifier = Notifier(page, ui)
+
+    # 本会话的撤销/重做历史
+    history = History(workspace)
+
+    def write_notes(pending):
+        store.update_tasks([
+            (project_name, task_path(project_name, task_id), {"note": note})
+            for (project_name, task_id), note in pending.items()
+            if store.has_project(project_name) and task_id in task_index(project_name)
+        ])
+
+    # 备注保存提示，每次实际写入时显示一次，并通知其他会话
+    def notify_notes_saved(pending):
+        notifier.show("备注已保存！")
+        for project_name, task_id in pending:
+            broadcast("task_changed", project_name, task_id)
+
+    note_saver = SaveScheduler(write_notes, on_flush=notify_notes_saved)
+
+    # 后台写入失败时提示用户，内存中的修改仍然保留
+    def notify_write_error(exc):
+        notifier.show(f"保存失败：{exc}")
+
+    workspace.error_handlers.append(notify_write_error)
+
+    # 会话结束前写入尚未保存的备注并归还工作区；窗口关闭和会话过期都会调用，只处理一次
+    session_closed = False
+
+    def on_exit(e=None):
+        nonlocal session_closed
+        if session_closed:
+            return
+        session_closed = True
+        note_saver.flush(notify=False)
+        page.pubsub.unsubscribe()
+        workspace.error_handlers.remove(notify_write_error)
+        release_workspace()
+        durable_writer.flush()
+        if instrumentation.enabled:
+            instrumentation.log_summary()
+
+    # 等待后台写入完成后再关闭窗口
+    async def on_window_event(e):
+        if e.data == "close":
+            await asyncio.to_thread(on_exit)
+            page.window.destroy()
+
+    # 网页端断线后会话还可能重连，这时只写入备注，共享的存储要等会话过期（on_close）时才归还
+    def on_disconnect(e):
+        note_saver.flush(notify=False)
+
+    page.window.prevent_close = True
+    page.window.on_event = on_window_event
+    page.on_disconnect = on_disconnect
+    page.on_close = on_exit
+
+    # 把本会话的修改通知其他会话，它们只修补受影响的行
+    def broadcast(kind, *args):
+        page.pubsub.send_others((kind, *args))
+
+    # 其他会话修改了数据
+    def on_remote_change(message):
+        kind, *args = message
+        if kind == "projects_changed":
+            update_project_list()
+        elif kind == "project_renamed":
+            old_name, new_name = args
+            if old_name in expanded:
+                expanded[new_name] = expanded.pop(old_name)
+            update_project_list()
+            if current_project == old_name:
+                select_project(None, new_name)
+            refresh_search_results()
+        elif kind == "project_deleted":
+            if close_project(args[0]):
+                notifier.show(f"项目 {args[0]} 已被删除！")
+            update_project_list()
+            refresh_search_results()
+        elif kind == "task_added":
+            project_name, task_id, parent_task_id = args
+            insert_task_row(project_name, task_id, parent_task_id, reveal=False)
+            after_tasks_changed(project_name)
+        elif kind == "task_changed":
+            project_name, task_id = args
+            if store.has_project(project_name) and task_id in task_index(project_name):
+                refresh_task_row(project_name, task_id)
+                refresh_ancestor_rows(project_name, task_id)
+                after_tasks_changed(project_name)
+        elif kind == "task_removed":
+            project_name, removed, parent_task_id = args
+            remove_task_rows(project_name, removed, parent_task_id)
+            if parent_task_id is not None:
+                refresh_task_row(project_name, parent_task_id)
+                refresh_ancestor_rows(project_name, parent_task_id)
+            after_tasks_changed(project_name)
+            refresh_search_results()
+        elif kind == "tasks_imported":
+            apply_import(args[0])
+
+    page.pubsub.subscribe(ui.batched(on_remote_change))
+
+    # 任务名称或备注变化后更新搜索索引
+    def reindex_task(project_name, task_id):
+        workspace.reindex_task(project_name, task_id)
+
+    # 搜索任务：第一次搜索时在线程池中建立搜索索引，界面不等待
+    async def search_tasks(e):
+        if search_input.value.strip():
+            await asyncio.to_thread(workspace.ensure_search_index)
+        with ui:
+            show_search_results()
+
+    # 按搜索框当前的内容显示搜索结果；索引还在建立时由等待它的那次搜索显示
+    def show_search_results():
+        query = search_input.value.strip()
+        if query and not workspace.search_ready:
+            return
+        search_results.controls.clear()
+        if query:
+            for project_name, task_id in workspace.search_index.search(query):
+                search_results.controls.append(
+                    ft.ListTile(
+                        title=ft.Text(get_task(project_name, task_id)["name"]),
+                        subtitle=ft.Text(f"{project_name} · {task_index(project_name).number(task_id)}"),
+                        on_click=ui.batched(lambda e, name=project_name, tid=task_id: jump_to_task(name, tid)),
+                        dense=True,
+                    )
+                )
+            if not search_results.controls:
+                search_results.controls.append(ft.Text("没有找到匹配的任务", size=14))
+        search_results.visible = bool(query)
+        ui.update(search_results)
+
+    search_input = ft.TextField(hint_text="搜索任务名称或备注", prefix_icon=ft.icons.SEARCH, on_change=ui.batched(search_tasks))
+    search_results = ft.ListView(height=240, visible=False)
+
+    # 任务或项目被删除、改名后重新搜索，结果中不留下已失效的任务
+    def refresh_search_results():
+        if search_results.visible:
+            show_search_results()
+
+    # 跳转到任务：切换项目、展开祖先、创建到该行为止并滚动过去
+    def jump_to_task(project_name, task_id):
+        if not store.has_project(project_name) or task_id not in task_index(project_name):
+            notifier.show("该任务已被删除！")
+            refresh_search_results()
+            return
+        if project_name != current_project:
+            select_project(None, project_name)
+        if filtering() and task_id not in task_order:
+            # 搜索到的任务不符合当前筛选条件，先清除筛选
+            clear_filter()
+        for ancestor_id in reversed(list(task_index(project_name).ancestors(task_id))):
+            if ancestor_id not in expanded_tasks(project_name):
+                toggle_subtasks(project_name, ancestor_id)
+        while task_id not in task_rows and load_more_rows():
+            pass
+        ui.update(task_tree)
+        highlight_task_item(None, task_rows[task_id])
+        # 滚动前行必须已经发送到客户端，这里提前刷新，处理函数结束时不会再刷新
+        ui.flush()
+        task_tree.scroll_to(key=task_id, duration=300)
+
     # 添加项目按钮
+    @ui.batched
     def add_project(e):
         new_project_name = new_project_input.value.strip()
         if new_project_name:
-            if new_project_name in projects:
-                page.overlay.append(ft.SnackBar(ft.Text("项目名称已存在，请使用其他名称！"), open=True))
+            if not workspace.add_project(new_project_name):
+                notifier.show("项目名称已存在，请使用其他名称！")
             else:
-                projects[new_project_name] = {"tasks": {}}
-                save_data(projects)
                 update_project_list()
                 new_project_input.value = ""
-            page.overlay.append(ft.SnackBar(ft.Text("项目添加成功！"), open=True))
+                ui.update(new_project_input)
+                notifier.show("项目添加成功！")
+                broadcast("projects_changed")
         else:
-            page.overlay.append(ft.SnackBar(ft.Text("项目名称不能为空！"), open=True))
-        page.update()
+            notifier.show("项目名称不能为空！")
 
     new_project_input = ft.TextField(
         hint_text="输入项目名称",
@@ -75,85 +3215,127 @@ def main(page: ft.Page):
         height=48
     )
 
+    # 项目名称 -> 项目列表中显示进度的文本
+    project_progress_texts = {}
+
+    # 项目进度：已完成/总数和最近几天的完成数，直接取自缓存的统计，不遍历任务
+    def project_progress(project_name):
+        stats = workspace.project_stats(project_name)
+        recent = sum(count for _, count in completion_history(stats, RECENT_DAYS))
+        return f"已完成 {stats['completed']}/{stats['total']} · 近 {RECENT_DAYS} 天完成 {recent}"
+
+    # 任务增删或完成状态变化后只刷新该项目的进度文本
+    def refresh_project_progress(project_name):
+        progress_text = project_progress_texts.get(project_name)
+        if progress_text is not None and store.has_project(project_name):
+            progress_text.value = project_progress(project_name)
+            ui.update(progress_text)
+        refresh_dashboard()
+
     # 更新项目列表
     def update_project_list():
         project_list.controls.clear()
-        for idx, project_name in enumerate(projects.keys(), start=1):
+        project_progress_texts.clear()
+        for idx, project_name in enumerate(store.project_names(), start=1):
+            progress_text = project_progress_texts[project_name] = ft.Text(
+                project_progress(project_name), size=12, color=ft.colors.GREY_700
+            )
             project_item = ft.Container(
                 content=ft.Row(
                     controls=[
                         ft.Row(
                             controls=[
                                 ft.Icon(ft.icons.CONTENT_PASTE_OUTLINED, size=16),
-                                ft.Text(f"{idx}. {project_name}", size=16),
+                                ft.Column(
+                                    controls=[ft.Text(f"{idx}. {project_name}", size=16), progress_text],
+                                    spacing=0,
+                                ),
                             ]),
                         ft.Row(
                             controls=[
                                 ft.IconButton(
                                     icon=ft.icons.EDIT,
-                                    on_click=lambda e, name=project_name: edit_project_name(name),
+                                    on_click=ui.batched(lambda e, name=project_name: edit_project_name(name)),
                                     icon_size=16
                                 ),
                                 ft.IconButton(
                                     icon=ft.icons.DELETE,
-                                    on_click=lambda e, name=project_name: delete_project(name),
+                                    on_click=ui.batched(lambda e, name=project_name: delete_project(name)),
                                     icon_size=16
                                 ),
                             ]),
                     ],
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                 ),
-                on_click=lambda e, name=project_name: select_project(e, name),
+                on_click=ui.batched(lambda e, name=project_name: open_project(e, name)),
                 padding=10,
                 border_radius=5,
             )
             project_list.controls.append(project_item)
-        page.update()
+        ui.update(project_list)
+        refresh_dashboard()
 
     # 修改项目名称
     def edit_project_name(project_name):
-        new_name_input = ft.TextField(hint_text="输入新项目名称", value=project_name)
-        dialog = ft.AlertDialog(
-            title=ft.Text("修改项目名称"),
-            content=new_name_input,
-            actions=[
-                ft.ElevatedButton(
-                    "保存",
-                    on_click=lambda e: save_project_name(project_name, new_name_input.value),
-                ),
-                ft.ElevatedButton("取消", on_click=lambda e: close_dialog(dialog)),
-            ],
+        notifier.prompt(
+            "修改项目名称",
+            lambda new_name: save_project_name(project_name, new_name),
+            value=project_name,
+            hint_text="输入新项目名称",
         )
-        page.overlay.append(dialog)
-        dialog.open = True
-        page.update()
 
+    # 保存成功时返回 True，对话框随之关闭
     def save_project_name(old_name, new_name):
+        note_saver.flush()
+        saved = False
         if new_name:
-            if new_name in projects:
-                page.overlay.append(ft.SnackBar(ft.Text("项目名称已存在，请使用其他名称！"), open=True))
+            if not history.rename_project(old_name, new_name):
+                notifier.show("项目名称已存在，请使用其他名称！")
             else:
-                projects[new_name] = projects.pop(old_name)
-                save_data(projects)
+                if old_name in expanded:
+                    expanded[new_name] = expanded.pop(old_name)
                 update_project_list()
                 if current_project == old_name:
                     select_project(None, new_name)
-                page.overlay.append(ft.SnackBar(ft.Text("项目名称修改成功！"), open=True))
-                close_dialog()
+                refresh_search_results()
+                notifier.show("项目名称修改成功！")
+                broadcast("project_renamed", old_name, new_name)
+                saved = True
         else:
-            page.overlay.append(ft.SnackBar(ft.Text("项目名称不能为空！"), open=True))
-        page.update()
+            notifier.show("项目名称不能为空！")
+        return saved
 
     # 删除项目
     def delete_project(project_name):
-        del projects[project_name]
-        save_data(projects)
-        update_project_list()
-        if current_project == project_name:
-            task_tree.controls.clear()
-            current_project_display.value = ""
-            page.overlay.append(ft.SnackBar(ft.Text(f"项目 {project_name} 已删除！"), open=True))
-        page.update()
+        note_saver.flush()
+        if history.delete_project(project_name):
+            update_project_list()
+            if close_project(project_name):
+                notifier.show(f"项目 {project_name} 已删除！")
+            refresh_search_results()
+            broadcast("project_deleted", project_name)
+
+    # 项目已被删除：清掉本会话的展开状态，正在显示时清空任务列表；返回是否正在显示
+    def close_project(project_name):
+        nonlocal current_project
+        expanded.pop(project_name, None)
+        if current_project != project_name:
+            return False
+        current_project = None
+        task_tree.controls.clear()
+        task_rows.clear()
+        task_order.clear()
+        current_project_display.value = ""
+        ui.update(task_tree, current_project_display)
+        return True
+
+    # 点击项目：未加载的项目先在线程池中读取任务，再切换界面
+    async def open_project(e, project_name):
+        if not store.has_project(project_name):  # 已被其他会话删除
+            return
+        await asyncio.to_thread(workspace.task_index, project_name)
+        with ui:
+            select_project(e, project_name)
 
     # 选择项目
     def select_project(e, project_name):
@@ -166,112 +3348,351 @@ def main(page: ft.Page):
             e.control.bgcolor = ft.colors.BLUE_100
         # 更新当前项目名称显示
         current_project_display.value = project_name
+        ui.update(project_list, current_project_display)
         # 显示任务
         show_tasks(project_name)
-        page.update()
 
-    # 显示任务
+    # 显示任务：先算出全部行的顺序，只创建第一批行
+    @instrumentation.timed("show_tasks")
     def show_tasks(project_name):
-        nonlocal current_project
+        nonlocal current_project, highlighted_item
         current_project = project_name
+        highlighted_item = None
         task_tree.controls.clear()
-        for task_id, task_data in projects[project_name]["tasks"].items():
-            # 如果是根任务，直接添加
-            if task_id.startswith("root."):
-                task_tree.controls.append(
-                    build_task_item(project_name, task_id, task_data, indent_level=0)
-                )
-                # 添加子任务
-                if "subtasks" in task_data:
-                    for subtask_id, subtask_data in task_data["subtasks"].items():
-                        task_tree.controls.append(
-                            build_task_item(project_name, subtask_id, subtask_data, indent_level=1, sub=True)
-                        )
-        page.update()
+        task_rows.clear()
+        task_order[:] = current_order(project_name)
+        load_more_rows()
+        ui.update(task_tree)
+
+    # 当前的筛选和排序条件，取值见 TASK_STATUS_FILTERS、TASK_PERIOD_FILTERS 和 TASK_SORTS
+    task_filter = {"status": "all", "period": "", "sort": ""}
+
+    def filtering():
+        return task_filter["status"] != "all" or bool(task_filter["period"] or task_filter["sort"])
+
+    # 未筛选时为展开状态决定的可见行；筛选时为符合条件的任务及其祖先，由二级索引得出
+    def current_order(project_name):
+        if filtering():
+            return workspace.filtered_order(project_name, **task_filter)
+        return workspace.visible_order(project_name, expanded_tasks(project_name))
+
+    # 按新的显示顺序重排任务树：已创建的行直接复用，只为新出现的行创建控件，其余行留待滚动时创建
+    def render_order(project_name, order):
+        nonlocal highlighted_item
+        shown = order[:min(max(len(task_tree.controls), TASK_PAGE_SIZE), len(order))]
+        kept = set(shown)
+        for task_id in [task_id for task_id in task_rows if task_id not in kept]:
+            if task_rows.pop(task_id) is highlighted_item:
+                highlighted_item = None
+        for task_id, task_item in task_rows.items():
+            task_item.data["toggle"].visible = has_toggle(project_name, task_id)
+        task_order[:] = order
+        task_tree.controls[:] = [task_rows.get(task_id) or build_row(project_name, task_id) for task_id in shown]
+        ui.update(task_tree)
+
+    # 筛选或排序条件改变：只重排当前项目的行
+    @ui.batched
+    def apply_filter(e):
+        task_filter["status"] = status_filter.value or "all"
+        task_filter["period"] = period_filter.value or ""
+        task_filter["sort"] = task_sort.value or ""
+        if current_project:
+            render_order(current_project, current_order(current_project))
+
+    def clear_filter():
+        status_filter.value, period_filter.value, task_sort.value = "all", "", ""
+        task_filter.update(status="all", period="", sort="")
+        ui.update(status_filter, period_filter, task_sort)
+        if current_project:
+            render_order(current_project, current_order(current_project))
+
+    # 任务增删或完成状态变化后：刷新项目进度；筛选时按新数据重排，行的增删由筛选结果决定
+    def after_tasks_changed(project_name):
+        refresh_project_progress(project_name)
+        if filtering() and project_name == current_project:
+            render_order(project_name, current_order(project_name))
+
+    status_filter = ft.Dropdown(
+        value="all",
+        options=[ft.dropdown.Option(key, text) for key, text in TASK_STATUS_FILTERS.items()],
+        on_change=apply_filter,
+        width=130,
+    )
+    period_filter = ft.Dropdown(
+        value="",
+        options=[ft.dropdown.Option(key, text) for key, text in TASK_PERIOD_FILTERS.items()],
+        on_change=apply_filter,
+        width=140,
+    )
+    task_sort = ft.Dropdown(
+        value="",
+        options=[ft.dropdown.Option(key, text) for key, text in TASK_SORTS.items()],
+        on_change=apply_filter,
+        width=180,
+    )
+
+    # 创建下一批尚未创建的行
+    @instrumentation.timed("load_more_rows")
+    def load_more_rows():
+        start = len(task_tree.controls)
+        for task_id in task_order[start:start + TASK_PAGE_SIZE]:
+            task_tree.controls.append(build_row(current_project, task_id))
+        return len(task_tree.controls) > start
+
+    # 滚动接近底部时补充下一批行
+    @ui.batched
+    def on_task_tree_scroll(e):
+        if e.pixels >= e.max_scroll_extent - e.viewport_dimension and load_more_rows():
+            ui.update(task_tree)
+
+    task_tree.on_scroll = on_task_tree_scroll
+
+    # 各项目的任务索引由所有会话共享，首次访问时建立，之后随增删任务增量维护
+    def task_index(project_name):
+        return workspace.task_index(project_name)
+
+    # 任务在项目数据中的路径
+    def task_path(project_name, task_id):
+        return task_index(project_name).path(task_id)
+
+    # 获取任务数据
+    def get_task(project_name, task_id):
+        return task_index(project_name).get(task_id)
+
+    # 当前项目所有可见行的显示顺序；task_tree.controls 始终是它的前缀
+    task_order = []
+
+    # 各项目中处于展开状态的任务编号
+    expanded = {}
+
+    def expanded_tasks(project_name):
+        return expanded.setdefault(project_name, set())
+
+    # 有子任务时显示展开/折叠按钮；筛选时所有行都已展开，不显示
+    def has_toggle(project_name, task_id):
+        return not filtering() and task_index(project_name).counts[task_id][1] > 0
+
+    # 任务展开后可见的全部后代，按显示顺序排列
+    def visible_descendants(project_name, task_id):
+        return workspace.visible_descendants(project_name, task_id, expanded_tasks(project_name))
+
+    # 在可见顺序的 position 处插入若干行；落在已创建前缀内时最多创建一批，其余留待滚动时创建
+    def splice_rows(project_name, position, task_ids):
+        task_order[position:position] = task_ids
+        if position > len(task_tree.controls) or not task_ids:
+            return
+        new_rows = [build_row(project_name, task_id) for task_id in task_ids[:TASK_PAGE_SIZE]]
+        if len(task_ids) > TASK_PAGE_SIZE:
+            for task_item in task_tree.controls[position:]:
+                task_rows.pop(task_item.data["task_id"], None)
+            del task_tree.controls[position:]
+        task_tree.controls[position:position] = new_rows
+        ui.update(task_tree)
+
+    # 从可见顺序中移除若干行
+    def drop_rows(task_ids):
+        nonlocal highlighted_item
+        removed_ids = set(task_ids)
+        task_order[:] = [task_id for task_id in task_order if task_id not in removed_ids]
+        removed = [task_rows.pop(task_id) for task_id in task_ids if task_id in task_rows]
+        if removed:
+            if highlighted_item in removed:
+                highlighted_item = None
+            removed_items = {id(item) for item in removed}
+            task_tree.controls[:] = [item for item in task_tree.controls if id(item) not in removed_items]
+            ui.update(task_tree)
+
+    # 任务在可见顺序中最后一个后代之后的位置
+    def position_after_subtree(project_name, task_id):
+        index = task_index(project_name)
+        position = task_order.index(task_id) + 1
+        depth = index.depths[task_id]
+        while position < len(task_order) and index.depths[task_order[position]] > depth:
+            position += 1
+        return position
+
+    # 展开或折叠子任务，展开时才创建子树的行
+    def toggle_subtasks(project_name, task_id):
+        if filtering():
+            return
+        if task_id in expanded_tasks(project_name):
+            expanded_tasks(project_name).discard(task_id)
+            start = task_order.index(task_id) + 1
+            drop_rows(task_order[start:position_after_subtree(project_name, task_id)])
+        else:
+            expanded_tasks(project_name).add(task_id)
+            splice_rows(project_name, task_order.index(task_id) + 1, visible_descendants(project_name, task_id))
+        refresh_task_row(project_name, task_id)
+
+    # 任务编号 -> 已创建的任务项，修改任务时只修补受影响的行
+    task_rows = {}
+
+    # 当前高亮的任务项
+    highlighted_item = None
+
+    # 按最新数据刷新一行的名称、状态和完成日期
+    def refresh_task_row(project_name, task_id):
+        task_item = task_rows.get(task_id) if project_name == current_project else None
+        if task_item is None:
+            return
+        task_data = get_task(project_name, task_id)
+        refs = task_item.data
+        refs["task_number"] = task_index(project_name).number(task_id)
+        refs["title"].value = " " * 8 * refs["indent_level"] + f"{refs['task_number']}. {task_data['name']}"
+        completed = task_data.get("completed", False)
+        refs["status"].value = "已完成" if completed else "未完成"
+        refs["status"].color = "blue" if completed else "red"
+        done, total = task_index(project_name).counts[task_id]
+        refs["progress"].value = f"{done}/{total}"
+        refs["progress"].visible = total > 0
+        refs["toggle"].visible = has_toggle(project_name, task_id)
+        refs["toggle"].icon = ft.icons.ARROW_DROP_DOWN if task_id in expanded_tasks(project_name) else ft.icons.ARROW_RIGHT
+        if refs["completed_time"] is not None:
+            refs["completed_time"].value = f"完成日期: {task_data.get('completed_time', '')}"
+            refs["name_input"].value = task_data["name"]
+            refs["note_input"].value = task_data.get("note", "")
+        ui.update(task_item)
+
+    # 刷新所有祖先行上的完成计数
+    def refresh_ancestor_rows(project_name, task_id):
+        for ancestor_id in task_index(project_name).ancestors(task_id):
+            refresh_task_row(project_name, ancestor_id)
+
+    # 插入新任务对应的一行，子任务放在父任务的子树末尾；父任务折叠时先把它展开
+    # reveal 为 False 时（其他会话添加的任务）不改变折叠状态，只刷新父任务的计数；筛选时由 after_tasks_changed 重排
+    def insert_task_row(project_name, task_id, parent_task_id=None, reveal=True):
+        if project_name != current_project:
+            return
+        if parent_task_id is None:
+            if not filtering():
+                splice_rows(project_name, len(task_order), [task_id])
+            return
+        refresh_ancestor_rows(project_name, task_id)
+        if filtering() or parent_task_id not in task_order:
+            return
+        if parent_task_id in expanded_tasks(project_name):
+            splice_rows(project_name, position_after_subtree(project_name, parent_task_id), [task_id])
+        elif reveal:
+            toggle_subtasks(project_name, parent_task_id)
+        else:
+            refresh_task_row(project_name, parent_task_id)
+
+    # 移除已删除任务对应的行，并更新同级中排在后面的任务（连同后代）的显示序号
+    def remove_task_rows(project_name, task_ids, parent_task_id):
+        if project_name != current_project:
+            return
+        expanded_tasks(project_name).difference_update(task_ids)
+        drop_rows(task_ids)
+        if parent_task_id is None:
+            start, end = 0, len(task_order)
+        elif parent_task_id in task_order:
+            start = task_order.index(parent_task_id) + 1
+            end = position_after_subtree(project_name, parent_task_id)
+        else:
+            return
+        index = task_index(project_name)
+        for task_id in task_order[start:min(end, len(task_tree.controls))]:
+            refs = task_rows[task_id].data
+            number = index.number(task_id)
+            if number != refs["task_number"]:
+                refs["task_number"] = number
+                refs["title"].value = " " * 8 * refs["indent_level"] + f"{number}. {index.get(task_id)['name']}"
+                ui.update(refs["title"])
 
     # 高亮任务项
     def highlight_task_item(e, task_item):
-        # 恢复所有任务项的默认背景色
-        for item in task_tree.controls:
-            if isinstance(item, ft.Container):  # 确保是任务项
-                item.bgcolor = None
+        nonlocal highlighted_item
+        # 恢复上一个高亮任务项的默认背景色
+        if highlighted_item is not None and highlighted_item is not task_item:
+            highlighted_item.bgcolor = None
+            ui.update(highlighted_item)
         # 设置当前任务项的背景色为浅蓝色
+        highlighted_item = task_item
         task_item.bgcolor = ft.colors.BLUE_100
-        page.update()
+        ui.update(task_item)
 
-    # 构建任务项
-    def build_task_item(project_name, task_id, task_data, indent_level, sub=False):
-        task_name = task_data["name"]
-        completed = task_data.get("completed", False)
-        completed_time = task_data.get("completed_time", "")
-        created_time = task_data.get("created_time", "")
-        note = task_data.get("note", "")
+    # 按任务在树中的层级创建一行
+    def build_row(project_name, task_id):
+        indent_level = task_index(project_name).depths[task_id]
+        return build_task_item(project_name, task_id, get_task(project_name, task_id), indent_level)
+
+    # 构建任务详情，第一次展开时才创建
+    def build_task_details(project_name, task_id, task_item):
+        task_data = get_task(project_name, task_id)
 
         # 任务名称输入框
         task_name_input = ft.TextField(
             label="任务名称",
-            value=task_name,
+            value=task_data["name"],
             border_radius=ft.BorderRadius(top_left=3, top_right=0, bottom_left=3, bottom_right=0)
         )
 
         # 任务备注输入框
-        note_input = ft.TextField(label="备注", multiline=True, value=note)
+        note_input = ft.TextField(label="备注", multiline=True, value=task_data.get("note", ""))
 
-        # 自动保存备注的函数
+        # 自动保存备注的函数：内存立即更新，写盘交给 note_saver 合并
         def save_note(e):
-            if "." in task_id and task_id.count(".") > 1:  # 子任务
-                parent_task_id = task_id[:task_id.rfind(".")]
-                if parent_task_id in projects[project_name]["tasks"]:
-                    projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["note"] = note_input.value
-                else:
-                    # 如果父任务不存在，可能是根任务的子任务
-                    for root_task_id, root_task_data in projects[project_name]["tasks"].items():
-                        if task_id.startswith(root_task_id):
-                            root_task_data["subtasks"][task_id]["note"] = note_input.value
-                            break
-            else:  # 根任务
-                projects[project_name]["tasks"][task_id]["note"] = note_input.value
-            save_data(projects)
-            # 显示保存成功的提示
-            page.overlay.append(ft.SnackBar(ft.Text("备注已保存！"), open=True))
-            page.update()
+            task_data = get_task(project_name, task_id)
+            history.record_note(project_name, task_id, task_data.get("note", ""), note_input.value)
+            task_data["note"] = note_input.value
+            reindex_task(project_name, task_id)
+            note_saver.schedule((project_name, task_id), note_input.value)
 
         # 绑定输入框的 on_change 事件
         note_input.on_change = save_note
 
-        # 任务详情
-        task_details = ft.Column(
-            controls=[
-                ft.Text(f"添加日期: {created_time}", size=16),
-                ft.Text(f"完成日期: {completed_time}", size=16),
-                ft.Row(
-                    controls=[
-                        task_name_input,
-                        ft.IconButton(
-                            on_click=lambda e: save_task_name(project_name, task_id, task_name_input.value),
-                            icon=ft.icons.CHECK,
-                            style=ft.ButtonStyle(
-                                shape=ft.BeveledRectangleBorder(radius=0),
-                                side=ft.BorderSide(width=0.3)
-                            ),
-                            height=48
-                        )
-                    ],
-                    spacing=0
-                ),  # 任务名称输入框
-                note_input,
-            ],
-            visible=False,
-        )
+        # 完成日期，完成/取消完成时就地更新
+        completed_time_text = ft.Text(f"完成日期: {task_data.get('completed_time', '')}", size=16)
+        task_item.data["completed_time"] = completed_time_text
+        task_item.data["name_input"] = task_name_input
+        task_item.data["note_input"] = note_input
 
-        # 生成任务编号
-        if sub:
-            # 子任务编号
-            parts = task_id.split(".")
-            task_number = ".".join(parts[1:])  # 去掉 "root" 部分
-        else:
-            # 根任务编号
-            task_number = task_id.split(".")[1]
+        return [
+            ft.Text(f"添加日期: {task_data.get('created_time', '')}", size=16),
+            completed_time_text,
+            ft.Row(
+                controls=[
+                    task_name_input,
+                    ft.IconButton(
+                        on_click=ui.batched(lambda e: save_task_name(project_name, task_id, task_name_input.value)),
+                        icon=ft.icons.CHECK,
+                        style=ft.ButtonStyle(
+                            shape=ft.BeveledRectangleBorder(radius=0),
+                            side=ft.BorderSide(width=0.3)
+                        ),
+                        height=48
+                    )
+                ],
+                spacing=0
+            ),  # 任务名称输入框
+            note_input,
+        ]
+
+    # 构建任务项
+    @instrumentation.timed("build_task_item")
+    def build_task_item(project_name, task_id, task_data, indent_level):
+        task_name = task_data["name"]
+        completed = task_data.get("completed", False)
+        done, total = task_index(project_name).counts[task_id]
+
+        # 任务详情，内容在第一次展开时由 build_task_details 填充
+        task_details = ft.Column(visible=False)
+
+        # 显示序号按任务在树中的位置计算，与存储用的任务编号无关
+        task_number = task_index(project_name).number(task_id)
+
+        # 任务名称、状态和子任务完成计数，修改任务时就地更新
+        title_text = ft.Text(" " * 8 * indent_level + f"{task_number}. {task_name}", size=20)
+        status_text = ft.Text("已完成" if completed else "未完成", size=16, color="blue" if completed else "red")
+        progress_text = ft.Text(f"{done}/{total}", size=14, visible=total > 0)
+
+        # 展开/折叠子任务
+        toggle_button = ft.IconButton(
+            icon=ft.icons.ARROW_DROP_DOWN if task_id in expanded_tasks(project_name) else ft.icons.ARROW_RIGHT,
+            on_click=ui.batched(lambda e: toggle_subtasks(project_name, task_id)),
+            icon_size=16,
+            visible=has_toggle(project_name, task_id),
+        )
 
         # 任务项
         task_item = ft.Container(
@@ -279,31 +3700,33 @@ def main(page: ft.Page):
                 controls=[
                     ft.Row(
                         controls=[
-                            ft.Text(" " * 8 * indent_level + f"{task_number}. {task_name}", size=20),
-                            ft.Text("已完成" if completed else "未完成", size=16, color="blue" if completed else "red"),
+                            toggle_button,
+                            title_text,
+                            status_text,
+                            progress_text,
                             ft.IconButton(
                                 ft.icons.TASK_ALT,
-                                on_click=lambda e: [complete_task(project_name, task_id), highlight_task_item(e, task_item)],
+                                on_click=ui.batched(lambda e: [complete_task(project_name, task_id), highlight_task_item(e, task_item)]),
                                 icon_size=16
                             ),
                             ft.IconButton(
                                 ft.icons.CLEAR,
-                                on_click=lambda e: [uncomplete_task(project_name, task_id), highlight_task_item(e, task_item)],
+                                on_click=ui.batched(lambda e: [uncomplete_task(project_name, task_id), highlight_task_item(e, task_item)]),
                                 icon_size=16
                             ),
                             ft.IconButton(
                                 ft.icons.ADD,
-                                on_click=lambda e: [add_subtask(project_name, task_id), highlight_task_item(e, task_item)],
+                                on_click=ui.batched(lambda e: [add_subtask(project_name, task_id), highlight_task_item(e, task_item)]),
                                 icon_size=16
                             ),
                             ft.IconButton(
                                 ft.icons.DELETE,
-                                on_click=lambda e: [delete_task(project_name, task_id), highlight_task_item(e, task_item)],
+                                on_click=ui.batched(lambda e: delete_task(project_name, task_id)),
                                 icon_size=16
                             ),
                             ft.IconButton(
                                 icon=ft.icons.EXPAND_MORE,
-                                on_click=lambda e: [toggle_task_details(e, task_details), highlight_task_item(e, task_item)],
+                                on_click=ui.batched(lambda e: [toggle_task_details(project_name, task_id, task_item), highlight_task_item(e, task_item)]),
                             ),
                         ],
                     ),
@@ -311,188 +3734,346 @@ def main(page: ft.Page):
                 ],
             ),
             # 添加点击事件
-            on_click=lambda e: highlight_task_item(e, task_item),
+            on_click=ui.batched(lambda e: highlight_task_item(e, task_item)),
             padding=10,  # 添加内边距
             border_radius=5,  # 添加圆角
+            key=task_id,  # 搜索结果跳转时按编号滚动
+            data={
+                "task_id": task_id,
+                "title": title_text,
+                "status": status_text,
+                "progress": progress_text,
+                "toggle": toggle_button,
+                "details": task_details,
+                "completed_time": None,  # 以下三项在详情第一次展开时填充
+                "name_input": None,
+                "note_input": None,
+                "indent_level": indent_level,
+                "task_number": task_number,
+            },
         )
-        if sub:
-            task_item.content.controls[0].controls.pop(4)
+        task_rows[task_id] = task_item
         return task_item
 
     # 保存任务名称
     def save_task_name(project_name, task_id, new_name):
-        if "." in task_id and task_id.count(".") > 1:  # 子任务
-            parent_task_id = task_id[:task_id.rfind(".")]
-            if parent_task_id in projects[project_name]["tasks"]:
-                projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["name"] = new_name
-            else:
-                # 如果父任务不存在，可能是根任务的子任务
-                for root_task_id, root_task_data in projects[project_name]["tasks"].items():
-                    if task_id.startswith(root_task_id):
-                        root_task_data["subtasks"][task_id]["name"] = new_name
-                        break
-        else:  # 根任务
-            projects[project_name]["tasks"][task_id]["name"] = new_name
-        save_data(projects)
-        show_tasks(project_name)
+        if not history.rename_task(project_name, task_id, new_name):
+            return
+        refresh_task_row(project_name, task_id)
+        broadcast("task_changed", project_name, task_id)
 
     # 切换任务详情
-    def toggle_task_details(e, task_details):
+    def toggle_task_details(project_name, task_id, task_item):
+        task_details = task_item.data["details"]
+        if not task_details.controls:
+            task_details.controls = build_task_details(project_name, task_id, task_item)
         task_details.visible = not task_details.visible
-        page.update()
+        ui.update(task_item)
 
     # 完成任务
     def complete_task(project_name, task_id):
-        if "." in task_id and task_id.count(".") > 1:  # 子任务
-            parent_task_id = task_id[:task_id.rfind(".")]
-            if parent_task_id in projects[project_name]["tasks"]:
-                projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["completed"] = True
-                projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["completed_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                # 如果父任务不存在，可能是根任务的子任务
-                for root_task_id, root_task_data in projects[project_name]["tasks"].items():
-                    if task_id.startswith(root_task_id):
-                        root_task_data["subtasks"][task_id]["completed"] = True
-                        root_task_data["subtasks"][task_id]["completed_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        break
-        else:  # 根任务
-            projects[project_name]["tasks"][task_id]["completed"] = True
-            projects[project_name]["tasks"][task_id]["completed_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        save_data(projects)
-        show_tasks(project_name)
+        set_completed(project_name, task_id, True)
 
     # 未完成任务
     def uncomplete_task(project_name, task_id):
-        if "." in task_id and task_id.count(".") > 1:  # 子任务
-            parent_task_id = task_id[:task_id.rfind(".")]
-            if parent_task_id in projects[project_name]["tasks"]:
-                projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["completed"] = False
-                projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]["completed_time"] = ""
-            else:
-                # 如果父任务不存在，可能是根任务的子任务
-                for root_task_id, root_task_data in projects[project_name]["tasks"].items():
-                    if task_id.startswith(root_task_id):
-                        root_task_data["subtasks"][task_id]["completed"] = False
-                        root_task_data["subtasks"][task_id]["completed_time"] = ""
-                        break
-        else:  # 根任务
-            projects[project_name]["tasks"][task_id]["completed"] = False
-            projects[project_name]["tasks"][task_id]["completed_time"] = ""
-        save_data(projects)
-        show_tasks(project_name)
+        set_completed(project_name, task_id, False)
+
+    def set_completed(project_name, task_id, completed):
+        if not history.set_completed(project_name, task_id, completed):
+            return
+        refresh_task_row(project_name, task_id)
+        refresh_ancestor_rows(project_name, task_id)
+        after_tasks_changed(project_name)
+        broadcast("task_changed", project_name, task_id)
 
     # 添加子任务
     def add_subtask(project_name, parent_task_id):
-        new_subtask_name = ft.TextField(hint_text="输入子任务名称")
-        dialog = ft.AlertDialog(
-            title=ft.Text("添加子任务"),
-            content=new_subtask_name,
-            actions=[
-                ft.ElevatedButton(
-                    "添加",
-                    on_click=lambda e: save_subtask(project_name, parent_task_id, new_subtask_name.value),
-                ),
-                ft.ElevatedButton("取消", on_click=lambda e: close_dialog(dialog)),
-            ],
+        notifier.prompt(
+            "添加子任务",
+            lambda subtask_name: save_subtask(project_name, parent_task_id, subtask_name),
+            hint_text="输入子任务名称",
+            confirm_text="添加",
         )
-        page.overlay.append(dialog)  # Add dialog to overlay
-        dialog.open = True
-        page.update()
 
+    # 添加成功时返回 True，对话框随之关闭
     def save_subtask(project_name, parent_task_id, subtask_name):
         if subtask_name:
-            # 获取父任务对象
-            if "." in parent_task_id:  # 如果父任务是子任务
-                # 递归查找父任务
-                parts = parent_task_id.split(".")
-                current_task = projects[project_name]["tasks"][f"{parts[0]}.{parts[1]}"]  # 根任务
-                for part in parts[2:]:
-                    current_task = current_task["subtasks"][f"{'.'.join(parts[:parts.index(part) + 1])}"]
-            else:  # 如果父任务是根任务
-                current_task = projects[project_name]["tasks"][parent_task_id]
-
-            # 初始化父任务的 subtasks 字段
-            if "subtasks" not in current_task:
-                current_task["subtasks"] = {}
-
-            # 生成唯一的子任务 ID
-            subtask_id = f"{parent_task_id}.{len(current_task['subtasks']) + 1}"
-
-            # 创建子任务数据
-            subtask_data = {
-                "name": subtask_name,
-                "created_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "completed": False,
-                "completed_time": "",
-                "note": "",
-                "subtasks": {},  # 初始化子任务
-            }
-
-            # 将子任务添加到父任务的 subtasks 字段中
-            current_task["subtasks"][subtask_id] = subtask_data
+            subtask_id = history.add_task(project_name, parent_task_id, subtask_name)
+            if subtask_id is None:
+                notifier.show("父任务已被删除！")
+                return True
 
-            # 保存数据并更新界面
-            save_data(projects)
-            show_tasks(project_name)
-            close_dialog()
+            # 更新界面
+            insert_task_row(project_name, subtask_id, parent_task_id)
+            after_tasks_changed(project_name)
+            broadcast("task_added", project_name, subtask_id, parent_task_id)
+            return True
+        return False
 
     # 添加根任务
+    @ui.batched
     def add_root_task(e):
         if current_project:
-            new_task_name = ft.TextField(hint_text="输入根任务名称")
-            dialog = ft.AlertDialog(
-                title=ft.Text("添加根任务"),
-                content=new_task_name,
-                actions=[
-                    ft.ElevatedButton(
-                        "添加",
-                        on_click=lambda e: save_root_task(current_project, new_task_name.value),
-                    ),
-                    ft.ElevatedButton("取消", on_click=lambda e: close_dialog(dialog)),
-                ],
+            project_name = current_project
+            notifier.prompt(
+                "添加根任务",
+                lambda task_name: save_root_task(project_name, task_name),
+                hint_text="输入根任务名称",
+                confirm_text="添加",
             )
-            page.overlay.append(dialog)  # Add dialog to overlay
-            dialog.open = True
         else:
-            page.overlay.append(ft.SnackBar(ft.Text("请新建或者选择项目！"), open=True))
-        page.update()
+            notifier.show("请新建或者选择项目！")
 
+    # 添加成功时返回 True，对话框随之关闭
     def save_root_task(project_name, task_name):
         if task_name:
-            task_id = f"root.{len(projects[project_name]['tasks']) + 1}"
-            projects[project_name]["tasks"][task_id] = {
-                "name": task_name,
-                "created_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "completed": False,
-                "completed_time": "",
-                "note": "",
-                "subtasks": {},  # 初始化子任务
-            }
-            save_data(projects)
-            show_tasks(project_name)
-            close_dialog()
-
-    def close_dialog(dialog):
-        if dialog in page.overlay:  # Check if dialog is in overlay
-            page.close(dialog)  # Remove dialog from overlay
-            page.update()
+            task_id = history.add_task(project_name, None, task_name)
+            if task_id is None:
+                notifier.show(f"项目 {project_name} 已被删除！")
+                return True
+            insert_task_row(project_name, task_id)
+            after_tasks_changed(project_name)
+            broadcast("task_added", project_name, task_id, None)
+            return True
+        return False
 
     # 删除任务
     def delete_task(project_name, task_id):
-        if "." in task_id and task_id.count(".") > 1:  # 子任务
-            parent_task_id = task_id[:task_id.rfind(".")]
-            if parent_task_id in projects[project_name]["tasks"]:
-                del projects[project_name]["tasks"][parent_task_id]["subtasks"][task_id]
+        note_saver.flush()
+        result = history.delete_task(project_name, task_id)
+        if result is None:
+            return
+        removed, parent_task_id = result
+        remove_task_rows(project_name, removed, parent_task_id)
+        if parent_task_id is not None:
+            refresh_task_row(project_name, parent_task_id)
+            refresh_ancestor_rows(project_name, parent_task_id)
+        after_tasks_changed(project_name)
+        refresh_search_results()
+        broadcast("task_removed", project_name, removed, parent_task_id)
+
+    # 撤销/重做：先写入尚未保存的备注，再按返回的修改消息像处理其他会话的修改一样修补界面
+    @ui.batched
+    def undo(e):
+        note_saver.flush()
+        apply_history(history.undo(), "撤销")
+
+    @ui.batched
+    def redo(e):
+        note_saver.flush()
+        apply_history(history.redo(), "重做")
+
+    def apply_history(messages, action):
+        if messages is None:
+            notifier.show(f"没有可{action}的操作")
+        elif not messages:
+            notifier.show(f"无法{action}：相关数据已被修改或删除")
+        for message in messages or ():
+            on_remote_change(message)
+            broadcast(*message)
+
+    # 完成情况看板：各项目的完成进度和最近 DASHBOARD_DAYS 天每天完成的任务数，全部取自缓存的统计
+    dashboard_summary = ft.Text("", size=14)
+    dashboard_chart = ft.BarChart(
+        left_axis=ft.ChartAxis(labels_size=32),
+        horizontal_grid_lines=ft.ChartGridLines(color=ft.colors.GREY_300, width=1),
+        height=220,
+    )
+    dashboard_projects = ft.Column(spacing=8)
+    dashboard_panel = ft.Column(visible=False, width=420, scroll=ft.ScrollMode.AUTO)
+
+    def refresh_dashboard():
+        if not dashboard_panel.visible:
+            return
+        project_names = store.project_names()
+        project_stats = [workspace.project_stats(project_name) for project_name in project_names]
+        days = [day for day, _ in completion_history(empty_stats(), DASHBOARD_DAYS)]
+        counts = [sum(stats["days"].get(day, 0) for stats in project_stats) for day in days]
+        completed = sum(stats["completed"] for stats in project_stats)
+        total = sum(stats["total"] for stats in project_stats)
+        dashboard_summary.value = f"全部项目已完成 {completed}/{total}，近 {DASHBOARD_DAYS} 天完成 {sum(counts)}"
+        dashboard_chart.bar_groups = [
+            ft.BarChartGroup(
+                x=i,
+                bar_rods=[ft.BarChartRod(from_y=0, to_y=count, width=8, color=ft.colors.BLUE, tooltip=f"{day}\n{count}")],
+            )
+            for i, (day, count) in enumerate(zip(days, counts))
+        ]
+        dashboard_chart.bottom_axis = ft.ChartAxis(
+            labels=[
+                ft.ChartAxisLabel(value=i, label=ft.Text(day[5:], size=10))
+                for i, day in enumerate(days) if (len(days) - 1 - i) % 7 == 0
+            ],
+            labels_size=24,
+        )
+        dashboard_chart.max_y = max(counts + [1])
+        dashboard_projects.controls = [
+            ft.Column(
+                controls=[
+                    ft.Text(f"{project_name}  {stats['completed']}/{stats['total']}", size=14),
+                    ft.ProgressBar(value=stats["completed"] / stats["total"] if stats["total"] else 0),
+                ],
+                spacing=2,
+            )
+            for project_name, stats in zip(project_names, project_stats)
+        ]
+        ui.update(dashboard_panel)
+
+    @ui.batched
+    def toggle_dashboard(e):
+        dashboard_panel.visible = not dashboard_panel.visible
+        ui.update(dashboard_panel)
+        refresh_dashboard()
+
+    dashboard_panel.controls = [
+        ft.Text("完成情况", size=20),
+        dashboard_summary,
+        ft.Text(f"最近 {DASHBOARD_DAYS} 天每天完成的任务数", size=12, color=ft.colors.GREY_700),
+        dashboard_chart,
+        dashboard_projects,
+    ]
+
+    # 批量导入/导出：读写文件和整批写入在线程池中进行，完成后只刷新一次界面
+    async def import_tasks(e):
+        if not e.files:
+            return
+        path = e.files[0].path
+        if path is None:
+            # 网页端只能拿到文件名，读不到本地文件
+            with ui:
+                notifier.show("网页版无法读取本地文件，请在桌面版中导入")
+            return
+        try:
+            projects, count, orphans = await asyncio.to_thread(read_task_file, path)
+            imported = await asyncio.to_thread(workspace.import_projects, projects)
+        except (OSError, ValueError) as exc:
+            with ui:
+                notifier.show(f"导入失败：{exc}")
+            return
+        with ui:
+            apply_import(imported)
+            if orphans:
+                notifier.show(f"已导入 {count} 个任务，其中 {orphans} 个找不到父任务，已作为根任务导入")
             else:
-                # 如果父任务不存在，可能是根任务的子任务
-                for root_task_id, root_task_data in projects[project_name]["tasks"].items():
-                    if task_id.startswith(root_task_id):
-                        del root_task_data["subtasks"][task_id]
-                        break
-        else:  # 根任务
-            del projects[project_name]["tasks"][task_id]
-        save_data(projects)
-        show_tasks(project_name)
+                notifier.show(f"已导入 {count} 个任务")
+        broadcast("tasks_imported", imported)
+
+    # 导入的任务追加在各项目的根任务末尾：刷新项目列表，当前项目只插入新行
+    def apply_import(imported):
+        update_project_list()
+        task_ids = imported.get(current_project)
+        if task_ids:
+            if filtering():
+                render_order(current_project, current_order(current_project))
+            else:
+                splice_rows(current_project, len(task_order), task_ids)
+
+    async def export_tasks(e):
+        if not e.path:
+            return
+        with ui:
+            note_saver.flush(notify=False)
+        try:
+            count = await asyncio.to_thread(workspace.export_file, e.path)
+        except (OSError, ValueError) as exc:
+            with ui:
+                notifier.show(f"导出失败：{exc}")
+            return
+        with ui:
+            notifier.show(f"已导出 {count} 个任务到 {os.path.basename(e.path)}")
+
+    import_picker = ft.FilePicker(on_result=import_tasks)
+    export_picker = ft.FilePicker(on_result=export_tasks)
+    page.overlay.extend([import_picker, export_picker])
+    project_list_buttons = ft.Row(
+        controls=[
+            ft.IconButton(ft.icons.INSIGHTS, tooltip="完成情况", on_click=toggle_dashboard),
+            ft.IconButton(
+                ft.icons.UPLOAD_FILE,
+                tooltip="从 CSV / JSON Lines 导入",
+                on_click=lambda e: import_picker.pick_files(
+                    dialog_title="导入任务", allowed_extensions=["csv", "jsonl", "ndjson"]
+                ),
+            ),
+            ft.IconButton(
+                ft.icons.DOWNLOAD,
+                tooltip="导出全部项目",
+                on_click=lambda e: export_picker.save_file(
+                    dialog_title="导出任务", file_name="tasks.csv", allowed_extensions=["csv", "jsonl"]
+                ),
+            ),
+        ],
+        spacing=0,
+    )
+
+    # 性能统计面板，只在启用性能统计时出现；显示期间定时刷新
+    stats_text = ft.Text("", size=12, font_family="monospace", selectable=True)
+    profile_button = ft.TextButton("开始分析")
+    stats_panel = ft.Column(visible=False, width=420, scroll=ft.ScrollMode.AUTO)
+    stats_generation = 0  # 每次打开面板加一，旧的刷新循环据此退出
+
+    async def refresh_stats(generation):
+        while stats_panel.visible and generation == stats_generation:
+            stats_text.value = "\n".join(instrumentation.summary_lines())
+            with ui:
+                ui.update(stats_text)
+            await asyncio.sleep(PERF_PANEL_INTERVAL)
+
+    @ui.batched
+    def toggle_stats(e):
+        nonlocal stats_generation
+        stats_panel.visible = not stats_panel.visible
+        ui.update(stats_panel)
+        if stats_panel.visible:
+            stats_generation += 1
+            return refresh_stats(stats_generation)
+
+    @ui.batched
+    def toggle_profile(e):
+        if instrumentation.profiler is None:
+            instrumentation.start_profile()
+            profile_button.text = "停止分析并导出"
+        else:
+            path = instrumentation.stop_profile()
+            profile_button.text = "开始分析"
+            notifier.show(f"分析结果已保存到 {path}")
+        ui.update(profile_button)
+
+    @ui.batched
+    def write_stats_log(e):
+        instrumentation.log_summary()
+        notifier.show(f"统计已写入 {instrumentation.log_file}")
+
+    @ui.batched
+    def reset_stats(e):
+        instrumentation.reset()
+        stats_text.value = ""
+        ui.update(stats_text)
+
+    profile_button.on_click = toggle_profile
+    stats_panel.controls = [
+        ft.Text("性能统计", size=20),
+        ft.Row(controls=[
+            profile_button,
+            ft.TextButton("写入日志", on_click=write_stats_log),
+            ft.TextButton("清零", on_click=reset_stats),
+        ]),
+        stats_text,
+    ]
+    task_header = [
+        ft.Text("任务分解", size=20),
+        current_project_display,  # 显示当前项目名称
+        ft.Row(
+            controls=[
+                ft.IconButton(ft.icons.UNDO, tooltip="撤销", on_click=undo),
+                ft.IconButton(ft.icons.REDO, tooltip="重做", on_click=redo),
+                ft.IconButton(ft.icons.NOTE_ADD_OUTLINED, on_click=add_root_task),
+            ],
+            spacing=0,
+        ),
+    ]
+    if instrumentation.enabled:
+        task_header.append(ft.IconButton(ft.icons.SPEED, tooltip="性能统计", on_click=toggle_stats))
 
     # 初始化项目列表
     update_project_list()
@@ -503,7 +4084,12 @@ def main(page: ft.Page):
             controls=[
                 ft.Column(
                     controls=[
-                        ft.Text("项目列表", size=20),
+                        ft.Row(
+                            controls=[ft.Text("项目列表", size=20), project_list_buttons],
+                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN
+                        ),
+                        search_input,
+                        search_results,
                         ft.Row(controls=[new_project_input, add_project_button], spacing=0),
                         project_list,
                     ],
@@ -513,22 +4099,475 @@ def main(page: ft.Page):
                 ft.Column(
                     controls=[
                         ft.Row(
-                            controls=[
-                                ft.Text("任务分解", size=20),
-                                current_project_display,  # 显示当前项目名称
-                                ft.IconButton(ft.icons.NOTE_ADD_OUTLINED, on_click=add_root_task),
-                            ],
+                            controls=task_header,
                             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         ),
+                        ft.Row(controls=[status_filter, period_filter, task_sort]),
                         task_tree,
                     ],
                     expand=True,
                 ),
+                dashboard_panel,
+                stats_panel,
             ],
             expand=True,
         )
     )
 
 
-# 运行应用程序
-ft.app(target=main)
+# 转换数据文件格式，例如把 projects.json 转成 msgpack；日志文件保持 JSON 不变
+def convert_data_file(source, target, data_format):
+    if not os.path.exists(source):
+        raise SystemExit(f"{source} 不存在")
+    atomic_write(target, encode_data(load_data(source), data_format))
+    print(f"已把 {source} 转换为 {data_format} 格式：{target}（{os.path.getsize(target)} 字节）")
+
+
+# 批量导入导出的列（CSV 表头，也是 JSON Lines 每行的键）；层级由 parent_id 表示，指向同一项目中另一行的 id，根任务留空
+TRANSFER_FIELDS = ("project", "id", "parent_id", "name", "completed", "created_time", "completed_time", "note")
+
+# 导入文件中没有 project 列的行放进这个项目
+IMPORT_PROJECT = "导入的任务"
+
+# completed 列中表示已完成的取值（不区分大小写），其余取值和空值都视为未完成
+TRUE_VALUES = frozenset({"1", "true", "yes", "y", "是", "已完成"})
+
+
+# 按扩展名判断导入导出文件的格式：csv 或 jsonl（.jsonl / .ndjson）
+def transfer_format(path, data_format=None):
+    if data_format:
+        return data_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"无法识别 {os.path.basename(path)} 的格式，请使用 .csv 或 .jsonl 文件")
+
+
+# 逐行读取导入文件，每次产出一行的字典，不会把整个文件读进内存
+def read_task_rows(path, data_format=None):
+    if transfer_format(path, data_format) == "csv":
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            reader = csv.DictReader(file)
+            if reader.fieldnames is not None and "name" not in reader.fieldnames:
+                raise ValueError("CSV 文件缺少 name 列")
+            yield from reader
+        return
+    loads = orjson.loads if orjson else json.loads
+    with open(path, "rb") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = loads(line)
+            except ValueError as exc:
+                raise ValueError(f"第 {line_number} 行不是有效的 JSON：{exc}") from None
+            if not isinstance(row, dict):
+                raise ValueError(f"第 {line_number} 行不是 JSON 对象")
+            yield row
+
+
+# 导入文件中的时间：数字按时间戳处理，字符串按 TIME_FORMAT 解析，空值为 None
+def import_time(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    return parse_time(str(value).strip()) if value else None
+
+
+# 把导入的行组装成任务树，返回 (项目名称 -> {临时编号: 根任务}, 任务数, 找不到父任务的任务数)
+# 子任务可以出现在父任务之前；父任务始终没有出现或 parent_id 成环的任务最后作为根任务导入
+def tasks_from_rows(rows, default_project=IMPORT_PROJECT):
+    projects = {}
+    nodes = {}  # (项目名称, 文件中的编号) -> 任务
+    parents = {}  # (项目名称, 文件中的编号) -> 已挂上的父任务的键
+    waiting = {}  # (项目名称, 父任务编号) -> 在父任务之前出现的 [(键, 任务)]
+    orphans = []  # (项目名称, 任务)
+    now = int(time.time())
+    count = 0
+    for row in rows:
+        count += 1
+        project_name = str(row.get("project") or "").strip() or default_project
+        roots = projects.setdefault(project_name, {})
+        completed = str(row.get("completed") or "").strip().lower() in TRUE_VALUES
+        task = Task(
+            str(count),
+            str(row.get("name") or ""),
+            import_time(row.get("created_time")) or now,
+            completed,
+            (import_time(row.get("completed_time")) or now) if completed else None,
+            str(row.get("note") or ""),
+        )
+        row_id = str(row.get("id") or "").strip()
+        parent_id = str(row.get("parent_id") or "").strip()
+        key = (project_name, row_id) if row_id else None
+        if key in nodes:
+            raise ValueError(f"项目「{project_name}」中的任务编号 {row_id} 重复")
+        parent_key = (project_name, parent_id)
+        if not parent_id:
+            roots[task.id] = task
+        elif parent_key in nodes:
+            parent = nodes[parent_key]
+            if parent.children is None:
+                parent.children = []
+            parent.children.append(task)
+            if key is not None:
+                parents[key] = parent_key
+        else:
+            waiting.setdefault(parent_key, []).append((key, task))
+        if key is None:
+            continue
+        nodes[key] = task
+        children = waiting.pop(key, None)
+        if children:
+            # 先到的子任务挂到本任务下；其中若有本任务自己或它的祖先，说明编号成环，留到最后作为根任务
+            ancestors = {key}
+            ancestor_key = key
+            while ancestor_key in parents:
+                ancestor_key = parents[ancestor_key]
+                ancestors.add(ancestor_key)
+            task.children = []
+            for child_key, child in children:
+                if child_key in ancestors:
+                    orphans.append((project_name, child))
+                else:
+                    task.children.append(child)
+                    if child_key is not None:
+                        parents[child_key] = key
+            task.children = task.children or None
+    for (project_name, _), children in waiting.items():
+        orphans.extend((project_name, child) for _, child in children)
+    for project_name, task in orphans:
+        projects[project_name][task.id] = task
+    return projects, count, len(orphans)
+
+
+# 读取并组装导入文件，返回值同 tasks_from_rows；读取只在内存中进行，由调用方一次写入存储
+def read_task_file(path, data_format=None, default_project=IMPORT_PROJECT):
+    return tasks_from_rows(read_task_rows(path, data_format), default_project)
+
+
+# 项目中全部任务的导出行（按 TRANSFER_FIELDS 排列的元组），父任务在前，同级任务保持显示顺序
+def export_rows(project_name, tasks):
+    stack = [(task_id, None, task) for task_id, task in reversed(list(tasks.items()))]
+    while stack:
+        task_id, parent_id, task = stack.pop()
+        yield (
+            project_name,
+            task_id,
+            parent_id,
+            task.get("name", ""),
+            int(bool(task.get("completed", False))),
+            task.get("created_time", ""),
+            task.get("completed_time", ""),
+            task.get("note", ""),
+        )
+        subtasks = reversed(list(task.get("subtasks", {}).items()))
+        stack.extend((subtask_id, task_id, subtask) for subtask_id, subtask in subtasks)
+
+
+# 逐行写出导出文件，写完后再替换目标文件，返回写出的行数
+def write_task_rows(path, rows, data_format=None):
+    data_format = transfer_format(path, data_format)
+    count = 0
+    tmp_file = path + ".tmp"
+    try:
+        if data_format == "csv":
+            # 带 BOM，表格软件直接打开时中文不乱码
+            with open(tmp_file, "w", encoding="utf-8-sig", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(TRANSFER_FIELDS)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+        else:
+            with open(tmp_file, "wb") as file:
+                for row in rows:
+                    record = dict(zip(TRANSFER_FIELDS, row))
+                    record["completed"] = bool(record["completed"])
+                    if orjson:
+                        file.write(orjson.dumps(record) + b"\n")
+                    else:
+                        file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                    count += 1
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return count
+
+
+# 实际使用的编码库
+def codec_library(data_format):
+    if data_format == "msgpack":
+        return "msgpack"
+    return "orjson" if orjson and data_format == "json" else "json"
+
+
+# 快照格式基准：各规模下每种格式的文件大小、保存（编码 + 原子写入）和加载（读取 + 解码 + 转成 Task）耗时
+# 时间取 repeat 次中最快的一次，单位毫秒；未安装 msgpack 时跳过该格式
+def benchmark_codecs(sizes=(1000, 10000, 100000), repeat=3):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            data = {"基准项目": {"tasks": generate_tasks(size), "next_id": size + 1}}
+            for data_format in CODECS:
+                if data_format == "msgpack" and msgpack is None:
+                    continue
+                path = os.path.join(directory, f"{size}.{data_format}")
+                save_time = load_time = float("inf")
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    atomic_write(path, encode_data(data, data_format), backups=0, sync_dir=False)
+                    save_time = min(save_time, time.perf_counter() - start)
+                    start = time.perf_counter()
+                    for project in load_data(path).values():
+                        project["tasks"] = tasks_from_json(project["tasks"])
+                    load_time = min(load_time, time.perf_counter() - start)
+                results.append({
+                    "tasks": size,
+                    "format": data_format,
+                    "library": codec_library(data_format),
+                    "bytes": os.path.getsize(path),
+                    "save_ms": round(save_time * 1000, 2),
+                    "load_ms": round(load_time * 1000, 2),
+                })
+    return results
+
+
+# 进程累计写出的字节数（含 SQLite 等本地库的写入），只在提供 /proc/self/io 的系统上可用
+def bytes_written():
+    try:
+        with open("/proc/self/io", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# 等待延迟写入全部落盘，使每项操作的写入量和耗时都计在它自己名下
+def flush_writes():
+    background_writer.flush()
+    durable_writer.flush()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# 执行 count 次操作 run(i) 并统计延迟分位数、写入字节数；另跑 memory_runs 次测内存峰值，避免 tracemalloc 拖慢计时
+def measure_operation(run, count, memory_runs):
+    samples = []
+    written = bytes_written()
+    for i in range(count):
+        start = time.perf_counter()
+        run(i)
+        samples.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    flush_writes()
+    flush_time = time.perf_counter() - start
+    if written is not None:
+        written = bytes_written() - written
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(count, count + memory_runs):
+        run(i)
+    flush_writes()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {
+        "count": count,
+        "mean_ms": round(sum(samples) / count * 1000, 4),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 4),
+        "p90_ms": round(percentile(samples, 0.9) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+        "max_ms": round(max(samples) * 1000, 4),
+        "flush_ms": round(flush_time * 1000, 4),
+        "bytes_written": written,
+        "bytes_per_op": None if written is None else round(written / count),
+        "peak_memory_bytes": peak,
+    }
+
+
+# 无界面的数据操作基准：在临时目录中生成指定规模和层级的项目，经 Workspace 执行与界面相同的操作
+def benchmark_operations(tasks=10000, depth=3, fanout=5, operations=200, backend=None, data_format=None,
+                         load_repeat=5, seed=0):
+    global DATA_FORMAT
+    backend = backend or STORAGE_BACKEND
+    data_format = data_format or DATA_FORMAT
+    rng = random.Random(seed)
+    project_name = "基准项目"
+    previous_format, DATA_FORMAT = DATA_FORMAT, data_format
+    previous_directory = os.getcwd()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # 存储的默认路径都是相对路径，在临时目录中运行互不干扰
+            os.chdir(directory)
+            project = {"tasks": generate_tasks(tasks, depth, fanout), "next_id": tasks + 1}
+            atomic_write(DATA_FILE, encode_data({project_name: project}), backups=0, sync_dir=False)
+            bench_workspace = Workspace(open_store(backend))
+            bench_workspace.task_index(project_name)
+            flush_writes()
+
+            def task_ids():
+                return list(bench_workspace.task_index(project_name).nodes)
+
+            def snapshot():
+                return {project_name: {"tasks": bench_workspace.store.tasks(project_name)}}
+
+            # 快照整体保存与加载（save_data / load_data）
+            snapshot_file = "bench-snapshot." + data_format
+
+            def save(i):
+                save_data(snapshot(), snapshot_file)
+                durable_writer.flush()
+
+            def load(i):
+                for project in load_data(snapshot_file).values():
+                    project["tasks"] = tasks_from_json(project["tasks"])
+
+            results["save"] = measure_operation(save, load_repeat, 1)
+            results["load"] = measure_operation(load, load_repeat, 1)
+
+            # 打开存储并建立任务索引，即启动后第一次显示项目的数据准备
+            def open_project(i):
+                store = open_store(backend)
+                try:
+                    TaskIndex(store.tasks(project_name))
+                finally:
+                    store.close()
+
+            bench_workspace.store.close()
+            results["open_project"] = measure_operation(open_project, load_repeat, 1)
+            bench_workspace = Workspace(open_store(backend))
+            bench_workspace.task_index(project_name)
+
+            # 构建可见行顺序（show_tasks）：全部折叠与全部展开两种极端
+            results["build_tree_collapsed"] = measure_operation(
+                lambda i: bench_workspace.visible_order(project_name, set()), load_repeat, 1)
+            expanded = set(task_ids())
+            results["build_tree_expanded"] = measure_operation(
+                lambda i: bench_workspace.visible_order(project_name, expanded), load_repeat, 1)
+
+            memory_runs = max(1, operations // 10)
+            results["add_root_task"] = measure_operation(
+                lambda i: bench_workspace.add_task(project_name, None, f"根任务 {i}"), operations, memory_runs)
+            parents = task_ids()
+            added = []
+            results["add_subtask"] = measure_operation(
+                lambda i: added.append(bench_workspace.add_task(project_name, rng.choice(parents), f"子任务 {i}")),
+                operations, memory_runs)
+            targets = task_ids()
+            results["rename_task"] = measure_operation(
+                lambda i: bench_workspace.rename_task(project_name, rng.choice(targets), f"改名 {i}"),
+                operations, memory_runs)
+            results["complete_task"] = measure_operation(
+                lambda i: bench_workspace.set_completed(project_name, rng.choice(targets), True),
+                operations, memory_runs)
+            results["uncomplete_task"] = measure_operation(
+                lambda i: bench_workspace.set_completed(project_name, rng.choice(targets), False),
+                operations, memory_runs)
+            # 删除刚添加的子任务，项目规模保持不变
+            results["delete_task"] = measure_operation(
+                lambda i: bench_workspace.delete_task(project_name, added.pop()), operations, memory_runs)
+            bench_workspace.store.close()
+    finally:
+        os.chdir(previous_directory)
+        DATA_FORMAT = previous_format
+    return {
+        "tasks": tasks,
+        "depth": depth,
+        "fanout": fanout,
+        "backend": backend,
+        "format": data_format,
+        "library": codec_library(data_format),
+        "seed": seed,
+        "python": platform.python_version(),
+        "operations": results,
+    }
+
+
+# 命令行：不带参数时启动界面
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="项目任务管理")
+    commands = parser.add_subparsers(dest="command")
+    convert = commands.add_parser("convert", help="转换数据文件格式")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    convert.add_argument("--format", choices=sorted(CODECS), default=DATA_FORMAT)
+    bench = commands.add_parser("bench-codecs", help="比较各快照格式的文件大小和读写耗时")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    bench.add_argument("--repeat", type=int, default=3)
+    bench_ops = commands.add_parser("bench", help="无界面运行数据操作基准，结果输出为 JSON")
+    bench_ops.add_argument("--tasks", type=int, default=10000, help="生成的任务总数")
+    bench_ops.add_argument("--depth", type=int, default=3, help="子任务的最大层级")
+    bench_ops.add_argument("--fanout", type=int, default=5, help="每个任务的子任务数")
+    bench_ops.add_argument("--operations", type=int, default=200, help="每种单任务操作的执行次数")
+    bench_ops.add_argument("--load-repeat", type=int, default=5, help="整体保存、加载和构建的执行次数")
+    bench_ops.add_argument("--backend", choices=["json", "sharded", "sqlite"], default=STORAGE_BACKEND)
+    bench_ops.add_argument("--format", choices=sorted(CODECS), default=DATA_FORMAT)
+    bench_ops.add_argument("--seed", type=int, default=0)
+    bench_ops.add_argument("--output", help="结果写入的文件，省略时输出到标准输出")
+    import_tasks = commands.add_parser("import", help="从 CSV 或 JSON Lines 文件批量导入任务（请先关闭界面）")
+    import_tasks.add_argument("file")
+    import_tasks.add_argument("--format", choices=["csv", "jsonl"], help="省略时按扩展名判断")
+    import_tasks.add_argument("--project", default=IMPORT_PROJECT, help="没有 project 列的行导入到的项目")
+    import_tasks.add_argument("--backend", choices=["json", "sharded", "sqlite"], default=STORAGE_BACKEND)
+    export_tasks = commands.add_parser("export", help="把任务导出为 CSV 或 JSON Lines 文件")
+    export_tasks.add_argument("file")
+    export_tasks.add_argument("--format", choices=["csv", "jsonl"], help="省略时按扩展名判断")
+    export_tasks.add_argument("--project", action="append", help="只导出指定的项目，可重复；省略时导出全部项目")
+    export_tasks.add_argument("--backend", choices=["json", "sharded", "sqlite"], default=STORAGE_BACKEND)
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        convert_data_file(args.source, args.target, args.format)
+    elif args.command == "bench-codecs":
+        print(f"{'任务数':>8} {'格式':<12} {'编码库':<8} {'字节数':>12} {'保存(ms)':>10} {'加载(ms)':>10}")
+        for row in benchmark_codecs(args.sizes, args.repeat):
+            print(f"{row['tasks']:>8} {row['format']:<12} {row['library']:<8} {row['bytes']:>12} "
+                  f"{row['save_ms']:>10} {row['load_ms']:>10}")
+    elif args.command == "bench":
+        result = benchmark_operations(args.tasks, args.depth, args.fanout, args.operations, args.backend,
+                                      args.format, args.load_repeat, args.seed)
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(report + "\n")
+        else:
+            print(report)
+    elif args.command == "import":
+        start = time.perf_counter()
+        try:
+            projects, count, orphans = read_task_file(args.file, args.format, args.project)
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f"导入失败：{exc}")
+        store = open_store(args.backend)
+        try:
+            Workspace(store).import_projects(projects)
+        finally:
+            store.close()
+        print(f"已从 {args.file} 导入 {count} 个任务到 {len(projects)} 个项目，用时 {time.perf_counter() - start:.2f} 秒")
+        if orphans:
+            print(f"其中 {orphans} 个任务找不到父任务，已作为根任务导入")
+    elif args.command == "export":
+        store = open_store(args.backend)
+        try:
+            count = Workspace(store).export_file(args.file, args.project, args.format)
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f"导出失败：{exc}")
+        finally:
+            store.close()
+        print(f"已导出 {count} 个任务到 {args.file}")
+    else:
+        # 运行应用程序
+        if ft is None:
+            raise SystemExit("界面需要先安装 flet（pip install flet）")
+        ft.app(target=main)
+
+
+if __name__ == "__main__":
+    run_cli()